@@ -1,5 +1,5 @@
 from .tool_adapter import ToolAdapter
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from duckduckgo_search import DDGS
 
 class DuckDuckGoAdapter(ToolAdapter):
@@ -47,30 +47,32 @@ class DuckDuckGoAdapter(ToolAdapter):
             "schema": self.schema
         }
 
-    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
-        q = kwargs.get("q")
-        max_results = kwargs.get("max_results", 10)
-
+    def search(self, q: str, max_results: int = 10, timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        查詢 DuckDuckGo，返回（正規化的結果, 原始結果）。meta.search 也以此查詢。
+        """
         try:
-            with DDGS() as ddgs:
+            with (DDGS(timeout=timeout) if timeout else DDGS()) as ddgs:
                 raw_results = [r for r in ddgs.text(q, max_results=max_results)]
-            
-            # Normalize the data
-            normalized_data = []
-            for item in raw_results:
-                normalized_data.append({
-                    "title": item.get("title"),
-                    "url": item.get("href"),
-                    "snippet": item.get("body"),
-                    "source": "duckduckgo"
-                })
-
-            return {
-                "data": normalized_data,
-                "raw": raw_results,
-                "cost": 0,
-                "citations": []
-            }
-
         except Exception as e:
             raise RuntimeError(f"DuckDuckGo Error: {e}")
+
+        # Normalize the data
+        normalized_data = []
+        for item in raw_results:
+            normalized_data.append({
+                "title": item.get("title"),
+                "url": item.get("href"),
+                "snippet": item.get("body"),
+                "source": "duckduckgo"
+            })
+        return normalized_data, raw_results
+
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        normalized_data, raw_results = self.search(kwargs.get("q"), max_results=kwargs.get("max_results", 10))
+        return {
+            "data": normalized_data,
+            "raw": raw_results,
+            "cost": 0,
+            "citations": []
+        }
@@ -0,0 +1,241 @@
+"""
+meta.search：同時查詢多個搜尋後端並合併結果
+
+一次工具呼叫同時查詢 SearXNG（META_SEARCH_ENGINES 中的每個引擎各一個請求，未設定時為一個聚合請求）
+與 DuckDuckGo，每個後端有自己的逾時（META_SEARCH_BACKEND_TIMEOUT），整體在延遲預算
+（META_SEARCH_BUDGET）內返回：預算用完時只合併已完成的後端，其餘後端的結果捨棄。
+
+合併時以 reciprocal rank fusion 排序（多個後端都排在前面的結果優先），
+並去除重複：網址正規化後相同（忽略 scheme、www.、結尾斜線、fragment 與 utm_* 等追蹤參數），
+或摘要的 SimHash 相近（漢明距離不超過 SIMHASH_DISTANCE）。
+
+結果由工具註冊中心快取 cache_ttl 秒；有後端逾時或失敗的部分結果只快取 META_SEARCH_PARTIAL_CACHE_TTL 秒，
+之後的相同查詢會重新查詢所有後端，不會長時間缺少失敗後端的結果。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .tool_adapter import ToolAdapter
+
+logger = logging.getLogger(__name__)
+
+META_SEARCH_ENGINES = [e.strip() for e in os.getenv("META_SEARCH_ENGINES", "").split(",") if e.strip()]
+META_SEARCH_DUCKDUCKGO = os.getenv("META_SEARCH_DUCKDUCKGO", "true").lower() in ("1", "true", "yes")
+META_SEARCH_BACKEND_TIMEOUT = float(os.getenv("META_SEARCH_BACKEND_TIMEOUT", "4"))
+META_SEARCH_BUDGET = float(os.getenv("META_SEARCH_BUDGET", "5"))
+META_SEARCH_PARTIAL_CACHE_TTL = int(os.getenv("META_SEARCH_PARTIAL_CACHE_TTL", "60"))
+
+SIMHASH_DISTANCE = 3
+# 太短的摘要（例如只有標題）相似度沒有意義，不做近似比對
+MIN_SNIPPET_CHARS = 20
+RRF_K = 60
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|ref|ref_src|spm)$", re.IGNORECASE)
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_url(url: str) -> str:
+    """
+    去重用的網址：忽略 scheme、www.、fragment、追蹤參數與結尾斜線，其餘參數排序。
+    """
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k))
+    path = parts.path.rstrip("/")
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else "")
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """
+    64 位元 SimHash，以字元 shingle 為特徵（中文沒有空白斷詞）。
+    """
+    # 去掉空白與標點：轉載時常見的斷行、全半形標點差異不影響指紋
+    text = _NON_WORD.sub("", text.lower())
+    if not text:
+        return 0
+    features = {text[i:i + shingle] for i in range(max(1, len(text) - shingle + 1))}
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def merge_results(ranked_lists: Dict[str, List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    合併各後端的結果：去除重複並依 reciprocal rank fusion 排序，返回前 limit 筆。
+    每筆結果的 sources 列出找到它的後端。
+    """
+    merged: List[Dict[str, Any]] = []
+    by_url: Dict[str, Dict[str, Any]] = {}
+    fingerprints: List[Tuple[int, Dict[str, Any]]] = []
+
+    for backend, results in ranked_lists.items():
+        for rank, item in enumerate(results):
+            key = normalize_url(item.get("url") or "")
+            entry = by_url.get(key) if key else None
+            snippet = item.get("snippet") or ""
+            fingerprint = simhash(snippet) if len(snippet) >= MIN_SNIPPET_CHARS else None
+            if entry is None and fingerprint is not None:
+                entry = next(
+                    (e for fp, e in fingerprints if hamming_distance(fp, fingerprint) <= SIMHASH_DISTANCE), None
+                )
+            if entry is None:
+                entry = {**item, "sources": [], "score": 0.0}
+                merged.append(entry)
+                if fingerprint is not None:
+                    fingerprints.append((fingerprint, entry))
+            if key:
+                by_url.setdefault(key, entry)
+            if backend not in entry["sources"]:
+                entry["sources"].append(backend)
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+
+    merged.sort(key=lambda e: e["score"], reverse=True)
+    for entry in merged:
+        entry["score"] = round(entry["score"], 6)
+    return merged[:limit]
+
+
+class MetaSearchAdapter(ToolAdapter):
+    """
+    同時查詢 SearXNG 各引擎與 DuckDuckGo，合併去重的搜尋工具。
+    """
+
+    def __init__(
+        self,
+        engines: Optional[List[str]] = None,
+        duckduckgo: Optional[bool] = None,
+        backend_timeout: Optional[float] = None,
+        budget: Optional[float] = None,
+    ):
+        self.engines = META_SEARCH_ENGINES if engines is None else engines
+        self.duckduckgo = META_SEARCH_DUCKDUCKGO if duckduckgo is None else duckduckgo
+        self.backend_timeout = META_SEARCH_BACKEND_TIMEOUT if backend_timeout is None else backend_timeout
+        self.budget = META_SEARCH_BUDGET if budget is None else budget
+
+    @property
+    def name(self) -> str:
+        return "meta.search"
+
+    @property
+    def version(self) -> str:
+        return "v1"
+
+    @property
+    def description(self) -> str:
+        return "同時查詢多個搜尋引擎，合併並去除重複的結果"
+
+    @property
+    def cache_ttl(self) -> int:
+        return 3600
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "q": {"type": "string", "description": "搜尋關鍵字"},
+                "category": {
+                    "type": "string",
+                    "enum": ["general", "news", "science"],
+                    "default": "general",
+                    "description": "搜尋類別（SearXNG）"
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 20,
+                    "default": 10,
+                    "description": "回傳結果數量"
+                }
+            },
+            "required": ["q"]
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "description": self.description,
+            "schema": self.schema
+        }
+
+    def backends(self, q: str, category: str, limit: int) -> Dict[str, Callable[[], List[Dict[str, Any]]]]:
+        """
+        本次查詢要同時執行的後端：名稱 -> 返回正規化結果的函式。
+        """
+        from .searxng_adapter import SearXNGAdapter
+        searxng = SearXNGAdapter()
+        timeout = self.backend_timeout
+
+        def searxng_backend(engine: Optional[str]) -> Callable[[], List[Dict[str, Any]]]:
+            return lambda: searxng.search(q, category=category, limit=limit, engines=engine, timeout=timeout)[0]
+
+        backends = {f"searxng:{engine}": searxng_backend(engine) for engine in self.engines}
+        if not backends:
+            backends["searxng"] = searxng_backend(None)
+        if self.duckduckgo:
+            def duckduckgo_backend() -> List[Dict[str, Any]]:
+                # duckduckgo_search 較重，用到時才 import
+                from .duckduckgo_adapter import DuckDuckGoAdapter
+                return DuckDuckGoAdapter().search(q, max_results=limit, timeout=timeout)[0]
+            backends["duckduckgo"] = duckduckgo_backend
+        return backends
+
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        q = kwargs.get("q")
+        category = kwargs.get("category", "general")
+        limit = kwargs.get("limit", 10)
+        backends = self.backends(q, category, limit)
+
+        start = time.perf_counter()
+        ranked_lists: Dict[str, List[Dict[str, Any]]] = {}
+        status: Dict[str, Dict[str, Any]] = {name: {"status": "timeout"} for name in backends}
+        pool = ThreadPoolExecutor(max_workers=len(backends), thread_name_prefix="meta-search")
+        try:
+            futures = {pool.submit(func): name for name, func in backends.items()}
+            try:
+                for future in as_completed(futures, timeout=self.budget):
+                    name = futures[future]
+                    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+                    try:
+                        ranked_lists[name] = future.result()
+                        status[name] = {"status": "ok", "results": len(ranked_lists[name]), "latency_ms": latency_ms}
+                    except Exception as e:
+                        logger.warning("meta.search backend %s failed: %s", name, e)
+                        status[name] = {"status": "error", "error": str(e), "latency_ms": latency_ms}
+            except FuturesTimeoutError:
+                logger.info("meta.search budget of %ss exhausted, skipping %s", self.budget,
+                            [name for name, s in status.items() if s["status"] == "timeout"])
+        finally:
+            # 不等待逾時的後端（它們各自在 backend_timeout 後結束）
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if not ranked_lists:
+            raise RuntimeError(f"meta.search: no backend returned results ({status})")
+
+        # 依後端宣告的順序合併，排名相同時順序固定
+        ordered = {name: ranked_lists[name] for name in backends if name in ranked_lists}
+        result = {
+            "data": merge_results(ordered, limit),
+            "raw": {"backends": status},
+            "cost": 0,
+            "citations": []
+        }
+        if any(s["status"] != "ok" for s in status.values()):
+            result["cache_ttl"] = min(META_SEARCH_PARTIAL_CACHE_TTL, self.cache_ttl)
+        return result
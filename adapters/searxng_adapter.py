@@ -1,5 +1,5 @@
 from .tool_adapter import ToolAdapter
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import requests
 import json
 import hashlib
@@ -60,39 +60,45 @@ class SearXNGAdapter(ToolAdapter):
             "schema": self.schema
         }
 
-    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+    def search(self, q: str, category: str = "general", limit: int = 10, engines: Optional[str] = None, timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        查詢 SearXNG，返回（正規化的結果, 原始回應）。meta.search 也以此查詢各引擎。
+        """
         searxng_host = os.getenv("SEARXNG_HOST", "http://searxng:8080")
         base_url = f"{searxng_host}/search"
-        q = kwargs.get("q")
-        category = kwargs.get("category", "general")
-        limit = kwargs.get("limit", 10)
-        engines = kwargs.get("engines")
 
         params = {"q": q, "categories": category, "format": "json"}
         if engines:
             params["engines"] = engines
 
         try:
-            response = requests.get(base_url, params=params)
+            response = requests.get(base_url, params=params, timeout=timeout)
             response.raise_for_status()
             raw_data = response.json()
-            
-            # Normalize the data
-            normalized_data = []
-            for item in raw_data.get("results", [])[:limit]:
-                normalized_data.append({
-                    "title": item.get("title"),
-                    "url": item.get("url"),
-                    "snippet": item.get("content"),
-                    "source": item.get("engine"),
-                })
-
-            return {
-                "data": normalized_data,
-                "raw": raw_data,
-                "cost": 0,
-                "citations": []
-            }
-
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"Upstream Error: {e}")
+
+        # Normalize the data
+        normalized_data = []
+        for item in raw_data.get("results", [])[:limit]:
+            normalized_data.append({
+                "title": item.get("title"),
+                "url": item.get("url"),
+                "snippet": item.get("content"),
+                "source": item.get("engine"),
+            })
+        return normalized_data, raw_data
+
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        normalized_data, raw_data = self.search(
+            kwargs.get("q"),
+            category=kwargs.get("category", "general"),
+            limit=kwargs.get("limit", 10),
+            engines=kwargs.get("engines"),
+        )
+        return {
+            "data": normalized_data,
+            "raw": raw_data,
+            "cost": 0,
+            "citations": []
+        }
@@ -4,21 +4,31 @@ Docs: https://api.tej.com.tw/datatables.html
 Example: GET https://api.tej.com.tw/api/datatables/TRAIL/TAIACC.json?api_key=<YOURAPIKEY>
 """
 from __future__ import annotations
+import logging
 import os
 from typing import Any, Dict, Optional
 
 import re
 import requests
 
+from api.log import sample
 from .tool_adapter import ToolAdapter
 from .base import ToolResult, UpstreamError
 
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TEJ_BASE_URL = "https://api.tej.com.tw/api/datatables"
+
 
 class TEJBaseAdapter(ToolAdapter):
-    """Base adapter for TEJ API interactions."""
+    """Base adapter for TEJ API interactions.
+
+    base_url defaults to TEJ_BASE_URL (e.g. a local mock server, see benchmarks/mocks).
+    """
     
-    def __init__(self, base_url: str = "https://api.tej.com.tw/api/datatables", api_key: Optional[str] = None, timeout_sec: int = 15):
-        self.base_url = base_url.rstrip("/")
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, timeout_sec: int = 15):
+        self.base_url = (base_url or os.getenv("TEJ_BASE_URL") or DEFAULT_TEJ_BASE_URL).rstrip("/")
         self.api_key = api_key or os.getenv("TEJ_API_KEY")
         self.timeout_sec = timeout_sec
         self.auth_config = {"type": "api_key", "in": "query", "param": "api_key"}
@@ -27,7 +37,6 @@ class TEJBaseAdapter(ToolAdapter):
 
     def auth(self, req: Dict[str, Any]) -> Dict[str, Any]:
         token = self.api_key
-        print(f"DEBUG: Using TEJ API Key: {token}")
         if not token:
             raise UpstreamError(code="ERR-AUTH", http_status=401, message="TEJ_API_KEY missing")
         q = req.get("params", {})
@@ -74,7 +83,7 @@ class TEJBaseAdapter(ToolAdapter):
         req = self.auth({"headers": {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}, "params": query})
         
         try:
-            print(f"DEBUG: Requesting {url} with params {req['params']}")
+            logger.debug("Requesting %s with params %s", url, req["params"], extra=sample())
             resp = requests.get(url, headers=req["headers"], params=req["params"], timeout=self.timeout_sec)
         except requests.RequestException as e:
              raise UpstreamError(code="ERR-NET", http_status=500, message=str(e))
@@ -85,15 +94,14 @@ class TEJBaseAdapter(ToolAdapter):
                 body = resp.json()
             except Exception:
                 body = {"text": resp.text[:200]}
-            print(f"DEBUG: Response body: {body}")
+            logger.warning("TEJ %s returned HTTP %s: %s", url, resp.status_code, body)
             raise self.map_error(resp.status_code, body)
 
         raw = resp.json()
-        print(f"DEBUG: Raw response from TEJ: {raw}")
-        
         rows = raw.get("data")
         if rows is None:
             rows = []
+        logger.debug("TEJ %s returned %d rows", url, len(rows), extra=sample())
 
         data = {
             "db": db,
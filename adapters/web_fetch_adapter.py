@@ -0,0 +1,657 @@
+"""
+web.fetch：抓取網頁並擷取正文
+
+搜尋工具只返回標題與約 200 字的摘要，web.fetch 讓 Agent 取得搜尋結果網頁的正文作為引用證據。
+
+- 所有請求經由同一個背景 event loop 上的 httpx.AsyncClient（連線池，WEB_FETCH_MAX_CONNECTIONS），
+  一次呼叫的多個網址併發抓取；同一網域同時最多 WEB_FETCH_PER_DOMAIN 個請求，避免對單一網站發出突發流量
+- 以標準函式庫的 html.parser 擷取正文：略過 script / style / nav / header / footer / aside 等區塊，
+  有 <article> 或 <main> 時只取其中的內容
+- 未在 Content-Type 標頭宣告編碼的網頁，依 <meta charset> 判斷編碼（台灣新聞網站常見 Big5），
+  都沒有宣告時先試 UTF-8，再試 cp950
+- 擷取結果存入以內容雜湊定址的磁碟快取（WEB_FETCH_CACHE_DIR），相同內容的網址共用一份：
+  WEB_FETCH_FRESH_SECONDS 內直接使用快取；過期後帶 If-None-Match / If-Modified-Since 重新驗證，
+  伺服器回應 304 時沿用快取內容；抓取失敗時退回過期的快取內容。
+  寫入時每 WEB_FETCH_CACHE_SWEEP_SECONDS 秒清理一次：刪除超過 WEB_FETCH_CACHE_MAX_AGE 秒的項目，
+  總大小超過 WEB_FETCH_CACHE_MAX_BYTES 時從最久未抓取的項目開始刪
+- 只允許 http(s)，且預設拒絕解析到內網 / loopback 位址的網址（含轉址），WEB_FETCH_ALLOW_PRIVATE=true 可關閉。
+  位址在建立連線時才解析並檢查，連線使用的就是檢查過的位址，DNS rebinding 無法在檢查後改指向內網
+
+結果可能很大，不經工具註冊中心的 Redis 快取（cache_ttl 為 0），改由上述磁碟快取重複利用。
+"""
+
+import asyncio
+import codecs
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextvars import ContextVar
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urlsplit
+
+import httpcore
+import httpx
+
+from .tool_adapter import ToolAdapter
+
+logger = logging.getLogger(__name__)
+
+WEB_FETCH_CACHE_DIR = os.getenv("WEB_FETCH_CACHE_DIR", "./data/web_cache")
+WEB_FETCH_FRESH_SECONDS = int(os.getenv("WEB_FETCH_FRESH_SECONDS", "3600"))
+WEB_FETCH_TIMEOUT = float(os.getenv("WEB_FETCH_TIMEOUT", "10"))
+WEB_FETCH_MAX_BYTES = int(os.getenv("WEB_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+WEB_FETCH_MAX_CONNECTIONS = int(os.getenv("WEB_FETCH_MAX_CONNECTIONS", "20"))
+WEB_FETCH_PER_DOMAIN = int(os.getenv("WEB_FETCH_PER_DOMAIN", "2"))
+WEB_FETCH_ALLOW_PRIVATE = os.getenv("WEB_FETCH_ALLOW_PRIVATE", "false").lower() in ("1", "true", "yes")
+WEB_FETCH_CACHE_MAX_BYTES = int(os.getenv("WEB_FETCH_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+WEB_FETCH_CACHE_MAX_AGE = int(os.getenv("WEB_FETCH_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+WEB_FETCH_CACHE_SWEEP_SECONDS = int(os.getenv("WEB_FETCH_CACHE_SWEEP_SECONDS", "300"))
+
+USER_AGENT = "Mozilla/5.0 (compatible; agentscope-debate web.fetch)"
+MAX_REDIRECTS = 5
+MAX_URLS = 5
+SNIPPET_CHARS = 200
+# 只在網頁開頭找 <meta charset>
+CHARSET_SNIFF_BYTES = 4096
+# 內容檔寫入後、索引寫入前的空窗：清理時不刪除這麼新的未引用內容檔
+SWEEP_GRACE_SECONDS = 60
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+# 網頁宣告的編碼常是實際編碼的子集，以涵蓋範圍較大的編碼解碼
+_CHARSET_ALIASES = {"big5": "cp950", "x-x-big5": "cp950", "gb2312": "gb18030", "gbk": "gb18030"}
+
+
+def _codec(charset: Optional[str]) -> Optional[str]:
+    if not charset:
+        return None
+    charset = _CHARSET_ALIASES.get(charset.lower(), charset)
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def decode_html(body: bytes, header_charset: Optional[str] = None) -> str:
+    """
+    依 Content-Type 的 charset、<meta charset> 的順序決定編碼；都沒有宣告（或宣告了不認得的編碼）時
+    先試 UTF-8，再試 cp950。內容可能在 WEB_FETCH_MAX_BYTES 處被截斷，結尾不完整的字元直接捨棄。
+    """
+    match = _META_CHARSET.search(body[:CHARSET_SNIFF_BYTES])
+    declared = _codec(header_charset) or _codec(match.group(1).decode("ascii") if match else None)
+    if declared:
+        return codecs.getincrementaldecoder(declared)(errors="replace").decode(body)
+    for charset in ("utf-8", "cp950"):
+        try:
+            return codecs.getincrementaldecoder(charset)().decode(body)
+        except UnicodeDecodeError:
+            continue
+    return body.decode("utf-8", errors="replace")
+
+
+# ---------------------------------------------------------------------------
+# 正文擷取
+# ---------------------------------------------------------------------------
+
+class _TextExtractor(HTMLParser):
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "form", "nav", "header", "footer", "aside"}
+    MAIN_TAGS = {"article", "main"}
+    BLOCK_TAGS = {
+        "p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th",
+        "blockquote", "pre", "br", "h1", "h2", "h3", "h4", "h5", "h6", "dd", "dt", "figcaption",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks: List[Tuple[bool, str]] = []
+        self._buffer: List[str] = []
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._buffer).split())
+        self._buffer = []
+        if text:
+            self.blocks.append((self._main_depth > 0, text))
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+            if tag in self.MAIN_TAGS:
+                self._main_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+            if tag in self.MAIN_TAGS:
+                self._main_depth = max(0, self._main_depth - 1)
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._buffer.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html: str) -> Tuple[str, str]:
+    """
+    從 HTML 擷取（標題, 正文）。正文一個區塊一行；有 <article> / <main> 時只取其中的區塊。
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    blocks = parser.blocks
+    if any(in_main for in_main, _ in blocks):
+        blocks = [block for block in blocks if block[0]]
+    return " ".join(parser.title.split()), "\n".join(text for _, text in blocks)
+
+
+# ---------------------------------------------------------------------------
+# 磁碟快取
+# ---------------------------------------------------------------------------
+
+class ContentCache:
+    """
+    以內容雜湊定址的磁碟快取：
+      index/<sha256(網址)>.json          網址的中繼資料（ETag、Last-Modified、內容雜湊、抓取時間、標題）
+      objects/<前兩碼>/<sha256(正文)>.txt  擷取後的正文，內容相同的網址共用一份
+    寫入一律先寫暫存檔再 os.replace，多個 worker 共用同一個目錄時不會讀到寫到一半的檔案。
+    put() 每 sweep_interval 秒呼叫一次 sweep()，限制快取的存放時間與總大小。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = WEB_FETCH_CACHE_MAX_BYTES,
+        max_age: int = WEB_FETCH_CACHE_MAX_AGE,
+        sweep_interval: int = WEB_FETCH_CACHE_SWEEP_SECONDS,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.root, "index", f"{self._hash(url)}.json")
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], f"{content_hash}.txt")
+
+    def _write(self, path: str, data: str) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        返回網址的中繼資料；沒有快取或內容檔已遺失時返回 None。
+        """
+        try:
+            with open(self._index_path(url), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._object_path(meta.get("content_hash", ""))):
+            return None
+        return meta
+
+    def read(self, meta: Dict[str, Any]) -> Optional[str]:
+        """
+        讀取網址的正文；內容檔在 get() 之後被 sweep()（可能是共用快取目錄的其他 worker）刪除時返回 None。
+        """
+        try:
+            with open(self._object_path(meta["content_hash"]), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, text: str, **meta: Any) -> Dict[str, Any]:
+        content_hash = self._hash(text)
+        path = self._object_path(content_hash)
+        if not os.path.exists(path):
+            self._write(path, text)
+        entry = {**meta, "url": url, "content_hash": content_hash, "fetched_at": time.time()}
+        self._write(self._index_path(url), json.dumps(entry, ensure_ascii=False))
+        if time.time() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        return entry
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def sweep(self) -> None:
+        """
+        刪除超過 max_age 未抓取的網址；總大小超過 max_bytes 時從最久未抓取的網址開始刪；
+        最後刪除已經沒有網址引用的內容檔。其他 worker 同時清理時，已被刪除的檔案直接略過。
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now = time.time()
+            entries = []
+            index_dir = os.path.join(self.root, "index")
+            for name in os.listdir(index_dir) if os.path.isdir(index_dir) else []:
+                path = os.path.join(index_dir, name)
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        meta = json.load(f)
+                    entries.append((meta["fetched_at"], path, meta["content_hash"]))
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError, KeyError):
+                    self._remove(path)
+
+            objects: Dict[str, Tuple[str, int, float]] = {}
+            objects_dir = os.path.join(self.root, "objects")
+            for prefix in os.listdir(objects_dir) if os.path.isdir(objects_dir) else []:
+                for entry in os.scandir(os.path.join(objects_dir, prefix)):
+                    if entry.name.endswith(".txt"):
+                        stat = entry.stat()
+                        objects[entry.name[:-4]] = (entry.path, stat.st_size, stat.st_mtime)
+
+            entries.sort()
+            refs: Dict[str, int] = {}
+            for _, _, content_hash in entries:
+                refs[content_hash] = refs.get(content_hash, 0) + 1
+            total = sum(objects[h][1] for h in refs if h in objects)
+            for fetched_at, path, content_hash in entries:
+                if now - fetched_at <= self.max_age and total <= self.max_bytes:
+                    break
+                self._remove(path)
+                refs[content_hash] -= 1
+                if refs[content_hash] == 0 and content_hash in objects:
+                    total -= objects[content_hash][1]
+
+            for content_hash, (path, _, mtime) in objects.items():
+                if not refs.get(content_hash) and now - mtime > SWEEP_GRACE_SECONDS:
+                    self._remove(path)
+        finally:
+            self._sweep_lock.release()
+
+    def touch(self, url: str, meta: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """
+        重新驗證成功（304）：更新抓取時間，內容不變。內容檔在讀取後被清理時以 text 寫回，
+        索引不會指向不存在的內容檔。
+        """
+        entry = {**meta, "fetched_at": time.time()}
+        self._write(self._index_path(url), json.dumps(entry, ensure_ascii=False))
+        path = self._object_path(meta["content_hash"])
+        if not os.path.exists(path):
+            self._write(path, text)
+        return entry
+
+
+# ---------------------------------------------------------------------------
+# 位址檢查
+# ---------------------------------------------------------------------------
+
+# 目前這個請求是否允許內網位址（各 WebFetchAdapter 共用同一個 client，由 _fetch 設定）
+_allow_private: ContextVar[bool] = ContextVar("web_fetch_allow_private", default=False)
+
+
+async def _resolve(host: str) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return [info[4][0].split("%")[0] for info in infos]
+
+
+def _is_public(address: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+    return address.is_global
+
+
+async def resolve_public(host: str) -> str:
+    """
+    解析主機並確認每個位址都是公開位址，返回要連線的位址；有內網 / loopback 位址時拋出 ValueError。
+    """
+    addresses = [ipaddress.ip_address(address) for address in await _resolve(host)]
+    if not addresses:
+        raise ValueError(f"{host} did not resolve")
+    for address in addresses:
+        if not _is_public(address):
+            raise ValueError(f"{host} resolves to non-public address {address}")
+    return str(addresses[0])
+
+
+class _CheckedBackend(httpcore.AsyncNetworkBackend):
+    """
+    建立 TCP 連線前解析並檢查主機，直接連到檢查過的位址；TLS 仍以原本的主機名稱做 SNI 與憑證驗證。
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        if not _allow_private.get():
+            host = await resolve_public(host)
+        return await self._backend.connect_tcp(
+            host, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        raise ValueError("web.fetch does not connect to unix sockets")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _CheckedTransport(httpx.AsyncHTTPTransport):
+    """
+    以 _CheckedBackend 建立連線的 transport（httpx 的 transport 沒有指定 network backend 的參數，替換其連線池）。
+    """
+
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits, trust_env=False)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=_CheckedBackend(),
+        )
+
+
+# ---------------------------------------------------------------------------
+# 共用的非同步 HTTP client
+# ---------------------------------------------------------------------------
+
+class _FetchLoop:
+    """
+    在背景執行緒執行的 event loop 與其上的 httpx.AsyncClient。
+    工具在 worker 的執行緒中同步呼叫，所有呼叫共用這個 client 的連線池與每網域的併發上限。
+    """
+
+    def __init__(self, max_connections: int, per_domain: int, timeout: float):
+        self.per_domain = per_domain
+        self.loop = asyncio.new_event_loop()
+        self._domains: Dict[str, asyncio.Semaphore] = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, name="web-fetch", daemon=True)
+        self._thread.start()
+        self.client: httpx.AsyncClient = self.run(self._create_client(max_connections, timeout))
+
+    async def _create_client(self, max_connections: int, timeout: float) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        return httpx.AsyncClient(
+            transport=_CheckedTransport(limits),
+            timeout=httpx.Timeout(timeout),
+            headers={"User-Agent": USER_AGENT},
+        )
+
+    def domain_slot(self, host: str) -> asyncio.Semaphore:
+        # 只在 loop 執行緒中呼叫，不需要 lock
+        if host not in self._domains:
+            self._domains[host] = asyncio.Semaphore(self.per_domain)
+        return self._domains[host]
+
+    def run(self, coro: Any, timeout: Optional[float] = None) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FuturesTimeoutError:
+            # 逾時後不再需要結果：取消仍在執行的抓取，釋放連線與每網域的名額
+            future.cancel()
+            raise
+
+
+_fetch_loop: Optional[_FetchLoop] = None
+_fetch_loop_lock = threading.Lock()
+
+
+def _get_fetch_loop() -> _FetchLoop:
+    global _fetch_loop
+    with _fetch_loop_lock:
+        if _fetch_loop is None:
+            _fetch_loop = _FetchLoop(WEB_FETCH_MAX_CONNECTIONS, WEB_FETCH_PER_DOMAIN, WEB_FETCH_TIMEOUT)
+        return _fetch_loop
+
+
+class WebFetchAdapter(ToolAdapter):
+    """
+    抓取網頁並擷取正文的工具。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        fresh_seconds: Optional[int] = None,
+        allow_private: Optional[bool] = None,
+    ):
+        self.cache = ContentCache(cache_dir or WEB_FETCH_CACHE_DIR)
+        self.fresh_seconds = WEB_FETCH_FRESH_SECONDS if fresh_seconds is None else fresh_seconds
+        self.allow_private = WEB_FETCH_ALLOW_PRIVATE if allow_private is None else allow_private
+
+    @property
+    def name(self) -> str:
+        return "web.fetch"
+
+    @property
+    def version(self) -> str:
+        return "v1"
+
+    @property
+    def description(self) -> str:
+        return "抓取網頁並擷取正文，用於引用搜尋結果的原文內容"
+
+    @property
+    def cache_ttl(self) -> int:
+        return 0
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "maxItems": MAX_URLS,
+                    "description": "要抓取的網址（通常來自搜尋結果）"
+                },
+                "max_chars": {
+                    "type": "integer",
+                    "minimum": 200,
+                    "maximum": 20000,
+                    "default": 4000,
+                    "description": "每個網頁返回的正文長度上限"
+                }
+            },
+            "required": ["urls"]
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "description": self.description,
+            "schema": self.schema
+        }
+
+    async def _check_host(self, host: str) -> None:
+        """
+        送出請求前先檢查主機：連線池中已建立的連線不會再經過 _CheckedBackend。
+        """
+        if not self.allow_private:
+            await resolve_public(host)
+
+    async def _fetch(self, fetch_loop: _FetchLoop, url: str, meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        抓取一個網址（自行處理轉址，每一跳都檢查位址）。返回 status、final_url、body 與驗證用的標頭。
+        ETag / Last-Modified 屬於快取內容的最終網址，條件標頭只在請求該網址時送出。
+        """
+        _allow_private.set(self.allow_private)
+        validators = {}
+        if meta and meta.get("etag"):
+            validators["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            validators["If-Modified-Since"] = meta["last_modified"]
+        validated_url = (meta or {}).get("final_url") or url
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"unsupported url: {url}")
+            await self._check_host(parts.hostname)
+            headers = validators if url == validated_url else {}
+            async with fetch_loop.domain_slot(parts.hostname.lower()):
+                async with fetch_loop.client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return {"status": 304, "final_url": url}
+                    if response.has_redirect_location:
+                        url = urljoin(url, response.headers["location"])
+                        continue
+                    response.raise_for_status()
+                    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                    if content_type and content_type not in ("text/html", "application/xhtml+xml", "text/plain"):
+                        raise ValueError(f"unsupported content type: {content_type}")
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= WEB_FETCH_MAX_BYTES:
+                            break
+                    return {
+                        "status": response.status_code,
+                        "final_url": url,
+                        "content_type": content_type,
+                        "body": decode_html(bytes(body[:WEB_FETCH_MAX_BYTES]), response.charset_encoding),
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                    }
+        raise ValueError(f"too many redirects: {url}")
+
+    async def _fetch_all(self, pending: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Any]:
+        fetch_loop = _get_fetch_loop()
+        return await asyncio.gather(
+            *(self._fetch(fetch_loop, url, meta) for url, meta in pending), return_exceptions=True
+        )
+
+    def _entry(self, url: str, meta: Dict[str, Any], text: str, cache: str, max_chars: int) -> Dict[str, Any]:
+        return {
+            "url": url,
+            "final_url": meta.get("final_url") or url,
+            "title": meta.get("title") or "",
+            "text": text[:max_chars],
+            "chars": len(text),
+            "truncated": len(text) > max_chars,
+            "cache": cache,
+        }
+
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        urls = list(dict.fromkeys(kwargs.get("urls") or []))[:MAX_URLS]
+        max_chars = kwargs.get("max_chars", 4000)
+        if not urls:
+            raise RuntimeError("web.fetch: no urls given")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        now = time.time()
+        for url in urls:
+            meta = self.cache.get(url)
+            text = self.cache.read(meta) if meta else None
+            if text is None:
+                # 沒有快取，或內容檔剛被清理：重新抓取，不帶條件標頭
+                pending.append((url, None))
+            elif now - meta["fetched_at"] < self.fresh_seconds:
+                results[url] = self._entry(url, meta, text, "hit", max_chars)
+            else:
+                pending.append((url, meta))
+
+        if pending:
+            # 每個請求各有 WEB_FETCH_TIMEOUT；同網域排隊與轉址可能讓整批較久，整體等待上限放寬
+            outcomes = _get_fetch_loop().run(self._fetch_all(pending), timeout=WEB_FETCH_TIMEOUT * (MAX_URLS + 1))
+            for (url, meta), outcome in zip(pending, outcomes):
+                results[url] = self._store(url, meta, outcome, max_chars)
+
+        data = [results[url] for url in urls]
+        if all("error" in entry for entry in data):
+            raise RuntimeError(f"web.fetch: every url failed ({[entry['error'] for entry in data]})")
+        return {
+            "data": data,
+            "raw": {"cache": {url: results[url].get("cache") for url in urls}},
+            "cost": 0,
+            "citations": [
+                {
+                    "title": entry["title"],
+                    "url": entry["final_url"],
+                    "snippet": entry["text"][:SNIPPET_CHARS],
+                    "source": "web"
+                }
+                for entry in data if "error" not in entry
+            ]
+        }
+
+    def _store(self, url: str, meta: Optional[Dict[str, Any]], outcome: Any, max_chars: int) -> Dict[str, Any]:
+        """
+        處理一個網址的抓取結果：寫入 / 更新快取並組成返回的項目。
+        """
+        if isinstance(outcome, BaseException):
+            error = f"{type(outcome).__name__}: {outcome}" if str(outcome) else type(outcome).__name__
+            text = self.cache.read(meta) if meta else None
+            if text is not None:
+                logger.warning("web.fetch %s failed (%s), serving stale cache", url, error)
+                return self._entry(url, meta, text, "stale", max_chars)
+            logger.warning("web.fetch %s failed: %s", url, error)
+            return {"url": url, "error": error}
+
+        if outcome["status"] == 304:
+            # 沒有快取時不會帶條件標頭；伺服器仍回 304 時沒有內容可用
+            text = self.cache.read(meta) if meta else None
+            if text is None:
+                return {"url": url, "error": "304 Not Modified without a cached copy"}
+            meta = self.cache.touch(url, meta, text)
+            return self._entry(url, meta, text, "revalidated", max_chars)
+
+        if outcome.get("content_type") == "text/plain":
+            title, text = "", outcome["body"].strip()
+        else:
+            title, text = extract_main_text(outcome["body"])
+        if not text:
+            return {"url": url, "error": "no text content"}
+        meta = self.cache.put(
+            url,
+            text,
+            title=title,
+            final_url=outcome["final_url"],
+            etag=outcome.get("etag"),
+            last_modified=outcome.get("last_modified"),
+        )
+        return self._entry(url, meta, text, "miss", max_chars)
@@ -0,0 +1,248 @@
+"""
+辯論准入控制（admission control）與背壓
+
+每場辯論在送進 Celery 之前先取得一個「名額」（lease），名額記錄在 Redis：
+- debates:active                 全域進行中 / 排隊中的辯論（sorted set，score 為取得名額的時間）
+- debates:active:client:{id}     單一客戶端的辯論
+- debate:{id}:client             辯論對應的客戶端，worker 釋放名額時使用
+
+超過全域或單一客戶端上限時拒絕，由 API 回傳 429 與 Retry-After。
+客戶端以來源 IP 辨識（resolve_client_id）；請求內容與標頭中的客戶端 ID 由呼叫端自訂，
+只有經由 TRUSTED_PROXIES 中的反向代理（由代理完成驗證並設定標頭）送來時才採用，否則換一個 ID 就能繞過上限。
+檢查與佔用在同一個 Lua 腳本內完成，多個 API 行程同時送出也不會超賣。
+worker 在辯論結束（成功或失敗）時釋放名額；鏈式編排中途失敗時由 link_error（worker.tasks.abort_debate）釋放。
+只有 worker 異常終止而未能釋放時，名額才會在 DEBATE_LEASE_TTL 秒後視為過期並自動回收。
+"""
+
+import ipaddress
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import redis
+
+ACTIVE_KEY = "debates:active"
+CLIENT_KEY_PREFIX = "debates:active:client:"
+DURATION_KEY = "debates:avg_duration"
+
+MAX_ACTIVE_DEBATES = int(os.getenv("MAX_ACTIVE_DEBATES", "20"))
+MAX_DEBATES_PER_CLIENT = int(os.getenv("MAX_DEBATES_PER_CLIENT", "3"))
+DEBATE_LEASE_TTL = int(os.getenv("DEBATE_LEASE_TTL", "7200"))
+# 尚無歷史耗時可供估計時的預設 Retry-After（秒）
+DEBATE_RETRY_AFTER = int(os.getenv("DEBATE_RETRY_AFTER", "30"))
+
+DEFAULT_CLIENT_ID = "anonymous"
+
+
+def parse_networks(spec: Optional[str]) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    """
+    解析逗號分隔的 IP / CIDR，例如 "10.0.0.0/8,127.0.0.1"。無法解析的項目略過。
+    """
+    networks = []
+    for item in (spec or "").split(","):
+        try:
+            networks.append(ipaddress.ip_network(item.strip(), strict=False))
+        except ValueError:
+            continue
+    return networks
+
+
+# 可信任的反向代理：只有從這些位址送來的請求，才採用 X-Client-Id / X-Forwarded-For 與 config 中的客戶端 ID
+TRUSTED_PROXIES = parse_networks(os.getenv("TRUSTED_PROXIES"))
+
+
+def _is_trusted(address: Optional[str], trusted: List[Any]) -> bool:
+    try:
+        ip = ipaddress.ip_address((address or "").strip())
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def resolve_client_id(
+    peer: Optional[str],
+    headers: Mapping[str, str],
+    config: Optional[Dict[str, Any]] = None,
+    trusted_proxies: Optional[List[Any]] = None,
+) -> str:
+    """
+    辨識發起辯論的客戶端（租戶）。
+
+    直接連線的請求一律以來源 IP（peer）辨識。來自可信任代理的請求依序採用
+    config.tenant_id / config.client_id、X-Client-Id 標頭，以及 X-Forwarded-For 中最後一個不是代理的位址。
+    """
+    trusted = TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    if not _is_trusted(peer, trusted):
+        return peer or DEFAULT_CLIENT_ID
+    config = config or {}
+    client_id = config.get("tenant_id") or config.get("client_id") or headers.get("X-Client-Id")
+    if client_id:
+        return str(client_id)
+    for address in reversed(headers.get("X-Forwarded-For", "").split(",")):
+        if address.strip() and not _is_trusted(address, trusted):
+            return address.strip()
+    return peer or DEFAULT_CLIENT_ID
+
+# KEYS: 全域 set、客戶端 set、辯論→客戶端 key
+# ARGV: now, stale_before, max_active, max_per_client, debate_id, client_id, lease_ttl
+_ADMIT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])
+local active = redis.call('ZCARD', KEYS[1])
+local client_active = redis.call('ZCARD', KEYS[2])
+if active >= tonumber(ARGV[3]) then
+    return {0, active, client_active, 'global'}
+end
+if client_active >= tonumber(ARGV[4]) then
+    return {0, active, client_active, 'client'}
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[5])
+redis.call('ZADD', KEYS[2], ARGV[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+redis.call('SET', KEYS[3], ARGV[6], 'EX', ARGV[7])
+return {1, active + 1, client_active + 1, ''}
+"""
+
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    active: int
+    client_active: int
+    reason: Optional[str] = None
+    retry_after: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "reason": self.reason,
+            "active_debates": self.active,
+            "client_active_debates": self.client_active,
+            "retry_after": self.retry_after,
+        }
+
+
+class AdmissionController:
+    """
+    以 Redis 追蹤進行中的辯論並執行全域 / 單一客戶端上限。
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        max_active: int = MAX_ACTIVE_DEBATES,
+        max_per_client: int = MAX_DEBATES_PER_CLIENT,
+        lease_ttl: int = DEBATE_LEASE_TTL,
+    ):
+        self._redis = redis_client
+        self.max_active = max_active
+        self.max_per_client = max_per_client
+        self.lease_ttl = lease_ttl
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        if self._redis is None:
+            redis_host = os.getenv("REDIS_HOST", "redis")
+            self._redis = redis.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
+        return self._redis
+
+    @redis_client.setter
+    def redis_client(self, client: redis.Redis) -> None:
+        self._redis = client
+
+    @staticmethod
+    def _client_key(client_id: str) -> str:
+        return f"{CLIENT_KEY_PREFIX}{client_id}"
+
+    def admit(self, debate_id: str, client_id: Optional[str] = None) -> AdmissionDecision:
+        """
+        嘗試為辯論取得名額。被拒絕時附上建議的重試秒數。
+        """
+        client_id = client_id or DEFAULT_CLIENT_ID
+        client_key = self._client_key(client_id)
+        now = time.time()
+        admitted, active, client_active, reason = self.redis_client.eval(
+            _ADMIT_SCRIPT, 3,
+            ACTIVE_KEY, client_key, f"debate:{debate_id}:client",
+            now, now - self.lease_ttl, self.max_active, self.max_per_client,
+            debate_id, client_id, self.lease_ttl,
+        )
+        if isinstance(reason, bytes):
+            reason = reason.decode()
+        decision = AdmissionDecision(bool(admitted), int(active), int(client_active), reason or None)
+        if not decision.admitted:
+            key = ACTIVE_KEY if decision.reason == "global" else client_key
+            decision.retry_after = self._estimate_retry_after(key, now)
+        return decision
+
+    def release(self, debate_id: str) -> None:
+        """
+        釋放辯論的名額，並以指數移動平均更新辯論耗時（用於估計 Retry-After）。可重複呼叫。
+        """
+        r = self.redis_client
+        client_id = r.get(f"debate:{debate_id}:client") or DEFAULT_CLIENT_ID
+        started = r.zscore(ACTIVE_KEY, debate_id)
+        pipe = r.pipeline()
+        pipe.zrem(ACTIVE_KEY, debate_id)
+        pipe.zrem(self._client_key(client_id), debate_id)
+        pipe.delete(f"debate:{debate_id}:client")
+        pipe.execute()
+
+        if started is not None:
+            duration = time.time() - started
+            previous = r.get(DURATION_KEY)
+            average = duration if previous is None else 0.8 * float(previous) + 0.2 * duration
+            r.set(DURATION_KEY, average)
+
+    def renew(self, debate_id: str) -> bool:
+        """
+        更新仍在使用中的名額的時間，避免長時間佔用的名額（例如批次的名額）被當成過期回收。
+        名額已釋放或已過期時不重新佔用，回傳 False。
+        """
+        r = self.redis_client
+        client_id = r.get(f"debate:{debate_id}:client")
+        if client_id is None:
+            return False
+        now = time.time()
+        client_key = self._client_key(client_id)
+        pipe = r.pipeline()
+        pipe.zadd(ACTIVE_KEY, {debate_id: now}, xx=True, ch=True)
+        pipe.zadd(client_key, {debate_id: now}, xx=True)
+        pipe.expire(client_key, self.lease_ttl)
+        pipe.expire(f"debate:{debate_id}:client", self.lease_ttl)
+        renewed = pipe.execute()[0]
+        return bool(renewed)
+
+    def _estimate_retry_after(self, key: str, now: float) -> int:
+        """
+        以最早佔用名額的辯論預計完成時間估計重試秒數。
+        """
+        average = self.redis_client.get(DURATION_KEY)
+        oldest = self.redis_client.zrange(key, 0, 0, withscores=True)
+        if average is None or not oldest:
+            return DEBATE_RETRY_AFTER
+        remaining = oldest[0][1] + float(average) - now
+        return max(1, int(remaining))
+
+    def status(self, client_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        回傳目前的名額使用狀況；指定 client_id 時一併回傳該客戶端的數量。
+        """
+        r = self.redis_client
+        stale_before = time.time() - self.lease_ttl
+        r.zremrangebyscore(ACTIVE_KEY, "-inf", stale_before)
+        status = {
+            "active_debates": r.zcard(ACTIVE_KEY),
+            "max_active_debates": self.max_active,
+            "max_debates_per_client": self.max_per_client,
+        }
+        if client_id:
+            client_key = self._client_key(client_id)
+            r.zremrangebyscore(client_key, "-inf", stale_before)
+            status["client_id"] = client_id
+            status["client_active_debates"] = r.zcard(client_key)
+        return status
+
+
+admission_controller = AdmissionController()
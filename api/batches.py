@@ -0,0 +1,256 @@
+"""
+批次辯論：同一辯題、多組隊伍配置
+
+同一辯題搭配不同的隊伍配置（例如 A/B 測試 prompt）時，賽前分析與工具資料都相同。
+批次辯論只做一次賽前分析、預熱一次工具快取（worker.tasks.prepare_batch），
+再以 concurrency 為上限分批把辯論交給排程器（api/scheduling.py），
+每結束一場（成功、失敗或派送失敗）就補上一場，直到全部完成。
+
+批次為每個同時執行的辯論佔用一個准入名額（{batch_id}:slot:{i}），concurrency 不超過客戶端剩餘的名額，
+同一客戶端同時執行的辯論數不會因為批次而超過 MAX_DEBATES_PER_CLIENT；名額在整個批次結束時釋放。
+批次可能比 DEBATE_LEASE_TTL 更久，每送出或結束一場辯論就更新批次所有名額的時間，執行中不會被當成過期回收。
+
+Redis 中的結構：
+- batch:{id}                 批次狀態（hash）：topic、total、concurrency、launched、completed、failed、status…
+- batch:{id}:pending         尚未送出的辯論（list，JSON）
+- batch:{id}:debates         批次內所有辯論 ID（list，依建立順序）
+- batch:{id}:done            已記錄結果的辯論 ID（set，同一場辯論重複回報只計一次）
+- batch:{id}:analysis        共用的賽前分析（JSON）
+- debate:{id}:batch          辯論所屬的批次
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from api.admission import DEBATE_LEASE_TTL, AdmissionController, AdmissionDecision
+from api.scheduling import DebateScheduler
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+
+class BatchManager:
+    """
+    管理批次辯論的狀態與分批送出。
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        ttl: int = DEBATE_LEASE_TTL * 12,
+        admission: Optional[AdmissionController] = None,
+    ):
+        self._redis = redis_client
+        self._admission = admission
+        # 批次狀態保留的時間（完成後仍可查詢進度）
+        self.ttl = ttl
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        if self._redis is None:
+            redis_host = os.getenv("REDIS_HOST", "redis")
+            self._redis = redis.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
+        return self._redis
+
+    @redis_client.setter
+    def redis_client(self, client: redis.Redis) -> None:
+        self._redis = client
+
+    @property
+    def admission(self) -> AdmissionController:
+        """
+        更新與釋放批次名額用的 AdmissionController；未指定時以同一個 Redis 連線建立一次。
+        """
+        if self._admission is None:
+            self._admission = AdmissionController(redis_client=self.redis_client)
+        return self._admission
+
+    @admission.setter
+    def admission(self, controller: AdmissionController) -> None:
+        self._admission = controller
+
+    @staticmethod
+    def lease_id(batch_id: str, slot: int) -> str:
+        return f"{batch_id}:slot:{slot}"
+
+    def admit(
+        self, batch_id: str, client_id: str, concurrency: int, admission: AdmissionController
+    ) -> Tuple[int, AdmissionDecision]:
+        """
+        為批次取得最多 concurrency 個准入名額（每個同時執行的辯論一個）。
+        返回取得的名額數（即批次實際的 concurrency）與最後一次准入的結果；取得 0 個時呼叫端應回傳 429。
+        """
+        decision = None
+        for slot in range(concurrency):
+            decision = admission.admit(self.lease_id(batch_id, slot), client_id)
+            if not decision.admitted:
+                return slot, decision
+        return concurrency, decision
+
+    def _lease_count(self, batch_id: str, count: Optional[int]) -> int:
+        if count is None:
+            count = int(self.redis_client.hget(f"batch:{batch_id}", "concurrency") or 0)
+        return count
+
+    def renew_leases(self, batch_id: str, count: Optional[int] = None) -> None:
+        """
+        更新批次准入名額的時間；count 未指定時依批次的 concurrency。
+        """
+        for slot in range(self._lease_count(batch_id, count)):
+            self.admission.renew(self.lease_id(batch_id, slot))
+
+    def release_leases(self, batch_id: str, count: Optional[int] = None) -> None:
+        """
+        釋放批次的准入名額；count 未指定時依批次的 concurrency。
+        """
+        for slot in range(self._lease_count(batch_id, count)):
+            self.admission.release(self.lease_id(batch_id, slot))
+
+    def create(
+        self,
+        batch_id: str,
+        topic: str,
+        jobs: List[Dict[str, Any]],
+        concurrency: int,
+        tenant: str,
+        priority_class: str,
+        refresh_analysis: bool = False,
+    ) -> None:
+        """
+        建立批次。jobs 為排程器的 job（不含 analysis，送出時才附上）。
+        """
+        r = self.redis_client
+        pipe = r.pipeline()
+        pipe.hset(f"batch:{batch_id}", mapping={
+            "topic": topic,
+            "total": len(jobs),
+            "concurrency": concurrency,
+            "tenant": tenant,
+            "priority_class": priority_class,
+            "launched": 0,
+            "completed": 0,
+            "failed": 0,
+            "status": "preparing",
+            "refresh_analysis": int(refresh_analysis),
+            "created_at": time.time(),
+        })
+        for job in jobs:
+            pipe.rpush(f"batch:{batch_id}:pending", json.dumps(job, ensure_ascii=False))
+            pipe.rpush(f"batch:{batch_id}:debates", job["debate_id"])
+            pipe.set(f"debate:{job['debate_id']}:batch", batch_id, ex=self.ttl)
+            pipe.set(f"debate:{job['debate_id']}:topic", topic)
+        for suffix in ("", ":pending", ":debates", ":done"):
+            pipe.expire(f"batch:{batch_id}{suffix}", self.ttl)
+        pipe.execute()
+
+    def set_analysis(self, batch_id: str, analysis: Dict[str, Any]) -> None:
+        r = self.redis_client
+        r.set(f"batch:{batch_id}:analysis", json.dumps(analysis, ensure_ascii=False), ex=self.ttl)
+        r.hset(f"batch:{batch_id}", "status", "running")
+
+    def get_analysis(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.redis_client.get(f"batch:{batch_id}:analysis")
+        return json.loads(payload) if payload else None
+
+    def mark_failed(self, batch_id: str, error: str) -> None:
+        self.redis_client.hset(f"batch:{batch_id}", mapping={"status": "failed", "error": error})
+
+    def batch_of(self, debate_id: str) -> Optional[str]:
+        return self.redis_client.get(f"debate:{debate_id}:batch")
+
+    def launch_next(self, batch_id: str, scheduler: DebateScheduler) -> List[str]:
+        """
+        在 concurrency 範圍內把待送出的辯論交給排程器，並附上共用的賽前分析。
+        派送失敗的辯論記為失敗並補上下一場。
+        """
+        r = self.redis_client
+        jobs = []
+        with r.lock(f"batch:{batch_id}:lock", timeout=30, blocking_timeout=10):
+            state = r.hgetall(f"batch:{batch_id}")
+            if not state or state.get("status") != "running":
+                return []
+            analysis = self.get_analysis(batch_id)
+            running = int(state["launched"]) - int(state["completed"]) - int(state["failed"])
+            for _ in range(int(state["concurrency"]) - running):
+                payload = r.lpop(f"batch:{batch_id}:pending")
+                if payload is None:
+                    break
+                job = json.loads(payload)
+                job["analysis"] = analysis
+                r.hincrby(f"batch:{batch_id}", "launched", 1)
+                jobs.append(job)
+        if jobs:
+            self.renew_leases(batch_id, int(state["concurrency"]))
+
+        # 在 lock 外送出：派送失敗的回報（debate_finished）會再進入 launch_next
+        launched = []
+        for job in jobs:
+            result = scheduler.submit(job, state["tenant"], state["priority_class"])
+            if result["error"]:
+                self.debate_finished(job["debate_id"], False, scheduler)
+            else:
+                launched.append(job["debate_id"])
+        return launched
+
+    def record_result(self, batch_id: str, debate_id: str, success: bool) -> bool:
+        """
+        記錄一場辯論結束，回傳整個批次是否已全部結束。同一場辯論重複回報時只計第一次。
+        """
+        r = self.redis_client
+        key = f"batch:{batch_id}"
+        if r.sadd(f"{key}:done", debate_id):
+            r.expire(f"{key}:done", self.ttl)
+            r.hincrby(key, "completed" if success else "failed", 1)
+        state = r.hgetall(key)
+        finished = int(state["completed"]) + int(state["failed"]) >= int(state["total"])
+        if finished and state["status"] != "finished":
+            r.hset(key, mapping={"status": "finished", "finished_at": time.time()})
+        return finished
+
+    def debate_finished(self, debate_id: str, success: bool, scheduler: DebateScheduler) -> None:
+        """
+        批次內的辯論結束（含派送失敗與鏈式編排的 abort_debate）：記錄結果並補上下一場，
+        整個批次結束時釋放批次的名額。不屬於批次的辯論不做任何事。
+        """
+        batch_id = self.batch_of(debate_id)
+        if not batch_id:
+            return
+        if self.record_result(batch_id, debate_id, success):
+            self.release_leases(batch_id)
+        else:
+            self.renew_leases(batch_id)
+            self.launch_next(batch_id, scheduler)
+
+    def progress(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        批次的彙總進度；批次不存在時回傳 None。
+        """
+        r = self.redis_client
+        state = r.hgetall(f"batch:{batch_id}")
+        if not state:
+            return None
+        total = int(state["total"])
+        launched = int(state["launched"])
+        completed = int(state["completed"])
+        failed = int(state["failed"])
+        return {
+            "batch_id": batch_id,
+            "topic": state["topic"],
+            "status": state["status"],
+            "error": state.get("error"),
+            "total": total,
+            "concurrency": int(state["concurrency"]),
+            "refresh_analysis": bool(int(state.get("refresh_analysis", 0))),
+            "pending": total - launched,
+            "running": launched - completed - failed,
+            "completed": completed,
+            "failed": failed,
+            "progress": round((completed + failed) / total, 4) if total else 1.0,
+            "debate_ids": r.lrange(f"batch:{batch_id}:debates", 0, -1),
+        }
+
+
+batch_manager = BatchManager()
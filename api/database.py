@@ -1,24 +1,175 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import logging
 import os
 
+from api.metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
 # 使用環境變數或預設路徑
 db_path = os.getenv('DATABASE_URL', 'sqlite:///./data/debate.db')
-SQLALCHEMY_DATABASE_URL = db_path
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def normalize_database_url(database_url: str, use_async: bool = False) -> str:
+    """
+    將 DATABASE_URL 轉為 SQLAlchemy 可用的連線字串並選擇驅動。
+    - PostgreSQL：同步使用 psycopg，非同步使用 asyncpg（接受 postgres:// 簡寫）
+    - SQLite：非同步使用 aiosqlite
+    """
+    url = make_url(database_url.replace("postgres://", "postgresql://", 1))
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg" if use_async else "postgresql+psycopg")
+    elif backend == "sqlite" and use_async:
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+SQLALCHEMY_DATABASE_URL = normalize_database_url(db_path)
+ASYNC_SQLALCHEMY_DATABASE_URL = normalize_database_url(db_path, use_async=True)
+
+# SQLite 生產環境設定（API 與 Worker 會同時寫入同一個資料庫檔案）
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-16000")),  # 負值單位為 KiB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+
+def get_engine_options(database_url: str) -> dict:
+    """
+    依資料庫類型產生 create_engine 參數。
+    SQLite 檔案資料庫使用連線池並設定 busy timeout；記憶體資料庫維持預設的單一連線。
+    """
+    url = make_url(database_url)
+    options = {"pool_pre_ping": True}
+
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+        return options
+
+    options["connect_args"] = {
+        "check_same_thread": False,
+        # sqlite3 驅動層的鎖等待秒數，與 PRAGMA busy_timeout 一致
+        "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+    }
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def configure_sqlite_connection(dbapi_connection, connection_record=None):
+    """
+    在每條新連線上套用 SQLite PRAGMA。
+    WAL 讓讀取不阻塞寫入，busy_timeout 讓寫入衝突時等待而不是立刻拋出 database is locked。
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(database_url: str):
+    """
+    建立資料庫引擎；SQLite 會自動建立資料目錄並掛上 PRAGMA 設定。
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        directory = os.path.dirname(os.path.abspath(url.database))
+        os.makedirs(directory, exist_ok=True)
+
+    db_engine = create_engine(database_url, **get_engine_options(database_url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(db_engine, "connect", configure_sqlite_connection)
+    instrument_engine(db_engine)
+    return db_engine
+
+
+def create_async_db_engine(database_url: str):
+    """
+    建立非同步資料庫引擎（API 的 CRUD 路由使用），PRAGMA 設定與同步引擎相同。
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(database_url)
+    async_engine = create_async_engine(database_url, **get_engine_options(database_url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", configure_sqlite_connection)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同步引擎延遲建立：Worker 只使用同步 session，不需要載入 greenlet / asyncpg / aiosqlite
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """
+    建立一個非同步 session（用法與 SessionLocal 相同）。
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory()
+
 Base = declarative_base()
 
 def init_db():
     """初始化資料庫，創建所有表"""
     # 導入所有 models 以確保它們被註冊
     from api import models
-    
+
     # 使用 models.Base 而不是本地 Base
     models.Base.metadata.create_all(bind=engine)
-    print("Database initialized successfully!")
+
+    # create_all 不會替既有的表補上新索引，這裡逐一檢查並建立
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # 建立辯論存檔全文檢索索引（同時註冊存檔寫入時的索引事件）
+    from api import search_index
+    search_index.init_search_index(engine)
+    logger.info("Database initialized successfully!")
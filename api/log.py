@@ -0,0 +1,194 @@
+"""
+日誌設定
+
+api / worker / adapters 的模組以 logging.getLogger(__name__) 記錄日誌，由這裡統一設定輸出：
+- LOG_LEVEL：預設等級（預設 INFO）
+- LOG_LEVELS：個別模組的等級，以 logger 名稱（模組路徑）指定，例如 "worker.llm_utils=DEBUG,adapters=WARNING"
+- LOG_FORMAT：text（預設）或 json（一行一個 JSON 物件，方便送往日誌系統）
+- LOG_MAX_CHARS：單則訊息的長度上限（預設 2000），超過的部分截斷
+- LOG_PREVIEW_CHARS：preview() 的長度上限（預設 300）
+- LOG_SAMPLE_EVERY：標記為高頻的訊息（extra=sample()）每幾則輸出一則（預設 1，全部輸出）
+
+熱路徑上的日誌注意事項：
+- 一律以 % 參數延遲格式化（logger.debug("result: %s", preview(result))），等級未啟用時不會把內容轉成字串
+- 大型內容（LLM 回應、工具結果、API 回應）以 preview() 包裝，只格式化前幾筆、前幾個字
+- 高頻訊息（每回合、每次呼叫的內容摘要）加上 extra=sample()，依 LOG_SAMPLE_EVERY 抽樣輸出
+輸出前會遮蔽 api_key / token / password 等欄位的值，以及環境變數 *_API_KEY、*_TOKEN、*_SECRET、*_PASSWORD 的值。
+"""
+
+import json
+import logging
+import os
+import re
+import reprlib
+import sys
+import threading
+from typing import Any, Dict, List, Optional, TextIO
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "2000"))
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "300"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "1"))
+
+PACKAGES = ("api", "worker", "adapters")
+SECRET_ENV_SUFFIXES = ("_API_KEY", "_TOKEN", "_SECRET", "_PASSWORD")
+_SECRET_FIELD = re.compile(
+    r"((?<![A-Za-z_])(?:api[_-]?key|access[_-]?token|token|secret|password|authorization)['\"]?\s*[:=]\s*['\"]?)([^'\"\s&,;}]+)",
+    re.IGNORECASE,
+)
+
+_secret_values: List[str] = []
+_module_levels: List[str] = []
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}…(+{len(text) - limit} chars)"
+
+
+def redact(text: str) -> str:
+    """
+    遮蔽訊息中的機密。
+    """
+    for value in _secret_values:
+        if value in text:
+            text = text.replace(value, "***")
+    return _SECRET_FIELD.sub(r"\1***", text)
+
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 3
+_repr.maxdict = 10
+_repr.maxlist = 10
+_repr.maxstring = 80
+_repr.maxother = 80
+
+
+class _Preview:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int]):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        # reprlib 只走訪容器的前幾筆，不會先把整個大型結果轉成字串
+        text = self.value if isinstance(self.value, str) else _repr.repr(self.value)
+        return truncate(text, self.limit or LOG_PREVIEW_CHARS)
+
+
+def preview(value: Any, limit: Optional[int] = None) -> _Preview:
+    """
+    延遲格式化的內容摘要：實際輸出時才轉成字串，且只取前 limit 個字。
+    """
+    return _Preview(value, limit)
+
+
+def sample(every: Optional[int] = None) -> Dict[str, int]:
+    """
+    給 logger 的 extra：同一則訊息（同 logger、同格式字串）每 every（預設 LOG_SAMPLE_EVERY）則只輸出一則。
+    """
+    return {"sample_every": every or LOG_SAMPLE_EVERY}
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self._counts: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample_every", 1)
+        if every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._counts.get(key, 0)
+            self._counts[key] = seen + 1
+        return seen % every == 0
+
+
+class SafeFormatter(logging.Formatter):
+    """
+    截斷過長的訊息並遮蔽機密；json=True 時輸出 JSON Lines。
+    """
+
+    def __init__(self, json_output: bool = False):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = redact(truncate(record.getMessage(), LOG_MAX_CHARS))
+        every = getattr(record, "sample_every", 1)
+        if every > 1:
+            message += f" [sampled 1/{every}]"
+        error = redact(self.formatException(record.exc_info)) if record.exc_info else None
+        if self.json_output:
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+            }
+            if error:
+                entry["error"] = error
+            return json.dumps(entry, ensure_ascii=False)
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {message}"
+        return f"{line}\n{error}" if error else line
+
+
+def _parse_levels(value: str) -> Dict[str, str]:
+    levels = {}
+    for item in value.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(
+    level: Optional[str] = None,
+    levels: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> None:
+    """
+    依 LOG_LEVEL / LOG_LEVELS / LOG_FORMAT（或參數）設定 api、worker、adapters 的 logger。
+    這些 logger 不往 root 傳遞，Celery / uvicorn 的 root logger 設定不會重複輸出。
+    """
+    global _secret_values
+    _secret_values = [
+        value for key, value in os.environ.items()
+        if key.upper().endswith(SECRET_ENV_SUFFIXES) and len(value) >= 6
+    ]
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(SafeFormatter(json_output=(fmt or LOG_FORMAT).lower() == "json"))
+    handler.addFilter(SamplingFilter())
+    for package in PACKAGES:
+        logger = logging.getLogger(package)
+        logger.handlers = [handler]
+        logger.propagate = False
+        _set_level(logger, level or LOG_LEVEL)
+
+    for name in _module_levels:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _module_levels.clear()
+    for name, module_level in _parse_levels(LOG_LEVELS if levels is None else levels).items():
+        if _set_level(logging.getLogger(name), module_level):
+            _module_levels.append(name)
+
+
+def _set_level(logger: logging.Logger, level: str) -> bool:
+    try:
+        logger.setLevel(level.upper())
+        return True
+    except ValueError:
+        logger.warning("Unknown log level '%s' for logger '%s'", level, logger.name)
+        return False
+
+
+configure()
@@ -2,74 +2,88 @@
 import sys
 sys.path.insert(0, '/app')
 
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import asyncio
+import contextlib
+import functools
+import logging
 import redis
+import redis.asyncio
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-from api import schemas, models
-from api.database import SessionLocal, engine, init_db
-from worker.celery_app import app as celery_app
-from api.tool_registry import tool_registry
-from adapters.searxng_adapter import SearXNGAdapter
-from adapters.duckduckgo_adapter import DuckDuckGoAdapter
-from adapters.yfinance_adapter import YFinanceAdapter
-from adapters.tej_adapter import (
-    TEJCompanyInfo, TEJStockPrice, TEJMonthlyRevenue, TEJInstitutionalHoldings,
-    TEJMarginTrading, TEJForeignHoldings, TEJFinancialSummary, TEJFundNAV,
-    TEJShareholderMeeting, TEJFundBasicInfo, TEJOffshoreFundInfo, TEJOffshoreFundDividend,
-    TEJOffshoreFundHoldingsRegion, TEJOffshoreFundHoldingsIndustry, TEJOffshoreFundNAVRank,
-    TEJOffshoreFundNAVDaily, TEJOffshoreFundSuspension, TEJOffshoreFundPerformance,
-    TEJIFRSAccountDescriptions, TEJFinancialCoverCumulative, TEJFinancialSummaryQuarterly,
-    TEJFinancialCoverQuarterly, TEJFuturesData, TEJOptionsBasicInfo, TEJOptionsDailyTrading
-)
+from api import schemas, models, search_index, metrics, log  # log：設定各模組的 logger
+from api.database import SessionLocal, AsyncSessionLocal, engine, init_db
+from api.admission import admission_controller, resolve_client_id
+from api.scheduling import debate_scheduler, resolve_priority, DEBATE_DISPATCH_INTERVAL
+from api.batches import batch_manager, BATCH_MAX_CONCURRENCY
+from worker.celery_app import app as celery_app, DEBATE_ORCHESTRATION, DEBATES_QUEUE, LLM_QUEUE, TOOLS_QUEUE, queue_keys
+from worker.orchestration import enqueue_debate
+from api.tool_registry import ToolNotFoundError, tool_registry
+from api.tool_manifest import register_builtin_tools
 
 # 初始化資料庫
 init_db()
 
-# 註冊工具
-tool_registry.register(SearXNGAdapter())
-tool_registry.register(DuckDuckGoAdapter())
-tool_registry.register(YFinanceAdapter())
-tool_registry.register(TEJCompanyInfo())
-tool_registry.register(TEJStockPrice())
-tool_registry.register(TEJMonthlyRevenue())
-tool_registry.register(TEJInstitutionalHoldings())
-tool_registry.register(TEJMarginTrading())
-tool_registry.register(TEJForeignHoldings())
-tool_registry.register(TEJFinancialSummary())
-tool_registry.register(TEJFundNAV())
-tool_registry.register(TEJShareholderMeeting())
-tool_registry.register(TEJFundBasicInfo())
-tool_registry.register(TEJOffshoreFundInfo())
-tool_registry.register(TEJOffshoreFundDividend())
-tool_registry.register(TEJOffshoreFundHoldingsRegion())
-tool_registry.register(TEJOffshoreFundHoldingsIndustry())
-tool_registry.register(TEJOffshoreFundNAVRank())
-tool_registry.register(TEJOffshoreFundNAVDaily())
-tool_registry.register(TEJOffshoreFundSuspension())
-tool_registry.register(TEJOffshoreFundPerformance())
-tool_registry.register(TEJIFRSAccountDescriptions())
-tool_registry.register(TEJFinancialCoverCumulative())
-tool_registry.register(TEJFinancialSummaryQuarterly())
-tool_registry.register(TEJFinancialCoverQuarterly())
-tool_registry.register(TEJFuturesData())
-tool_registry.register(TEJOptionsBasicInfo())
-tool_registry.register(TEJOptionsDailyTrading())
+# 註冊工具（宣告式、延遲載入：adapter 模組在第一次使用時才 import）
+register_builtin_tools()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
 # Redis 連線
 redis_host = os.getenv('REDIS_HOST', 'localhost')
 redis_client = redis.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
-
+# SSE 訂閱用的非同步連線：等待訊息時不佔用 executor 的執行緒
+async_redis_client = redis.asyncio.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
+admission_controller.redis_client = redis_client
+debate_scheduler.redis_client = redis_client
+debate_scheduler.admission = admission_controller
+batch_manager.redis_client = redis_client
+batch_manager.admission = admission_controller
+debate_scheduler.sender = functools.partial(enqueue_debate, celery_app, orchestration=DEBATE_ORCHESTRATION)
+debate_scheduler.on_failure = functools.partial(batch_manager.debate_finished, success=False, scheduler=debate_scheduler)
+
+
+async def _dispatch_periodically(executor: ThreadPoolExecutor):
+    """
+    定期派送排隊中的辯論：執行中的 worker 都異常終止時沒有 complete() 觸發派送，
+    由這裡在心跳逾期的空位回收後送出下一場（見 api/scheduling.py）。
+    派送會阻塞，在專屬的 executor 執行，不佔用 asyncio 預設 executor 的執行緒。
+    """
+    while True:
+        await asyncio.sleep(DEBATE_DISPATCH_INTERVAL)
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, debate_scheduler.dispatch)
+        except Exception as e:
+            logger.error("Periodic debate dispatch failed: %s", e)
+
+@app.on_event("startup")
+async def _start_dispatch_loop():
+    app.state.dispatch_task = None
+    if DEBATE_DISPATCH_INTERVAL > 0:
+        app.state.dispatch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debate-dispatch")
+        app.state.dispatch_task = asyncio.create_task(_dispatch_periodically(app.state.dispatch_executor))
+
+@app.on_event("shutdown")
+async def _stop_dispatch_loop():
+    task = getattr(app.state, "dispatch_task", None)
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        app.state.dispatch_executor.shutdown(wait=False)
 
 
 # Dependency
@@ -83,14 +97,21 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    獲取非同步資料庫 session 的相依性函數（CRUD 路由使用，不佔用 threadpool）。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # --- Agent Management API ---
 
 @app.get("/api/v1/agents", response_model=List[schemas.Agent])
-def list_agents(
+async def list_agents(
     skip: int = 0,
     limit: int = 100,
     role: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     列出所有 Agent。
@@ -99,16 +120,16 @@ def list_agents(
     - limit: 返回的最大數量
     - role: 篩選角色（debater, chairman, analyst）
     """
-    query = db.query(models.Agent)
+    query = select(models.Agent)
     
     if role:
-        query = query.filter(models.Agent.role == role)
+        query = query.where(models.Agent.role == role)
     
-    agents = query.offset(skip).limit(limit).all()
-    return agents
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 @app.post("/api/v1/agents", response_model=schemas.Agent, status_code=201)
-def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db)):
+async def create_agent(agent: schemas.AgentCreate, db: AsyncSession = Depends(get_async_db)):
     """
     創建新的 Agent。
     """
@@ -130,17 +151,17 @@ def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_agent)
-    db.commit()
-    db.refresh(db_agent)
+    await db.commit()
+    await db.refresh(db_agent)
     
     return db_agent
 
 @app.get("/api/v1/agents/{agent_id}", response_model=schemas.Agent)
-def get_agent(agent_id: str, db: Session = Depends(get_db)):
+async def get_agent(agent_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     獲取特定 Agent 的詳細資訊。
     """
-    agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+    agent = await db.get(models.Agent, agent_id)
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
@@ -148,16 +169,16 @@ def get_agent(agent_id: str, db: Session = Depends(get_db)):
     return agent
 
 @app.put("/api/v1/agents/{agent_id}", response_model=schemas.Agent)
-def update_agent(
+async def update_agent(
     agent_id: str,
     agent_update: schemas.AgentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     更新 Agent 的資訊。
     只更新提供的欄位（部分更新）。
     """
-    db_agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+    db_agent = await db.get(models.Agent, agent_id)
     
     if not db_agent:
         raise HTTPException(status_code=404, detail="Agent not found")
@@ -177,26 +198,26 @@ def update_agent(
     for field, value in update_data.items():
         setattr(db_agent, field, value)
     
-    db.commit()
-    db.refresh(db_agent)
+    await db.commit()
+    await db.refresh(db_agent)
     
     return db_agent
 
 @app.delete("/api/v1/agents/{agent_id}", status_code=204)
-def delete_agent(agent_id: str, db: Session = Depends(get_db)):
+async def delete_agent(agent_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     刪除 Agent。
     注意：如果 Agent 正在被使用中的辯論引用，應該先檢查。
     """
-    db_agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+    db_agent = await db.get(models.Agent, agent_id)
     
     if not db_agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     # TODO: 檢查是否有正在進行的辯論使用此 Agent
     
-    db.delete(db_agent)
-    db.commit()
+    await db.delete(db_agent)
+    await db.commit()
     
     return None
 
@@ -231,7 +252,7 @@ from api import toolset_schemas
 from api.toolset_service import ToolSetService
 
 @app.post("/api/v1/toolsets", response_model=toolset_schemas.ToolSet, status_code=201)
-def create_toolset(toolset: toolset_schemas.ToolSetCreate, db: Session = Depends(get_db)):
+async def create_toolset(toolset: toolset_schemas.ToolSetCreate, db: AsyncSession = Depends(get_async_db)):
     """創建新的工具集"""
     db_toolset = models.ToolSet(
         name=toolset.name,
@@ -240,22 +261,23 @@ def create_toolset(toolset: toolset_schemas.ToolSetCreate, db: Session = Depends
         is_global=toolset.is_global
     )
     db.add(db_toolset)
-    db.commit()
-    db.refresh(db_toolset)
+    await db.commit()
+    await db.refresh(db_toolset)
     return db_toolset
 
 @app.get("/api/v1/toolsets", response_model=List[toolset_schemas.ToolSet])
-def list_toolsets(
+async def list_toolsets(
     skip: int = 0,
     limit: int = 100,
     is_global: Optional[bool] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """列出所有工具集"""
-    query = db.query(models.ToolSet)
+    query = select(models.ToolSet)
     if is_global is not None:
-        query = query.filter(models.ToolSet.is_global == is_global)
-    return query.offset(skip).limit(limit).all()
+        query = query.where(models.ToolSet.is_global == is_global)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 @app.get("/api/v1/toolsets/{toolset_id}")
 def get_toolset(toolset_id: str, db: Session = Depends(get_db)):
@@ -266,13 +288,13 @@ def get_toolset(toolset_id: str, db: Session = Depends(get_db)):
     return toolset_details
 
 @app.put("/api/v1/toolsets/{toolset_id}", response_model=toolset_schemas.ToolSet)
-def update_toolset(
+async def update_toolset(
     toolset_id: str,
     toolset_update: toolset_schemas.ToolSetUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新工具集"""
-    db_toolset = db.query(models.ToolSet).filter(models.ToolSet.id == toolset_id).first()
+    db_toolset = await db.get(models.ToolSet, toolset_id)
     if not db_toolset:
         raise HTTPException(status_code=404, detail="ToolSet not found")
     
@@ -280,53 +302,53 @@ def update_toolset(
     for field, value in update_data.items():
         setattr(db_toolset, field, value)
     
-    db.commit()
-    db.refresh(db_toolset)
+    await db.commit()
+    await db.refresh(db_toolset)
     return db_toolset
 
 @app.delete("/api/v1/toolsets/{toolset_id}", status_code=204)
-def delete_toolset(toolset_id: str, db: Session = Depends(get_db)):
+async def delete_toolset(toolset_id: str, db: AsyncSession = Depends(get_async_db)):
     """刪除工具集"""
-    db_toolset = db.query(models.ToolSet).filter(models.ToolSet.id == toolset_id).first()
+    db_toolset = await db.get(models.ToolSet, toolset_id)
     if not db_toolset:
         raise HTTPException(status_code=404, detail="ToolSet not found")
     if db_toolset.is_global:
         raise HTTPException(status_code=400, detail="Cannot delete global toolset")
     
-    db.query(models.AgentToolSet).filter(models.AgentToolSet.toolset_id == toolset_id).delete()
-    db.delete(db_toolset)
-    db.commit()
+    await db.execute(delete(models.AgentToolSet).where(models.AgentToolSet.toolset_id == toolset_id))
+    await db.delete(db_toolset)
+    await db.commit()
     return None
 
 # Agent-ToolSet Association
 
 @app.post("/api/v1/agents/{agent_id}/toolsets", response_model=toolset_schemas.AgentToolSetResponse, status_code=201)
-def assign_toolset_to_agent(
+async def assign_toolset_to_agent(
     agent_id: str,
     assignment: toolset_schemas.AgentToolSetAssign,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """分配工具集給 Agent"""
-    agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+    agent = await db.get(models.Agent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    toolset = db.query(models.ToolSet).filter(models.ToolSet.id == assignment.toolset_id).first()
+    toolset = await db.get(models.ToolSet, assignment.toolset_id)
     if not toolset:
         raise HTTPException(status_code=404, detail="ToolSet not found")
     
-    existing = db.query(models.AgentToolSet).filter(
+    existing = (await db.execute(select(models.AgentToolSet).where(
         models.AgentToolSet.agent_id == agent_id,
         models.AgentToolSet.toolset_id == assignment.toolset_id
-    ).first()
+    ))).scalars().first()
     
     if existing:
         raise HTTPException(status_code=400, detail="ToolSet already assigned")
     
     db_assignment = models.AgentToolSet(agent_id=agent_id, toolset_id=assignment.toolset_id)
     db.add(db_assignment)
-    db.commit()
-    db.refresh(db_assignment)
+    await db.commit()
+    await db.refresh(db_assignment)
     return db_assignment
 
 @app.get("/api/v1/agents/{agent_id}/toolsets")
@@ -336,30 +358,7 @@ def get_agent_toolsets(agent_id: str, db: Session = Depends(get_db)):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    assigned_toolsets = []
-    agent_toolsets = db.query(models.AgentToolSet).filter(models.AgentToolSet.agent_id == agent_id).all()
-    
-    for ats in agent_toolsets:
-        toolset = db.query(models.ToolSet).filter(models.ToolSet.id == ats.toolset_id).first()
-        if toolset:
-            assigned_toolsets.append({
-                "id": toolset.id,
-                "name": toolset.name,
-                "description": toolset.description,
-                "tool_count": len(toolset.tool_names),
-                "source": "assigned"
-            })
-    
-    global_toolsets = db.query(models.ToolSet).filter(models.ToolSet.is_global == True).all()
-    for toolset in global_toolsets:
-        assigned_toolsets.append({
-            "id": toolset.id,
-            "name": toolset.name,
-            "description": toolset.description,
-            "tool_count": len(toolset.tool_names),
-            "source": "global"
-        })
-    
+    assigned_toolsets = ToolSetService.get_agent_toolsets(db, agent_id)
     return {"agent_id": agent_id, "agent_name": agent.name, "toolsets": assigned_toolsets}
 
 @app.get("/api/v1/agents/{agent_id}/available-tools")
@@ -371,16 +370,16 @@ def get_agent_available_tools(agent_id: str, db: Session = Depends(get_db)):
     return ToolSetService.get_agent_available_tools(db, agent_id)
 
 @app.delete("/api/v1/agents/{agent_id}/toolsets/{toolset_id}", status_code=204)
-def remove_toolset_from_agent(agent_id: str, toolset_id: str, db: Session = Depends(get_db)):
+async def remove_toolset_from_agent(agent_id: str, toolset_id: str, db: AsyncSession = Depends(get_async_db)):
     """移除 Agent 的工具集分配"""
-    assignment = db.query(models.AgentToolSet).filter(
+    assignment = (await db.execute(select(models.AgentToolSet).where(
         models.AgentToolSet.agent_id == agent_id,
         models.AgentToolSet.toolset_id == toolset_id
-    ).first()
+    ))).scalars().first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    db.delete(assignment)
-    db.commit()
+    await db.delete(assignment)
+    await db.commit()
     return None
 
 @app.post("/api/v1/toolsets/initialize-global")
@@ -390,66 +389,249 @@ def initialize_global_toolset(db: Session = Depends(get_db)):
 
 # --- Debates API ---
 
+def _resolve_client_id(request: Request, config: dict) -> str:
+    """
+    辨識發起辯論的客戶端（租戶）：來源 IP；經由 TRUSTED_PROXIES 送來時才採用 config / 標頭中的 ID（見 api/admission.py）。
+    """
+    return resolve_client_id(request.client.host if request.client else None, request.headers, config)
+
+def _queue_depths() -> dict:
+    """
+    各 Celery 佇列中等待的任務數（含所有優先權）。
+    """
+    return {
+        name: sum(redis_client.llen(key) for key in queue_keys(name))
+        for name in (DEBATES_QUEUE, LLM_QUEUE, TOOLS_QUEUE)
+    }
+
 @app.post("/api/v1/debates", status_code=201)
-def create_debate(debate: schemas.DebateCreate, background_tasks: BackgroundTasks):
+def create_debate(debate: schemas.DebateCreate, request: Request, background_tasks: BackgroundTasks):
     """
     創建一個新的辯論。
     接收辯論主題和配置，並觸發背景任務開始辯論。
+    超過全域或單一客戶端的同時辯論上限時回傳 429，並以 Retry-After 提示重試時間。
+    config.priority（interactive / batch 或 0-9）決定排程優先權，同一優先權內各租戶公平輪流。
+    config.refresh_analysis 為 true 時不沿用快取的賽前分析。
     """
     # 提供預設配置
     config = debate.config or {}
     pro_team = config.get('pro_team', [])
     con_team = config.get('con_team', [])
     rounds = config.get('rounds', 3)
-    
-    task = celery_app.send_task(
-        'worker.tasks.run_debate_cycle', 
-        args=[
-            debate.topic,
-            pro_team, 
-            con_team, 
-            rounds
-        ]
-    )
+    try:
+        priority_class, priority = resolve_priority(config)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    client_id = _resolve_client_id(request, config)
+
+    # 先取得名額再排程，避免超量的辯論堆積在 broker
+    debate_id = str(uuid.uuid4())
+    decision = admission_controller.admit(debate_id, client_id)
+    if not decision.admitted:
+        metrics.RATE_LIMITED.labels("admission").inc()
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Too many active debates", **decision.to_dict()},
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+
     # 將任務 ID 存儲到 Redis，以便後續查詢
-    redis_client.set(f"debate:{task.id}:topic", debate.topic)
-    return {"task_id": task.id, "status": "Debate started"}
+    redis_client.set(f"debate:{debate_id}:topic", debate.topic)
+    job = {
+        "debate_id": debate_id,
+        "topic": debate.topic,
+        "pro_team": pro_team,
+        "con_team": con_team,
+        "rounds": rounds,
+        "priority": priority,
+        "refresh_analysis": bool(config.get('refresh_analysis', False))
+    }
+    try:
+        scheduled = debate_scheduler.submit(job, client_id, priority_class)
+    except Exception:
+        admission_controller.release(debate_id)
+        raise
+    if scheduled["error"]:
+        # 排程器已釋放名額並標記失敗
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "Debate could not be dispatched", "task_id": debate_id, "error": scheduled["error"]}
+        )
+    return {
+        "task_id": debate_id,
+        "status": "Debate started" if scheduled["dispatched"] else "Debate queued",
+        "priority": priority_class,
+        "active_debates": decision.active,
+        "pending_debates": scheduled["pending_debates"]
+    }
+
+@app.post("/api/v1/debates/batch", status_code=201)
+def create_debate_batch(batch: schemas.DebateBatchCreate, request: Request):
+    """
+    以同一辯題、多組隊伍配置建立批次辯論。
+    賽前分析與工具快取預熱只做一次，之後以 concurrency 為上限分批執行各場辯論。
+    每個同時執行的辯論佔用一個准入名額，concurrency 不超過客戶端剩餘的名額；一個都取不到時回傳 429。
+    priority 預設為 batch。
+    """
+    if not batch.teams:
+        raise HTTPException(status_code=422, detail="teams must contain at least one team configuration")
+    config = {"priority": "batch", **(batch.config or {})}
+    try:
+        priority_class, priority = resolve_priority(config)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    client_id = _resolve_client_id(request, config)
+    concurrency = max(1, min(int(config.get('concurrency', BATCH_MAX_CONCURRENCY)), BATCH_MAX_CONCURRENCY))
+
+    batch_id = f"batch-{uuid.uuid4()}"
+    concurrency, decision = batch_manager.admit(
+        batch_id, client_id, min(concurrency, len(batch.teams)), admission_controller
+    )
+    if concurrency == 0:
+        metrics.RATE_LIMITED.labels("admission").inc()
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Too many active debates", **decision.to_dict()},
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+
+    jobs = [
+        {
+            "debate_id": str(uuid.uuid4()),
+            "topic": batch.topic,
+            "pro_team": team.get('pro_team', []),
+            "con_team": team.get('con_team', []),
+            "rounds": team.get('rounds', config.get('rounds', 3)),
+            "priority": priority
+        }
+        for team in batch.teams
+    ]
+    try:
+        batch_manager.create(
+            batch_id, batch.topic, jobs, concurrency, client_id, priority_class,
+            refresh_analysis=bool(config.get('refresh_analysis', False))
+        )
+        celery_app.send_task('worker.tasks.prepare_batch', args=[batch_id], priority=priority)
+    except Exception:
+        batch_manager.release_leases(batch_id, concurrency)
+        raise
+    return batch_manager.progress(batch_id)
+
+@app.get("/api/v1/debates/batch/{batch_id}")
+def get_debate_batch(batch_id: str):
+    """
+    批次辯論的彙總進度。
+    """
+    progress = batch_manager.progress(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return progress
+
+@app.get("/api/v1/debates/queue")
+def get_debate_queue(client_id: Optional[str] = None):
+    """
+    回傳名額使用狀況、排程器待派送的辯論數與各 Celery 佇列中等待的任務數。
+    """
+    status = admission_controller.status(client_id)
+    status["scheduler"] = debate_scheduler.status()
+    status["queues"] = _queue_depths()
+    return status
 
 @app.get("/api/v1/debates", response_model=List[schemas.DebateArchive])
-def list_debates(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_debates(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """
     列出所有已存檔的辯論。
     """
-    debates = db.query(models.DebateArchive).offset(skip).limit(limit).all()
-    return debates
+    result = await db.execute(select(models.DebateArchive).offset(skip).limit(limit))
+    return result.scalars().all()
 
+@app.get("/api/v1/debates/search", response_model=schemas.DebateSearchResult)
+def search_debates(
+    q: str = Query(..., min_length=1, description="檢索關鍵字，以空白分隔多個詞"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    全文檢索已存檔的辯論（主題、賽前分析與各回合發言），依相關度排序並回傳片段。
+    """
+    try:
+        return search_index.search_debates(db, q, skip=skip, limit=limit)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
 
 @app.get("/api/v1/debates/{task_id}")
 def get_debate_status(task_id: str):
     """
-    根據任務 ID 獲取辯論的當前狀態。
+    根據任務 ID 獲取辯論的當前狀態，以及到目前為止的 token / 成本統計（見 worker/usage.py）。
+    派送失敗或鏈式編排中途失敗的辯論沒有最後一個任務的結果，以排程器記錄的錯誤回報 FAILURE。
     """
-    status = celery_app.AsyncResult(task_id).status
     topic = redis_client.get(f"debate:{task_id}:topic")
     if not topic:
         raise HTTPException(status_code=404, detail="Debate not found")
-    return {"task_id": task_id, "topic": topic, "status": status}
+    error = redis_client.get(f"debate:{task_id}:error")
+    status = "FAILURE" if error else celery_app.AsyncResult(task_id).status
+    usage = redis_client.get(f"debate:{task_id}:usage")
+    return {
+        "task_id": task_id,
+        "topic": topic,
+        "status": status,
+        "error": error,
+        "usage": json.loads(usage) if usage else None
+    }
+
+# SSE 串流等待新訊息的間隔（秒）：每隔這麼久檢查一次客戶端是否已斷線
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "1"))
+
+def _is_debate_end(data: str) -> bool:
+    """
+    辯論結束的訊息（DebateCycle 發布的 "Debate '...' has ended."）。
+    """
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return False
+    return message.get("role") == "System" and str(message.get("content", "")).endswith("has ended.")
 
 @app.get("/api/v1/debates/{task_id}/stream")
-async def stream_debate(task_id: str):
+async def stream_debate(task_id: str, request: Request):
     """
     透過 Server-Sent Events (SSE) 實時串流辯論的思考流。
-    """
-    def event_stream():
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe(f"debate:{task_id}:log_stream")
-        for message in pubsub.listen():
-            if message['type'] == 'message':
+    辯論結束或客戶端斷線時結束串流並關閉 Redis 訂閱。
+    """
+    async def event_stream():
+        pubsub = async_redis_client.pubsub()
+        await pubsub.subscribe(f"debate:{task_id}:log_stream")
+        metrics.SSE_SUBSCRIBERS.inc()
+        try:
+            # 以逾時輪詢取代阻塞的 listen()：沒有新訊息時也會回到這裡檢查斷線
+            while not await request.is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_POLL_SECONDS)
+                if message is None or message['type'] != 'message':
+                    continue
                 yield f"data: {message['data']}\n\n"
-    
+                if _is_debate_end(message['data']):
+                    break
+        finally:
+            metrics.SSE_SUBSCRIBERS.dec()
+            await pubsub.aclose()
+
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus 指標（見 api/metrics.py）。進行中的辯論數在抓取時從 Redis 讀取。
+    """
+    try:
+        metrics.ACTIVE_DEBATES.set(admission_controller.status()["active_debates"])
+    except redis.RedisError as e:
+        logger.error("Error reading active debates for metrics: %s", e)
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+
 # --- Agents API ---
 
 @app.get("/tools")
@@ -457,7 +639,7 @@ def list_tools():
     """
     列出所有可用的工具。
     """
-    return {"tools": [tool["instance"].name for tool in tool_registry.get_tools()]}
+    return {"tools": [tool_id.split(':')[0] for tool_id in tool_registry.tool_ids()]}
 
 
 @app.post("/api/v1/agents", response_model=schemas.Agent)
@@ -538,18 +720,30 @@ def list_tools():
     }
 
 from jsonschema import validate, ValidationError
+
+TOOL_TEST_TIMEOUT = float(os.getenv("TOOL_TEST_TIMEOUT", "20"))
+
 @app.post("/api/v1/tools/test")
 async def test_tool(tool_test: schemas.ToolTest):
     """
     測試單一工具的執行，包括參數驗證和快取。
+    工具在有界執行緒池中執行，不會阻塞 event loop（其他請求與 SSE 串流）。
     """
-    result = tool_registry.invoke_tool(tool_test.name, tool_test.kwargs)
+    timeout = tool_test.timeout or TOOL_TEST_TIMEOUT
+    try:
+        result = await tool_registry.ainvoke_tool(tool_test.name, tool_test.kwargs, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Tool '{tool_test.name}' timed out after {timeout}s")
+    except ToolNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    # 工具本身拋出的其他例外不攔截，以 500 回應
     if "error" in result:
-        # 根據錯誤類型返回不同的狀態碼
+        # 根據錯誤類型返回不同的狀態碼：參數錯誤 400、超過速率限制 429，其餘為工具執行失敗 502
         if "Parameter validation failed" in result["error"]:
             raise HTTPException(status_code=400, detail=result["error"])
-        else:
-            raise HTTPException(status_code=404, detail=result["error"])
+        if result["error"] == "Rate limit exceeded":
+            raise HTTPException(status_code=429, detail=result["error"])
+        raise HTTPException(status_code=502, detail=result["error"])
     return {"tool": tool_test.name, "result": result}
 
 
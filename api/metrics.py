@@ -0,0 +1,126 @@
+"""
+Prometheus 指標
+
+API 在 GET /metrics 輸出；Celery worker 設定 WORKER_METRICS_PORT 後在該埠啟動 exporter（見 worker/celery_app.py）。
+prefork 的 worker 有多個子行程，需設定 PROMETHEUS_MULTIPROC_DIR（每次啟動前清空）才能彙總各行程的數值。
+
+- debate_llm_call_seconds{model}                  LLM 呼叫耗時
+- debate_llm_tokens_total{model,kind}             prompt / completion token 數
+- debate_llm_tokens_per_second{model}             生成速度（eval_count / eval_duration）
+- debate_llm_errors_total{model}
+- debate_tool_invoke_seconds{tool}                工具呼叫耗時
+- debate_tool_invocations_total{tool,outcome}     outcome：hit / miss / error；
+  快取命中率 = hit / (hit + miss)
+- debate_rate_limited_total{scope}                scope：tool（工具速率限制）/ admission（辯論准入 429）
+- debate_active_debates                           進行中的辯論數（API 端，抓取時讀取 Redis）
+- debate_sse_subscribers                          目前的 SSE 訂閱數
+- debate_db_query_seconds{operation}              SQL 執行耗時（SELECT / INSERT / ...）
+
+指標更新只是在記憶體中加總，對熱路徑的開銷可以忽略。
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+FAST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 120, 160, 240, 320)
+
+LLM_CALL_SECONDS = Histogram("debate_llm_call_seconds", "LLM call latency", ["model"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Counter("debate_llm_tokens_total", "LLM tokens processed", ["model", "kind"])
+LLM_TOKENS_PER_SECOND = Histogram("debate_llm_tokens_per_second", "LLM generation speed", ["model"], buckets=TOKEN_RATE_BUCKETS)
+LLM_ERRORS = Counter("debate_llm_errors_total", "Failed LLM calls", ["model"])
+TOOL_INVOKE_SECONDS = Histogram("debate_tool_invoke_seconds", "Tool invocation latency", ["tool"], buckets=FAST_BUCKETS)
+TOOL_INVOCATIONS = Counter("debate_tool_invocations_total", "Tool invocations by outcome", ["tool", "outcome"])
+RATE_LIMITED = Counter("debate_rate_limited_total", "Requests rejected by a rate or admission limit", ["scope"])
+ACTIVE_DEBATES = Gauge("debate_active_debates", "Debates currently holding an admission lease", multiprocess_mode="max")
+SSE_SUBSCRIBERS = Gauge("debate_sse_subscribers", "Open SSE debate streams", multiprocess_mode="livesum")
+DB_QUERY_SECONDS = Histogram("debate_db_query_seconds", "Database statement latency", ["operation"], buckets=FAST_BUCKETS)
+
+
+def observe_llm_call(model: str, seconds: float, response: Optional[Dict[str, Any]] = None, error: bool = False) -> None:
+    """
+    記錄一次 LLM 呼叫；response 為 Ollama 最後一個回應物件（含 prompt_eval_count / eval_count / eval_duration）。
+    串流中斷而沒有收到 Ollama 的計數時，prompt_eval_count 是估計值（prompt_tokens_estimated），另以 prompt_estimated 記錄。
+    """
+    LLM_CALL_SECONDS.labels(model).observe(seconds)
+    if error:
+        LLM_ERRORS.labels(model).inc()
+    if not response:
+        return
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    completion_tokens = response.get("eval_count") or 0
+    if prompt_tokens:
+        kind = "prompt_estimated" if response.get("prompt_tokens_estimated") else "prompt"
+        LLM_TOKENS.labels(model, kind).inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+        eval_seconds = (response.get("eval_duration") or 0) / 1e9
+        if eval_seconds > 0:
+            LLM_TOKENS_PER_SECOND.labels(model).observe(completion_tokens / eval_seconds)
+
+
+def observe_tool_call(tool_id: str, seconds: float, result: Any) -> None:
+    if isinstance(result, dict) and "error" in result:
+        outcome = "error"
+    elif isinstance(result, dict) and result.get("used_cache"):
+        outcome = "hit"
+    else:
+        outcome = "miss"
+    TOOL_INVOKE_SECONDS.labels(tool_id).observe(seconds)
+    TOOL_INVOCATIONS.labels(tool_id, outcome).inc()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 開始時間記在這次執行的 context 上：執行失敗時隨 context 丟棄，不會殘留在連線上配錯下一個 SQL
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_query_start", None)
+    if start is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine) -> None:
+    """
+    記錄同步引擎（或 AsyncEngine.sync_engine）每個 SQL 的執行耗時。
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _registry() -> CollectorRegistry:
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    回傳 (Prometheus 文字格式的內容, Content-Type)。
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> None:
+    start_http_server(port, addr=addr, registry=_registry())
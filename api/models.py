@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, JSON, DateTime, Boolean, Text
+from sqlalchemy import create_engine, Column, Integer, String, JSON, DateTime, Boolean, Text, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import datetime
@@ -6,6 +7,9 @@ import uuid
 
 Base = declarative_base()
 
+# PostgreSQL 使用 JSONB（可建立 GIN 索引、寫入時即解析），其他後端維持 JSON
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 class Agent(Base):
     """
     智能體模型，對應 SDD 6.1 L1 持久化層的 Agent 表。
@@ -15,10 +19,10 @@ class Agent(Base):
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(100), nullable=False)
-    role = Column(String(50), nullable=False, default='debater')  # 'debater', 'chairman', 'analyst'
+    role = Column(String(50), nullable=False, default='debater', index=True)  # 'debater', 'chairman', 'analyst'
     specialty = Column(Text, nullable=True)  # 專長描述
     system_prompt = Column(Text, nullable=False)
-    config_json = Column(JSON, nullable=False, default=dict)  # 其他配置（如溫度、max_tokens等）
+    config_json = Column(JSONType, nullable=False, default=dict)  # 其他配置（如溫度、max_tokens等）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -30,7 +34,7 @@ class Tool(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)
-    json_schema = Column(JSON, nullable=False)
+    json_schema = Column(JSONType, nullable=False)
     enabled = Column(Boolean, default=True)
 
 class ToolSet(Base):
@@ -43,8 +47,8 @@ class ToolSet(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
-    tool_names = Column(JSON, nullable=False)  # List of tool names, e.g., ["tej.stock_price", "searxng.search"]
-    is_global = Column(Boolean, default=False)  # 是否為全局工具集
+    tool_names = Column(JSONType, nullable=False)  # List of tool names, e.g., ["tej.stock_price", "searxng.search"]
+    is_global = Column(Boolean, default=False, index=True)  # 是否為全局工具集
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -54,6 +58,10 @@ class AgentToolSet(Base):
     一個 Agent 可以有多個 ToolSet，一個 ToolSet 可以分配給多個 Agent。
     """
     __tablename__ = 'agent_toolsets'
+    __table_args__ = (
+        Index('ix_agent_toolsets_agent_toolset', 'agent_id', 'toolset_id'),
+        Index('ix_agent_toolsets_toolset_id', 'toolset_id'),
+    )
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     agent_id = Column(String(36), nullable=False)  # Foreign key to agents.id
@@ -78,7 +86,7 @@ class DebateArchive(Base):
     __tablename__ = 'debate_archives'
     id = Column(Integer, primary_key=True)
     topic = Column(String, nullable=False)
-    analysis_json = Column(JSON, nullable=False)
-    rounds_json = Column(JSON, nullable=False)
-    logs_json = Column(JSON, nullable=False)
+    analysis_json = Column(JSONType, nullable=False)
+    rounds_json = Column(JSONType, nullable=False)
+    logs_json = Column(JSONType, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,324 @@
+"""
+辯論的優先權與多租戶公平排程
+
+通過准入控制（api/admission.py）的辯論不直接送進 Celery，而是先放進 Redis 的待派送佇列，
+由排程器在辯論 worker 有空位（DEBATE_DISPATCH_SLOTS）時挑選下一場送出：
+
+- 優先權等級之間採嚴格優先：只要有 interactive 辯論在等，就不會派送 batch 辯論。
+- 同一等級內以加權公平佇列（WFQ）在租戶之間輪流：每個租戶有一個虛擬時間，
+  每派送一場增加 1 / 權重，永遠挑虛擬時間最小的租戶。
+  一個租戶一次送出 50 場批次辯論，也只會和其他租戶輪流取得空位。
+- 閒置後重新出現的租戶，虛擬時間從目前的時鐘開始，不會因為閒置而累積額度。
+
+Redis 中的結構：
+- sched:job:{id}                     待派送辯論的內容（JSON）
+- sched:pending:{class}:{tenant}     租戶的待派送辯論 ID（list，FIFO）
+- sched:tenants:{class}              有待派送辯論的租戶與其虛擬時間（sorted set）
+- sched:last:{class}                 租戶離開 sorted set 時的虛擬時間（hash）
+- sched:clock:{class}                該等級最近一次派送的虛擬時間
+- sched:inflight                     已派送、尚未結束的辯論（sorted set，score 為最近一次心跳的時間）
+- debate:{id}:error                  派送失敗的辯論的錯誤訊息（GET /api/v1/debates/{id} 回報 FAILURE）
+
+派送在 Redis lock 內進行；辯論結束時 worker 呼叫 complete() 釋放空位並派送下一場。
+空位是短租約：執行中的辯論以 keep_alive() 定期更新心跳，超過 DEBATE_INFLIGHT_TTL 秒沒有心跳
+（worker 異常終止）的空位在下一次派送時回收；API 每 DEBATE_DISPATCH_INTERVAL 秒派送一次，
+即使沒有辯論結束觸發 complete()，回收的空位也會交給排隊中的辯論。
+chain 模式下回合之間的任務在 Celery 佇列等待時沒有心跳，空位可能在這段時間被回收並交給別場；
+之後的心跳只在還有空位時重新佔用，不會讓執行中的辯論超過 DEBATE_DISPATCH_SLOTS。
+送不出去的辯論（例如 broker 無法連線）直接標記失敗並釋放准入名額，不放回佇列；
+submit() 把自己那場的錯誤回傳給呼叫端，其餘順帶派送失敗的辯論交給 on_failure（批次進度，見 api/batches.py）。
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import redis
+
+from api.admission import DEBATE_LEASE_TTL, AdmissionController
+
+logger = logging.getLogger(__name__)
+
+# 優先權等級（依嚴格優先順序排列）與對應的 Celery 任務優先權（0 最高）
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "batch": 9,
+}
+DEFAULT_PRIORITY_CLASS = "interactive"
+
+# 同時派送給辯論 worker 的辯論數；<= 0 表示不限制（送出順序仍依優先權與公平排程）
+DEBATE_DISPATCH_SLOTS = int(os.getenv("DEBATE_DISPATCH_SLOTS", "4"))
+# 空位的租約：超過這麼久沒有心跳的辯論視為 worker 異常終止，空位回收
+DEBATE_INFLIGHT_TTL = int(os.getenv("DEBATE_INFLIGHT_TTL", "300"))
+# API 定期派送的間隔（秒）；<= 0 表示只在送出與結束辯論時派送
+DEBATE_DISPATCH_INTERVAL = float(os.getenv("DEBATE_DISPATCH_INTERVAL", "30"))
+
+LOCK_KEY = "sched:lock"
+INFLIGHT_KEY = "sched:inflight"
+
+
+def parse_weights(spec: Optional[str]) -> Dict[str, float]:
+    """
+    解析租戶權重設定，例如 "team-a=3,team-b=1"。未列出的租戶權重為 1。
+    """
+    weights = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        tenant, weight = item.split("=", 1)
+        try:
+            weights[tenant.strip()] = max(float(weight), 0.01)
+        except ValueError:
+            continue
+    return weights
+
+
+def resolve_priority(config: Dict[str, Any]) -> Tuple[str, int]:
+    """
+    從辯論配置取得 (優先權等級, Celery 優先權)。
+
+    config.priority 可為等級名稱（interactive / batch）或 0-9 的整數（0 最高，5 以上視為 batch）。
+    無法辨識時拋出 ValueError。
+    """
+    priority = config.get("priority", DEFAULT_PRIORITY_CLASS)
+    if isinstance(priority, str) and priority in PRIORITY_CLASSES:
+        return priority, PRIORITY_CLASSES[priority]
+    if isinstance(priority, int) and not isinstance(priority, bool) and 0 <= priority <= 9:
+        return ("interactive" if priority < 5 else "batch"), priority
+    raise ValueError(
+        f"Invalid priority {priority!r}: use one of {list(PRIORITY_CLASSES)} or an integer 0-9"
+    )
+
+
+class DebateScheduler:
+    """
+    以 Redis 實作的加權公平排程器。sender 負責實際把辯論送進 Celery。
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        sender: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        slots: int = DEBATE_DISPATCH_SLOTS,
+        weights: Optional[Dict[str, float]] = None,
+        lease_ttl: int = DEBATE_LEASE_TTL,
+        inflight_ttl: int = DEBATE_INFLIGHT_TTL,
+        admission: Optional[AdmissionController] = None,
+    ):
+        self._redis = redis_client
+        self._admission = admission
+        self.sender = sender
+        self.slots = slots
+        self.weights = weights if weights is not None else parse_weights(os.getenv("TENANT_WEIGHTS"))
+        # 待派送辯論的保留時間
+        self.lease_ttl = lease_ttl
+        self.inflight_ttl = inflight_ttl
+        # 派送失敗的回報（debate_id），在 lock 外呼叫
+        self.on_failure: Optional[Callable[[str], Any]] = None
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        if self._redis is None:
+            redis_host = os.getenv("REDIS_HOST", "redis")
+            self._redis = redis.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
+        return self._redis
+
+    @redis_client.setter
+    def redis_client(self, client: redis.Redis) -> None:
+        self._redis = client
+
+    @property
+    def admission(self) -> AdmissionController:
+        """
+        派送失敗時釋放准入名額用的 AdmissionController；未指定時以同一個 Redis 連線建立一次。
+        """
+        if self._admission is None:
+            self._admission = AdmissionController(redis_client=self.redis_client)
+        return self._admission
+
+    @admission.setter
+    def admission(self, controller: AdmissionController) -> None:
+        self._admission = controller
+
+    def _lock(self):
+        return self.redis_client.lock(LOCK_KEY, timeout=30, blocking_timeout=10)
+
+    def submit(self, job: Dict[str, Any], tenant: str, priority_class: str) -> Dict[str, Any]:
+        """
+        將辯論放進待派送佇列並嘗試派送。job 必須包含 debate_id。
+        回傳這場辯論是否已送出、派送失敗時的錯誤（其餘為 None），以及目前待派送的辯論數。
+        """
+        r = self.redis_client
+        debate_id = job["debate_id"]
+        with self._lock():
+            r.set(f"sched:job:{debate_id}", json.dumps(job, ensure_ascii=False), ex=self.lease_ttl)
+            r.rpush(f"sched:pending:{priority_class}:{tenant}", debate_id)
+            tenants_key = f"sched:tenants:{priority_class}"
+            if r.zscore(tenants_key, tenant) is None:
+                last = float(r.hget(f"sched:last:{priority_class}", tenant) or 0)
+                clock = float(r.get(f"sched:clock:{priority_class}") or 0)
+                r.zadd(tenants_key, {tenant: max(last, clock)})
+            dispatched, failed = self._dispatch_locked()
+        error = failed.pop(debate_id, None)
+        self._report_failures(failed)
+        return {
+            "dispatched": debate_id in dispatched,
+            "error": error,
+            "pending_debates": self.pending_count(),
+        }
+
+    def dispatch(self) -> List[str]:
+        """
+        在空位允許的範圍內派送待派送的辯論，回傳送出的辯論 ID。
+        """
+        with self._lock():
+            dispatched, failed = self._dispatch_locked()
+        self._report_failures(failed)
+        return dispatched
+
+    def complete(self, debate_id: str) -> List[str]:
+        """
+        辯論結束：釋放空位並派送下一場。可重複呼叫。
+        """
+        self.redis_client.zrem(INFLIGHT_KEY, debate_id)
+        return self.dispatch()
+
+    def _report_failures(self, failed: Dict[str, str]) -> None:
+        if self.on_failure is None:
+            return
+        for debate_id in failed:
+            try:
+                self.on_failure(debate_id)
+            except Exception as e:
+                logger.error("Error reporting failed dispatch of debate %s: %s", debate_id, e)
+
+    def heartbeat(self, debate_id: str) -> bool:
+        """
+        更新執行中辯論的空位租約。空位已逾期回收（例如 chain 的下一個任務在佇列中等太久）時，
+        只在還有空位的情況下重新佔用；回傳辯論目前是否佔有空位。
+        """
+        r = self.redis_client
+        if r.zadd(INFLIGHT_KEY, {debate_id: time.time()}, xx=True, ch=True):
+            return True
+        with self._lock():
+            r.zremrangebyscore(INFLIGHT_KEY, "-inf", time.time() - self.inflight_ttl)
+            if r.zscore(INFLIGHT_KEY, debate_id) is None and 0 < self.slots <= r.zcard(INFLIGHT_KEY):
+                logger.warning("Debate %s lost its dispatch slot and no slot is free; running without one", debate_id)
+                return False
+            r.zadd(INFLIGHT_KEY, {debate_id: time.time()})
+            return True
+
+    @contextlib.contextmanager
+    def keep_alive(self, debate_id: str) -> Iterator[None]:
+        """
+        在 with 區塊內於背景每 inflight_ttl / 3 秒送出一次心跳。
+        離開區塊後才呼叫 complete()，結束的辯論不會被心跳重新加回。
+        """
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(self.inflight_ttl / 3):
+                try:
+                    self.heartbeat(debate_id)
+                except redis.RedisError as e:
+                    logger.warning("Heartbeat for debate %s failed: %s", debate_id, e)
+
+        self.heartbeat(debate_id)
+        thread = threading.Thread(target=beat, name=f"debate-heartbeat-{debate_id[:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def mark_failed(self, debate_id: str, error: str) -> None:
+        """
+        記錄辯論失敗（GET /api/v1/debates/{id} 回報 FAILURE 與錯誤訊息）。
+        """
+        self.redis_client.set(f"debate:{debate_id}:error", error)
+
+    def _dispatch_locked(self) -> Tuple[List[str], Dict[str, str]]:
+        """
+        回傳（送出的辯論 ID, 派送失敗的辯論 ID -> 錯誤訊息）。
+        """
+        r = self.redis_client
+        # 回收心跳逾期（worker 異常終止）的空位
+        r.zremrangebyscore(INFLIGHT_KEY, "-inf", time.time() - self.inflight_ttl)
+
+        dispatched = []
+        failed = {}
+        while self.slots <= 0 or r.zcard(INFLIGHT_KEY) < self.slots:
+            debate_id = self._next()
+            if debate_id is None:
+                break
+            payload = r.get(f"sched:job:{debate_id}")
+            r.delete(f"sched:job:{debate_id}")
+            if payload is None:
+                continue
+            r.zadd(INFLIGHT_KEY, {debate_id: time.time()})
+            try:
+                self.sender(json.loads(payload))
+            except Exception as e:
+                # 送不出去（例如 broker 無法連線）：釋放空位與准入名額並標記失敗，辯論不放回佇列以免無限重試
+                logger.error("Error dispatching debate %s: %s", debate_id, e)
+                r.zrem(INFLIGHT_KEY, debate_id)
+                self.admission.release(debate_id)
+                failed[debate_id] = f"Dispatch failed: {e}"
+                self.mark_failed(debate_id, failed[debate_id])
+                continue
+            dispatched.append(debate_id)
+        return dispatched, failed
+
+    def _next(self) -> Optional[str]:
+        """
+        依嚴格優先與加權公平規則取出下一場辯論的 ID。
+        """
+        r = self.redis_client
+        for priority_class in PRIORITY_CLASSES:
+            tenants_key = f"sched:tenants:{priority_class}"
+            while True:
+                head = r.zrange(tenants_key, 0, 0, withscores=True)
+                if not head:
+                    break
+                tenant, vtime = head[0]
+                pending_key = f"sched:pending:{priority_class}:{tenant}"
+                debate_id = r.lpop(pending_key)
+                next_vtime = vtime + 1.0 / self.weights.get(tenant, 1.0)
+                if debate_id is None or r.llen(pending_key) == 0:
+                    r.zrem(tenants_key, tenant)
+                    r.hset(f"sched:last:{priority_class}", tenant, next_vtime)
+                else:
+                    r.zadd(tenants_key, {tenant: next_vtime})
+                if debate_id is not None:
+                    r.set(f"sched:clock:{priority_class}", vtime)
+                    return debate_id
+        return None
+
+    def pending_count(self) -> int:
+        return sum(self.pending().values())
+
+    def pending(self) -> Dict[str, int]:
+        """
+        回傳各優先權等級待派送的辯論數。
+        """
+        r = self.redis_client
+        counts = {}
+        for priority_class in PRIORITY_CLASSES:
+            tenants = r.zrange(f"sched:tenants:{priority_class}", 0, -1)
+            counts[priority_class] = sum(r.llen(f"sched:pending:{priority_class}:{t}") for t in tenants)
+        return counts
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "dispatch_slots": self.slots,
+            "inflight_debates": self.redis_client.zcard(INFLIGHT_KEY),
+            "pending_debates": self.pending(),
+        }
+
+
+debate_scheduler = DebateScheduler()
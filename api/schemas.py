@@ -39,6 +39,12 @@ class DebateCreate(BaseModel):
     topic: str
     config: Dict[str, Any]
 
+class DebateBatchCreate(BaseModel):
+    """同一辯題、多組隊伍配置的批次辯論"""
+    topic: str
+    teams: List[Dict[str, Any]] = Field(..., description="每組包含 pro_team、con_team，可另外指定 rounds")
+    config: Dict[str, Any] = Field(default_factory=dict, description="共用配置：rounds、priority（預設 batch）、tenant_id、concurrency")
+
 class DebateArchive(BaseModel):
     id: int
     topic: str
@@ -50,8 +56,23 @@ class DebateArchive(BaseModel):
     class Config:
         orm_mode = True
 
+class DebateSearchHit(BaseModel):
+    id: int
+    topic: str
+    snippet: Optional[str] = None
+    score: float
+    created_at: Optional[datetime.datetime] = None
+
+class DebateSearchResult(BaseModel):
+    query: str
+    total: int
+    skip: int
+    limit: int
+    results: List[DebateSearchHit]
+
 # --- Tool Schemas ---
 
 class ToolTest(BaseModel):
     name: str
     kwargs: Dict[str, Any]
+    timeout: Optional[float] = Field(None, gt=0, le=120, description="逾時秒數，未指定時使用 TOOL_TEST_TIMEOUT")
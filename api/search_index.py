@@ -0,0 +1,233 @@
+"""
+辯論存檔全文檢索 - 基於 SQLite FTS5
+
+使用 trigram tokenizer，讓中文（CJK）不需斷詞即可做子字串檢索。
+索引在 DebateArchive 寫入時由 mapper event 同步維護，
+並於 init_db 時回填既有存檔。
+"""
+
+from typing import Dict, Any, List
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from api import models
+
+FTS_TABLE = "debate_archives_fts"
+
+# trigram tokenizer 最少需要 3 個字元才能使用 MATCH
+MIN_MATCH_LENGTH = 3
+SNIPPET_TOKENS = 16
+
+
+def _is_sqlite(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def _flatten_text(value: Any) -> List[str]:
+    """
+    將 JSON 結構（dict / list）攤平成文字片段列表。
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        parts = []
+        for v in value.values():
+            parts.extend(_flatten_text(v))
+        return parts
+    if isinstance(value, (list, tuple)):
+        parts = []
+        for v in value:
+            parts.extend(_flatten_text(v))
+        return parts
+    return [str(value)]
+
+
+def build_document(topic: str, analysis: Any, rounds: Any) -> Dict[str, str]:
+    """
+    將一筆存檔轉為索引文件（topic / analysis / content 三個欄位）。
+    每個回合的發言以「發言者：內容」的形式串接，方便片段閱讀。
+    """
+    lines = []
+    for round_data in rounds or []:
+        if not isinstance(round_data, dict):
+            lines.extend(_flatten_text(round_data))
+            continue
+        round_num = round_data.get("round")
+        for side in ("pro", "con"):
+            speaker = round_data.get(f"{side}_agent")
+            content = round_data.get(f"{side}_content")
+            if content:
+                lines.append(f"[R{round_num}] {speaker}：{content}")
+        if round_data.get("summary"):
+            lines.append(f"[R{round_num}] 主席：{round_data['summary']}")
+
+    return {
+        "topic": topic or "",
+        "analysis": "\n".join(_flatten_text(analysis)),
+        "content": "\n".join(lines),
+    }
+
+
+def init_search_index(engine: Engine):
+    """
+    建立 FTS5 虛擬表；若為首次建立則回填既有存檔。
+    非 SQLite 後端直接略過。
+    """
+    if not _is_sqlite(engine):
+        return
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE}
+        ).first()
+        if exists:
+            return
+
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "archive_id UNINDEXED, topic, analysis, content, "
+            "tokenize='trigram')"
+        ))
+        backfill = Session(bind=conn)
+        for archive in backfill.query(models.DebateArchive).all():
+            doc = build_document(archive.topic, archive.analysis_json, archive.rounds_json)
+            _insert_document(conn, archive.id, doc)
+
+
+def _insert_document(conn, archive_id: int, doc: Dict[str, str]):
+    conn.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (archive_id, topic, analysis, content) "
+            "VALUES (:archive_id, :topic, :analysis, :content)"
+        ),
+        {"archive_id": archive_id, **doc}
+    )
+
+
+@event.listens_for(models.DebateArchive, "after_insert")
+def _index_archive(mapper, connection, target):
+    """
+    存檔寫入時同步寫入索引（同一交易內）。
+    """
+    if not _is_sqlite(connection):
+        return
+    doc = build_document(target.topic, target.analysis_json, target.rounds_json)
+    _insert_document(connection, target.id, doc)
+
+
+@event.listens_for(models.DebateArchive, "after_delete")
+def _unindex_archive(mapper, connection, target):
+    if not _is_sqlite(connection):
+        return
+    connection.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE archive_id = :archive_id"),
+        {"archive_id": target.id}
+    )
+
+
+def _quote_match(q: str) -> str:
+    """
+    將使用者輸入轉為 FTS5 片語查詢，避免 FTS 語法字元造成錯誤。
+    以空白分隔的多個詞為 AND 關係。
+    """
+    terms = [t for t in q.split() if t]
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _plain_snippet(content: str, terms: List[str], width: int = 40) -> str:
+    """
+    LIKE 查詢用的片段：以內容中第一個出現的詞為中心（與 LIKE 一樣不分英文大小寫）。
+    """
+    lowered = content.lower()
+    idx, term = next(((lowered.find(t.lower()), t) for t in terms if t.lower() in lowered), (-1, ""))
+    if idx < 0:
+        return content[:width * 2]
+    start = max(0, idx - width)
+    end = min(len(content), idx + len(term) + width)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(content) else ""
+    return f"{prefix}{content[start:idx]}<mark>{content[idx:idx + len(term)]}</mark>{content[idx + len(term):end]}{suffix}"
+
+
+def search_debates(db: Session, q: str, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+    """
+    全文檢索辯論存檔，依 BM25 相關度排序並回傳片段。
+
+    返回格式：
+    {
+        "query": "...",
+        "total": 12,
+        "results": [
+            {"id": 1, "topic": "...", "snippet": "...<mark>命中</mark>...", "score": 1.23, "created_at": ...}
+        ]
+    }
+    """
+    q = q.strip()
+    if not _is_sqlite(db.get_bind()):
+        raise NotImplementedError("Full-text search requires the SQLite backend")
+
+    terms = q.split()
+    if not terms:
+        return {"query": q, "total": 0, "skip": skip, "limit": limit, "results": []}
+    use_match = all(len(t) >= MIN_MATCH_LENGTH for t in terms)
+
+    if use_match:
+        where = f"{FTS_TABLE} MATCH :match"
+        params = {"match": _quote_match(q)}
+        select = (
+            f"SELECT {FTS_TABLE}.archive_id, bm25({FTS_TABLE}, 0.0, 5.0, 2.0, 1.0) AS rank, "
+            f"snippet({FTS_TABLE}, 3, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS content_snippet, "
+            f"snippet({FTS_TABLE}, 1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS topic_snippet, "
+            f"{FTS_TABLE}.content AS content"
+        )
+        order = "rank"
+    else:
+        # 過短的詞（例如兩字中文詞）無法使用 trigram MATCH，退回 LIKE 掃描
+        where = " AND ".join(
+            f"({FTS_TABLE}.topic LIKE :t{i} OR {FTS_TABLE}.analysis LIKE :t{i} "
+            f"OR {FTS_TABLE}.content LIKE :t{i})"
+            for i in range(len(terms))
+        )
+        params = {f"t{i}": f"%{t}%" for i, t in enumerate(terms)}
+        select = (
+            f"SELECT {FTS_TABLE}.archive_id, 0.0 AS rank, NULL AS content_snippet, "
+            f"NULL AS topic_snippet, {FTS_TABLE}.content AS content"
+        )
+        order = f"{FTS_TABLE}.archive_id DESC"
+
+    total = db.execute(
+        text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {where}"), params
+    ).scalar()
+
+    rows = db.execute(
+        text(
+            f"{select}, a.topic AS topic, a.created_at AS created_at "
+            f"FROM {FTS_TABLE} JOIN debate_archives a ON a.id = {FTS_TABLE}.archive_id "
+            f"WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :skip"
+        ),
+        {**params, "limit": limit, "skip": skip}
+    ).all()
+
+    results = []
+    for row in rows:
+        snippet = row.content_snippet
+        if not use_match:
+            # 各詞可能只出現在主題或賽前分析：內容中沒有任何一個詞時改以主題為片段
+            snippet = _plain_snippet(row.content or "", terms)
+            if "<mark>" not in snippet:
+                snippet = _plain_snippet(row.topic or "", terms)
+        elif not snippet or "<mark>" not in snippet:
+            snippet = row.topic_snippet or snippet
+        results.append({
+            "id": row.archive_id,
+            "topic": row.topic,
+            "snippet": snippet,
+            # bm25 越小越相關，對外轉為正值分數
+            "score": -row.rank if row.rank else 0.0,
+            "created_at": row.created_at,
+        })
+
+    return {"query": q, "total": total, "skip": skip, "limit": limit, "results": results}
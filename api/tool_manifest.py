@@ -0,0 +1,64 @@
+"""
+內建工具清單（宣告式註冊）
+
+API 與 Worker 啟動時只登記工具名稱與其所在的模組 / 類別，
+實際的 import（yfinance、duckduckgo_search 等較重的套件）與實例化
+延後到第一次使用該工具時才進行，縮短冷啟動時間。
+
+新增工具：在 TOOL_MANIFEST 加一行，或由外部套件透過
+`agentscope_debate.tools` entry point 群組提供（名稱為工具名稱，值為 "module:Class"）。
+"""
+
+from importlib.metadata import entry_points
+from api.tool_registry import ToolRegistry, tool_registry
+
+ENTRY_POINT_GROUP = "agentscope_debate.tools"
+
+# (工具名稱, 模組路徑, 類別名稱)
+TOOL_MANIFEST = [
+    ("searxng.search", "adapters.searxng_adapter", "SearXNGAdapter"),
+    ("duckduckgo.search", "adapters.duckduckgo_adapter", "DuckDuckGoAdapter"),
+    ("meta.search", "adapters.meta_search_adapter", "MetaSearchAdapter"),
+    ("web.fetch", "adapters.web_fetch_adapter", "WebFetchAdapter"),
+    ("yfinance.stock_info", "adapters.yfinance_adapter", "YFinanceAdapter"),
+    ("tej.company_info", "adapters.tej_adapter", "TEJCompanyInfo"),
+    ("tej.stock_price", "adapters.tej_adapter", "TEJStockPrice"),
+    ("tej.monthly_revenue", "adapters.tej_adapter", "TEJMonthlyRevenue"),
+    ("tej.institutional_holdings", "adapters.tej_adapter", "TEJInstitutionalHoldings"),
+    ("tej.margin_trading", "adapters.tej_adapter", "TEJMarginTrading"),
+    ("tej.foreign_holdings", "adapters.tej_adapter", "TEJForeignHoldings"),
+    ("tej.financial_summary", "adapters.tej_adapter", "TEJFinancialSummary"),
+    ("tej.fund_nav", "adapters.tej_adapter", "TEJFundNAV"),
+    ("tej.shareholder_meeting", "adapters.tej_adapter", "TEJShareholderMeeting"),
+    ("tej.fund_basic_info", "adapters.tej_adapter", "TEJFundBasicInfo"),
+    ("tej.offshore_fund_info", "adapters.tej_adapter", "TEJOffshoreFundInfo"),
+    ("tej.offshore_fund_dividend", "adapters.tej_adapter", "TEJOffshoreFundDividend"),
+    ("tej.offshore_fund_holdings_region", "adapters.tej_adapter", "TEJOffshoreFundHoldingsRegion"),
+    ("tej.offshore_fund_holdings_industry", "adapters.tej_adapter", "TEJOffshoreFundHoldingsIndustry"),
+    ("tej.offshore_fund_nav_rank", "adapters.tej_adapter", "TEJOffshoreFundNAVRank"),
+    ("tej.offshore_fund_nav_daily", "adapters.tej_adapter", "TEJOffshoreFundNAVDaily"),
+    ("tej.offshore_fund_suspension", "adapters.tej_adapter", "TEJOffshoreFundSuspension"),
+    ("tej.offshore_fund_performance", "adapters.tej_adapter", "TEJOffshoreFundPerformance"),
+    ("tej.ifrs_account_descriptions", "adapters.tej_adapter", "TEJIFRSAccountDescriptions"),
+    ("tej.financial_cover_cumulative", "adapters.tej_adapter", "TEJFinancialCoverCumulative"),
+    ("tej.financial_summary_quarterly", "adapters.tej_adapter", "TEJFinancialSummaryQuarterly"),
+    ("tej.financial_cover_quarterly", "adapters.tej_adapter", "TEJFinancialCoverQuarterly"),
+    ("tej.futures_data", "adapters.tej_adapter", "TEJFuturesData"),
+    ("tej.options_basic_info", "adapters.tej_adapter", "TEJOptionsBasicInfo"),
+    ("tej.options_daily_trading", "adapters.tej_adapter", "TEJOptionsDailyTrading"),
+]
+
+
+def register_builtin_tools(registry: ToolRegistry = tool_registry, include_entry_points: bool = True):
+    """
+    將內建工具（以及 entry point 提供的外部工具）以延遲載入的方式登記到 registry。
+    """
+    for name, module_path, class_name in TOOL_MANIFEST:
+        registry.register_lazy(name, module_path, class_name)
+
+    if include_entry_points:
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            module_path, _, class_name = ep.value.partition(":")
+            registry.register_lazy(ep.name, module_path, class_name)
+
+    return registry
@@ -1,14 +1,54 @@
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
 import redis
 import json
 import hashlib
 from jsonschema import validate, ValidationError
+from api.tracing import traced, current_span
+from api.metrics import RATE_LIMITED, observe_tool_call
+
+logger = logging.getLogger(__name__)
+
+
+class ToolNotFoundError(ValueError):
+    """
+    工具未註冊（名稱或版本不存在）。
+    """
+
 
 class ToolRegistry:
-    def __init__(self):
+    def __init__(self, max_async_workers: Optional[int] = None):
         self._tools: Dict[str, Any] = {}
-        self._redis_client = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
+        # 延遲載入的工具描述：tool_id -> (module_path, class_name)，首次使用時才 import 並實例化
+        self._lazy_tools: Dict[str, Any] = {}
+        self._load_lock = threading.Lock()
+        self._redis = None
+        # 非同步呼叫使用的有界執行緒池（延遲建立，Worker 端不需要）
+        self._max_async_workers = max_async_workers or int(os.getenv("TOOL_INVOKE_MAX_WORKERS", "8"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def _redis_client(self) -> redis.Redis:
+        """
+        Redis 連線於第一次使用時才建立，避免 import 時的副作用。
+        """
+        if self._redis is None:
+            self._redis = redis.Redis(
+                host=os.getenv('REDIS_HOST', 'redis'), port=6379, db=0, decode_responses=True
+            )
+        return self._redis
+
+    @_redis_client.setter
+    def _redis_client(self, client: redis.Redis):
+        self._redis = client
 
     def _get_cache_key(self, tool_id: str, params: Dict[str, Any]) -> str:
         """
@@ -26,7 +66,7 @@ class ToolRegistry:
         
         tool_id = f"{tool.name}:{version}"
         if tool_id in self._tools:
-            print(f"Warning: Tool '{tool_id}' is already registered. Overwriting.")
+            logger.warning("Tool '%s' is already registered. Overwriting.", tool_id)
 
         self._tools[tool_id] = {
             "instance": tool,
@@ -38,21 +78,69 @@ class ToolRegistry:
             "cache_ttl": getattr(tool, 'cache_ttl', None), # in seconds
             "error_mapping": getattr(tool, 'error_mapping', None)
         }
-        print(f"Tool '{tool_id}' registered successfully.")
+        self._lazy_tools.pop(tool_id, None)
+        logger.info("Tool '%s' registered successfully.", tool_id)
+
+    def register_lazy(self, name: str, module_path: str, class_name: str, version: str = "v1"):
+        """
+        以宣告方式註冊工具：只記錄模組與類別名稱，首次使用時才 import 並實例化。
+        已經實例化的同名工具不會被覆蓋。
+        """
+        tool_id = f"{name}:{version}"
+        if tool_id in self._tools:
+            return
+        self._lazy_tools[tool_id] = (module_path, class_name)
+
+    def _load(self, tool_id: str) -> bool:
+        """
+        載入延遲註冊的工具；返回工具是否可用。
+        """
+        if tool_id in self._tools:
+            return True
+        if tool_id not in self._lazy_tools:
+            return False
+        with self._load_lock:
+            if tool_id in self._tools:
+                return True
+            module_path, class_name = self._lazy_tools[tool_id]
+            tool_class = getattr(importlib.import_module(module_path), class_name)
+            version = tool_id.split(':', 1)[1]
+            tool = tool_class()
+            if f"{tool.name}:{version}" != tool_id:
+                raise ValueError(f"Tool manifest entry '{tool_id}' resolved to '{tool.name}:{version}'")
+            self.register(tool, version)
+        return True
+
+    def _load_all(self):
+        for tool_id in list(self._lazy_tools):
+            self._load(tool_id)
+
+    def tool_ids(self):
+        """
+        列出所有工具 ID（包含尚未載入的），不觸發任何 import。
+        """
+        return list(self._tools) + [tool_id for tool_id in self._lazy_tools if tool_id not in self._tools]
+
+    def peek_tool_data(self, tool_name: str, version: str = "v1") -> Optional[Dict[str, Any]]:
+        """
+        已載入的工具的中繼資料；尚未載入或不存在時返回 None，不觸發任何 import。
+        """
+        return self._tools.get(f"{tool_name}:{version}")
 
     def get_tool_data(self, tool_name: str, version: str = "v1") -> Dict[str, Any]:
         """
         根據名稱和版本獲取工具的完整中繼資料。
         """
         tool_id = f"{tool_name}:{version}"
-        if tool_id not in self._tools:
-            raise ValueError(f"Tool '{tool_id}' not found")
+        if not self._load(tool_id):
+            raise ToolNotFoundError(f"Tool '{tool_id}' not found")
         return self._tools[tool_id]
 
     def get_tools(self):
         """
-        獲取所有已註冊的工具。
+        獲取所有已註冊的工具（會載入所有延遲註冊的工具）。
         """
+        self._load_all()
         return self._tools.values()
 
     def _check_rate_limit(self, tool_id: str, rate_limit_config: Dict[str, Any]) -> bool:
@@ -81,11 +169,20 @@ class ToolRegistry:
 
         return True
 
+    @traced("tool.invoke")
     def invoke_tool(self, tool_name: str, params: Dict[str, Any], version: str = "v1") -> Dict[str, Any]:
         """
         調用工具，並處理參數驗證、快取和速率限制。
         """
+        start = time.perf_counter()
+        result = self._invoke_tool(tool_name, params, version)
+        observe_tool_call(f"{tool_name}:{version}", time.perf_counter() - start, result)
+        return result
+
+    def _invoke_tool(self, tool_name: str, params: Dict[str, Any], version: str) -> Dict[str, Any]:
         tool_id = f"{tool_name}:{version}"
+        span = current_span()
+        span.set_attribute("tool.name", tool_id)
         tool_data = self.get_tool_data(tool_name, version)
         tool = tool_data["instance"]
         schema = tool_data["schema"]
@@ -94,6 +191,8 @@ class ToolRegistry:
 
         # 1. 速率限制
         if not self._check_rate_limit(tool_id, rate_limit_config):
+            span.set_attribute("tool.error", "rate_limited")
+            RATE_LIMITED.labels("tool").inc()
             return {"error": "Rate limit exceeded"}
 
         # 2. 參數驗證
@@ -101,6 +200,7 @@ class ToolRegistry:
             try:
                 validate(instance=params, schema=schema)
             except ValidationError as e:
+                span.set_attribute("tool.error", "validation")
                 return {"error": f"Parameter validation failed: {e.message}"}
 
         # 3. 檢查快取
@@ -110,6 +210,7 @@ class ToolRegistry:
             if cached_result:
                 result = json.loads(cached_result)
                 result["used_cache"] = True
+                span.set_attribute("tool.cache_hit", True)
                 return result
 
         # 4. 執行工具
@@ -118,6 +219,7 @@ class ToolRegistry:
             if hasattr(result, "to_dict"):
                 result = result.to_dict()
         except RuntimeError as e:
+            span.set_attribute("tool.error", type(e).__name__)
             error_mapping = tool_data.get("error_mapping")
             if error_mapping:
                 error_message = error_mapping.get(type(e).__name__)
@@ -125,18 +227,51 @@ class ToolRegistry:
                     return {"error": error_message}
             return {"error": str(e)}
 
-        # 5. 寫入快取
+        # 5. 寫入快取（結果中的 cache_ttl 覆寫這次結果的快取時間，例如部分後端失敗時只短暫快取）
+        cache_ttl = result.pop("cache_ttl", cache_ttl)
         if cache_ttl and cache_ttl > 0:
             cache_key = self._get_cache_key(tool_id, params)
             self._redis_client.set(cache_key, json.dumps(result), ex=cache_ttl)
         
         result["used_cache"] = False
+        span.set_attribute("tool.cache_hit", False)
         return result
 
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_async_workers,
+                thread_name_prefix="tool-invoke"
+            )
+        return self._executor
+
+    async def ainvoke_tool(
+        self,
+        tool_name: str,
+        params: Dict[str, Any],
+        version: str = "v1",
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        invoke_tool 的非同步版本，供 event loop 上的呼叫端使用。
+
+        工具的 Redis / HTTP I/O 在有界執行緒池中執行，event loop 不會被阻塞；
+        timeout（秒）包含排隊等待的時間，逾時拋出 asyncio.TimeoutError。
+        呼叫端被取消時，尚未開始執行的呼叫會從佇列移除；已在執行中的呼叫
+        無法中斷，會在背景完成後丟棄結果（仍受執行緒池大小限制）。
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(self.invoke_tool, tool_name, params, version)
+        )
+        return await asyncio.wait_for(future, timeout=timeout)
+
     def list(self) -> Dict[str, Any]:
         """
-        列出所有已註冊的工具及其詳細資訊。
+        列出所有已註冊的工具及其詳細資訊（會載入所有延遲註冊的工具）。
         """
+        self._load_all()
         return {
             name: {
                 "description": data["description"],
@@ -147,8 +282,9 @@ class ToolRegistry:
     
     def list_tools(self) -> Dict[str, Any]:
         """
-        列出所有已註冊的工具（返回 tool_id: tool_data 格式）。
+        列出所有已註冊的工具（返回 tool_id: tool_data 格式，會載入所有延遲註冊的工具）。
         """
+        self._load_all()
         return self._tools
     
     def get_tool_info(self, tool_name: str, version: str = "v1") -> Dict[str, Any]:
@@ -165,7 +301,7 @@ class ToolRegistry:
         """
         tool_id = f"{tool_name}:{version}"
         
-        if tool_id not in self._tools:
+        if not self._load(tool_id):
             return None
         
         tool_data = self._tools[tool_id]
@@ -183,38 +183,8 @@ def get_agent_toolsets_endpoint(agent_id: str, db: Session = Depends(get_db)):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    # 獲取分配的工具集
-    assigned_toolsets = []
-    agent_toolsets = db.query(models.AgentToolSet).filter(
-        models.AgentToolSet.agent_id == agent_id
-    ).all()
-    
-    for ats in agent_toolsets:
-        toolset = db.query(models.ToolSet).filter(
-            models.ToolSet.id == ats.toolset_id
-        ).first()
-        if toolset:
-            assigned_toolsets.append({
-                "id": toolset.id,
-                "name": toolset.name,
-                "description": toolset.description,
-                "tool_count": len(toolset.tool_names),
-                "source": "assigned"
-            })
-    
-    # 獲取全局工具集
-    global_toolsets = db.query(models.ToolSet).filter(
-        models.ToolSet.is_global == True
-    ).all()
-    
-    for toolset in global_toolsets:
-        assigned_toolsets.append({
-            "id": toolset.id,
-            "name": toolset.name,
-            "description": toolset.description,
-            "tool_count": len(toolset.tool_names),
-            "source": "global"
-        })
+    # 分配的工具集與全局工具集（單一查詢）
+    assigned_toolsets = ToolSetService.get_agent_toolsets(db, agent_id)
     
     return {
         "agent_id": agent_id,
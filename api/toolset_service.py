@@ -2,11 +2,92 @@
 ToolSet Service - 管理工具集和 Agent 的工具權限
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import and_, event, or_
 from sqlalchemy.orm import Session
+import os
+import threading
+import time
 from api import models
 from api.tool_registry import tool_registry
 
+
+class AgentToolsCache:
+    """
+    Agent 可用工具列表的行程內快取。
+    工具集或分配關係在任何 session commit 後即失效；TTL 作為多副本部署時的保險。
+    """
+
+    def __init__(self, ttl: int = 60):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, agent_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if not entry:
+                return None
+            expires_at, tools = entry
+            if expires_at < time.monotonic():
+                del self._entries[agent_id]
+                return None
+        return [dict(tool) for tool in tools]
+
+    def set(self, agent_id: str, tools: List[Dict[str, Any]]):
+        with self._lock:
+            self._entries[agent_id] = (time.monotonic() + self.ttl, [dict(tool) for tool in tools])
+
+    def invalidate(self, agent_id: Optional[str] = None):
+        """
+        使快取失效；未指定 agent_id 時清除全部（工具集本身變更會影響所有 Agent）。
+        """
+        with self._lock:
+            if agent_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(agent_id, None)
+
+
+agent_tools_cache = AgentToolsCache(ttl=int(os.getenv("AGENT_TOOLS_CACHE_TTL", "60")))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_toolset_changes(session, flush_context):
+    """
+    記錄本次 flush 中涉及工具集 / 分配關係的變更，待 commit 後再使快取失效。
+    """
+    pending = session.info.setdefault("toolset_cache_invalidations", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.ToolSet):
+            pending.add(None)
+        elif isinstance(obj, models.AgentToolSet):
+            pending.add(obj.agent_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    pending = session.info.pop("toolset_cache_invalidations", None)
+    if not pending:
+        return
+    if None in pending:
+        agent_tools_cache.invalidate()
+    else:
+        for agent_id in pending:
+            agent_tools_cache.invalidate(agent_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("toolset_cache_invalidations", None)
+
+
+def _split_tool_id(tool_name_with_version: str) -> Tuple[str, str]:
+    if ':' in tool_name_with_version:
+        tool_name, version = tool_name_with_version.split(':', 1)
+        return tool_name, version
+    return tool_name_with_version, 'v1'
+
 class ToolSetService:
     """
     工具集服務，負責：
@@ -34,60 +115,71 @@ class ToolSetService:
             }
         ]
         """
+        cached = agent_tools_cache.get(agent_id)
+        if cached is not None:
+            return cached
+
         tools = []
         tool_names_seen = set()
         
-        # 1. 獲取分配給該 Agent 的工具集
-        agent_toolsets = db.query(models.AgentToolSet).filter(
-            models.AgentToolSet.agent_id == agent_id
-        ).all()
-        
-        for ats in agent_toolsets:
-            toolset = db.query(models.ToolSet).filter(
-                models.ToolSet.id == ats.toolset_id
-            ).first()
-            
-            if toolset:
-                for tool_name_with_version in toolset.tool_names:
-                    if tool_name_with_version not in tool_names_seen:
-                        # 解析工具名稱和版本
-                        if ':' in tool_name_with_version:
-                            tool_name, version = tool_name_with_version.split(':', 1)
-                        else:
-                            tool_name = tool_name_with_version
-                            version = 'v1'
-                        
-                        tool_info = tool_registry.get_tool_info(tool_name, version)
-                        if tool_info:
-                            tool_info['source'] = 'assigned'
-                            tool_info['toolset_name'] = toolset.name
-                            tools.append(tool_info)
-                            tool_names_seen.add(tool_name_with_version)
-        
-        # 2. 獲取全局工具集
-        global_toolsets = db.query(models.ToolSet).filter(
-            models.ToolSet.is_global == True
-        ).all()
-        
-        for toolset in global_toolsets:
+        # 分配的工具集在前、全局工具集在後；同名工具以先出現者為準
+        for toolset, source in ToolSetService._resolve_agent_toolsets(db, agent_id):
             for tool_name_with_version in toolset.tool_names:
-                if tool_name_with_version not in tool_names_seen:
-                    # 解析工具名稱和版本
-                    if ':' in tool_name_with_version:
-                        tool_name, version = tool_name_with_version.split(':', 1)
-                    else:
-                        tool_name = tool_name_with_version
-                        version = 'v1'
-                    
-                    tool_info = tool_registry.get_tool_info(tool_name, version)
-                    if tool_info:
-                        tool_info['source'] = 'global'
-                        tool_info['toolset_name'] = toolset.name
-                        tools.append(tool_info)
-                        tool_names_seen.add(tool_name_with_version)
+                if tool_name_with_version in tool_names_seen:
+                    continue
+                tool_name, version = _split_tool_id(tool_name_with_version)
+                tool_info = tool_registry.get_tool_info(tool_name, version)
+                if tool_info:
+                    tool_info['source'] = source
+                    tool_info['toolset_name'] = toolset.name
+                    tools.append(tool_info)
+                    tool_names_seen.add(tool_name_with_version)
         
+        agent_tools_cache.set(agent_id, tools)
         return tools
     
+    @staticmethod
+    def _resolve_agent_toolsets(db: Session, agent_id: str) -> List[Tuple[models.ToolSet, str]]:
+        """
+        以單一 LEFT JOIN 查詢取得 Agent 的分配工具集與全局工具集。
+        
+        返回 [(toolset, "assigned" | "global"), ...]，分配的在前（依分配時間）；
+        若某全局工具集同時被分配，會各出現一次，與原本的回傳內容一致。
+        """
+        rows = db.query(models.ToolSet, models.AgentToolSet.id).outerjoin(
+            models.AgentToolSet,
+            and_(
+                models.AgentToolSet.toolset_id == models.ToolSet.id,
+                models.AgentToolSet.agent_id == agent_id
+            )
+        ).filter(
+            or_(models.AgentToolSet.id.isnot(None), models.ToolSet.is_global == True)
+        ).order_by(models.AgentToolSet.created_at).all()
+        
+        resolved = [(toolset, 'assigned') for toolset, assignment_id in rows if assignment_id is not None]
+        seen_global = set()
+        for toolset, _ in rows:
+            if toolset.is_global and toolset.id not in seen_global:
+                resolved.append((toolset, 'global'))
+                seen_global.add(toolset.id)
+        return resolved
+    
+    @staticmethod
+    def get_agent_toolsets(db: Session, agent_id: str) -> List[Dict[str, Any]]:
+        """
+        獲取 Agent 的所有工具集摘要（分配的 + 全局的）。
+        """
+        return [
+            {
+                "id": toolset.id,
+                "name": toolset.name,
+                "description": toolset.description,
+                "tool_count": len(toolset.tool_names),
+                "source": source
+            }
+            for toolset, source in ToolSetService._resolve_agent_toolsets(db, agent_id)
+        ]
+    
     @staticmethod
     def get_toolset_details(db: Session, toolset_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -132,18 +224,16 @@ class ToolSetService:
         ).first()
         
         if existing:
-            # 更新工具列表
-            all_tools = tool_registry.list_tools()
-            existing.tool_names = list(all_tools.keys())
+            # 更新工具列表（只需要工具 ID，不必載入工具本身）
+            existing.tool_names = tool_registry.tool_ids()
             db.commit()
             return existing
         
         # 創建新的全局工具集
-        all_tools = tool_registry.list_tools()
         global_toolset = models.ToolSet(
             name="全局工具集",
             description="包含所有已註冊的工具，自動分配給所有 Agent",
-            tool_names=list(all_tools.keys()),
+            tool_names=tool_registry.tool_ids(),
             is_global=True
         )
         
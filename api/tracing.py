@@ -0,0 +1,263 @@
+"""
+辯論追蹤（tracing）
+
+以 span 記錄一場辯論各階段的耗時：賽前分析、每位辯士的回合、每次 LLM 呼叫、
+每次工具呼叫（含是否命中快取）與存檔。同一場辯論的 span 共用由 debate id 推得的 trace id，
+span 之間以 parent_span_id 串成樹狀結構；欄位沿用 OpenTelemetry 的命名。
+
+TRACING_EXPORTER：
+- none（預設）：不記錄，span() 只有一次判斷的開銷
+- console：每個 span 結束時以一行 JSON 寫到 stderr
+- file：以 JSON Lines 附加到 TRACING_FILE（預設 traces.jsonl）
+- otel：交給 OpenTelemetry SDK（需另外安裝 opentelemetry-sdk 並自行設定 exporter）
+
+派送到 llm / tools 佇列的子任務以 W3C traceparent header 延續同一個 trace（見 worker/dispatch.py）。
+"""
+
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time_unix_nano: int = 0
+    end_time_unix_nano: int = 0
+    status: str = "OK"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class ConsoleExporter:
+    def export(self, span: Span) -> None:
+        print(json.dumps(span.to_dict(), ensure_ascii=False, default=str), file=sys.stderr)
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+_exporter = None
+_otel_tracer = None
+# 目前的 span（或由 traceparent 延續的遠端 parent）與所屬辯論
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_current_debate: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_debate", default=None)
+
+
+def configure(exporter: Optional[str] = None, path: Optional[str] = None) -> None:
+    """
+    依 TRACING_EXPORTER / TRACING_FILE（或參數）設定 exporter。
+    """
+    global _exporter, _otel_tracer
+    exporter = (exporter or TRACING_EXPORTER).lower()
+    _exporter, _otel_tracer = None, None
+    if exporter == "console":
+        _exporter = ConsoleExporter()
+    elif exporter == "file":
+        _exporter = FileExporter(path or TRACING_FILE)
+    elif exporter == "otel":
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed; tracing disabled.")
+            return
+        _otel_tracer = trace.get_tracer("agentscope_debate")
+    elif exporter != "none":
+        logger.warning("Unknown TRACING_EXPORTER '%s'; tracing disabled.", exporter)
+
+
+def enabled() -> bool:
+    return _exporter is not None or _otel_tracer is not None
+
+
+def _trace_id_for(debate_id: Optional[str]) -> str:
+    if debate_id:
+        return hashlib.sha256(debate_id.encode("utf-8")).hexdigest()[:32]
+    return secrets.token_hex(16)
+
+
+def current_span():
+    """
+    目前的 span；未啟用追蹤或不在 span 內時回傳不做事的 span，可直接呼叫 set_attribute。
+    """
+    if _otel_tracer is not None:
+        from opentelemetry import trace
+        return trace.get_current_span()
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_debate_id() -> Optional[str]:
+    return _current_debate.get()
+
+
+@contextmanager
+def span(name: str, debate_id: Optional[str] = None, **attributes: Any) -> Iterator[Any]:
+    """
+    記錄一個 span。debate_id 未提供時沿用外層 span 的辯論。
+    """
+    if not enabled():
+        yield NOOP_SPAN
+        return
+
+    debate_id = debate_id or _current_debate.get()
+    if debate_id:
+        attributes["debate.id"] = debate_id
+    debate_token = _current_debate.set(debate_id)
+    try:
+        if _otel_tracer is not None:
+            with _otel_tracer.start_as_current_span(name, attributes=attributes) as otel_span:
+                yield otel_span
+            return
+
+        parent = _current_span.get()
+        record = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else _trace_id_for(debate_id),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else None,
+            attributes=attributes,
+            start_time_unix_nano=time.time_ns(),
+        )
+        token = _current_span.set(record)
+        try:
+            yield record
+        except BaseException as e:
+            record.status = "ERROR"
+            record.set_attribute("error", repr(e))
+            raise
+        finally:
+            record.end_time_unix_nano = time.time_ns()
+            _current_span.reset(token)
+            _exporter.export(record)
+    finally:
+        _current_debate.reset(debate_token)
+
+
+def traced(name: str) -> Callable:
+    """
+    以 span 包住整個函式；函式內可用 current_span().set_attribute() 補充屬性。
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not enabled():
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagation_headers() -> Dict[str, str]:
+    """
+    派送子任務時附加的 header：W3C traceparent 與辯論 ID。
+    otel 模式的 span 由 OpenTelemetry 管理，traceparent 由它的 propagator 產生。
+    """
+    headers: Dict[str, str] = {}
+    debate_id = _current_debate.get()
+    if debate_id:
+        headers["debate_id"] = debate_id
+    if _otel_tracer is not None:
+        from opentelemetry import propagate
+        propagate.inject(headers)
+        return headers
+    parent = _current_span.get()
+    if parent is not None:
+        headers["traceparent"] = f"00-{parent.trace_id}-{parent.span_id}-01"
+    return headers
+
+
+@contextmanager
+def continue_trace(traceparent: Optional[str] = None, debate_id: Optional[str] = None) -> Iterator[None]:
+    """
+    在子任務中延續呼叫端的 trace：之後的 span 以 traceparent 指向的 span 為 parent。
+    """
+    if _otel_tracer is not None and traceparent:
+        from opentelemetry import context, propagate
+        otel_token = context.attach(propagate.extract({"traceparent": traceparent}))
+        debate_token = _current_debate.set(debate_id) if debate_id else None
+        try:
+            yield
+        finally:
+            context.detach(otel_token)
+            if debate_token is not None:
+                _current_debate.reset(debate_token)
+        return
+
+    remote = None
+    if traceparent:
+        parts = traceparent.split("-")
+        if len(parts) == 4:
+            remote = Span(name="remote", trace_id=parts[1], span_id=parts[2], parent_span_id=None)
+    span_token = _current_span.set(remote) if remote else None
+    debate_token = _current_debate.set(debate_id) if debate_id else None
+    try:
+        yield
+    finally:
+        if span_token is not None:
+            _current_span.reset(span_token)
+        if debate_token is not None:
+            _current_debate.reset(debate_token)
+
+
+def request_headers(request: Any) -> Dict[str, Optional[str]]:
+    """
+    從 Celery 任務的 request 取出 propagation_headers() 附加的 header。
+    """
+    headers = getattr(request, "headers", None) or {}
+    return {
+        key: getattr(request, key, None) or headers.get(key)
+        for key in ("traceparent", "debate_id")
+    }
+
+
+configure()
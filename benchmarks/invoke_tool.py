@@ -0,0 +1,200 @@
+"""
+ToolRegistry.invoke_tool 熱路徑微基準測試
+
+以假的工具（不做 I/O）隔離 invoke_tool 本身的開銷，量測下列情境每次呼叫的耗時：
+- cache_hit            快取命中（Redis GET + json.loads）
+- cache_miss           快取未命中（每次參數不同：工具執行 + json.dumps + Redis SET）
+- no_cache             工具不設 cache_ttl（只有驗證與執行）
+- rate_limited_path    工具設定速率限制（每次呼叫多一次 GET 與 pipeline）
+- validation_failure   參數不符 schema
+- large_payload_hit    大型結果（LARGE_ROWS 筆）的快取命中
+- large_payload_miss   大型結果的快取未命中
+
+並分別量測各步驟（schema 驗證、快取鍵、JSON 編解碼、Redis GET/SET），看出開銷落在哪裡。
+預設使用 fakeredis（行程內，無網路往返）；--redis-host 改用實際的 Redis。
+
+用法：
+    python -m benchmarks.invoke_tool --number 2000 --output invoke_tool.json
+    python -m benchmarks.invoke_tool --redis-host localhost --compare invoke_tool.json
+"""
+
+import argparse
+import itertools
+import json
+import statistics
+import timeit
+from typing import Any, Callable, Dict, Optional
+
+from jsonschema import validate
+
+from api.tool_registry import ToolRegistry
+
+LARGE_ROWS = 2000
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "coid": {"type": "string"},
+        "start_date": {"type": "string"},
+        "end_date": {"type": "string"},
+        "limit": {"type": "integer"},
+    },
+    "required": ["coid"],
+}
+PARAMS = {"coid": "2330", "start_date": "2024-10-01", "end_date": "2024-12-31", "limit": 50}
+
+
+def _rows(count: int):
+    return [
+        {"coid": "2330", "mdate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "open_d": 1000.0 + i, "close_d": 1010.5 + i, "volume": 25000 + i}
+        for i in range(count)
+    ]
+
+
+class FakeTool:
+    """
+    不做任何 I/O 的工具，回傳固定大小的結果。
+    """
+
+    version = "v1"
+    description = "benchmark tool"
+    schema = SCHEMA
+
+    def __init__(self, name: str, rows: int = 20, cache_ttl: Optional[int] = 3600, rate_limit_config: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.cache_ttl = cache_ttl
+        self.rate_limit_config = rate_limit_config
+        self._result = {"data": {"rows": _rows(rows)}, "citations": [{"title": name, "source": "bench"}]}
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "version": self.version, "description": self.description, "schema": self.schema}
+
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        return dict(self._result)
+
+
+def build_registry(redis_client) -> ToolRegistry:
+    registry = ToolRegistry()
+    registry._redis_client = redis_client
+    registry.register(FakeTool("bench.cached"))
+    registry.register(FakeTool("bench.uncached", cache_ttl=None))
+    registry.register(FakeTool("bench.rate_limited", cache_ttl=None, rate_limit_config={"limit": 10 ** 12, "period": 3600}))
+    registry.register(FakeTool("bench.large", rows=LARGE_ROWS))
+    return registry
+
+
+def _measure(func: Callable[[], Any], number: int, repeat: int) -> Dict[str, Any]:
+    # 先執行一次暖身（快取寫入、jsonschema 編譯等），不列入統計
+    func()
+    samples = [t / number for t in timeit.repeat(func, number=number, repeat=repeat)]
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 2),
+        "min_us": round(min(samples) * 1e6, 2),
+        "max_us": round(max(samples) * 1e6, 2),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def _unique_params(base: Dict[str, Any]) -> Callable[[], Dict[str, Any]]:
+    counter = itertools.count()
+    return lambda: dict(base, limit=next(counter))
+
+
+def run(redis_client=None, number: int = 1000, repeat: int = 5) -> Dict[str, Any]:
+    if redis_client is None:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    registry = build_registry(redis_client)
+    invoke = registry.invoke_tool
+    miss_params = _unique_params(PARAMS)
+    large_miss_params = _unique_params(PARAMS)
+    invalid_params = {"coid": 2330}
+
+    large_result = FakeTool("bench.large", rows=LARGE_ROWS).invoke()
+    encoded_large = json.dumps(large_result)
+    small_result = FakeTool("bench.cached").invoke()
+    encoded_small = json.dumps(small_result)
+    cache_key = registry._get_cache_key("bench.cached:v1", PARAMS)
+
+    cases = {
+        "cache_hit": lambda: invoke("bench.cached", PARAMS),
+        "cache_miss": lambda: invoke("bench.cached", miss_params()),
+        "no_cache": lambda: invoke("bench.uncached", PARAMS),
+        "rate_limited_path": lambda: invoke("bench.rate_limited", PARAMS),
+        "validation_failure": lambda: invoke("bench.cached", invalid_params),
+        "large_payload_hit": lambda: invoke("bench.large", PARAMS),
+        "large_payload_miss": lambda: invoke("bench.large", large_miss_params()),
+    }
+    stages = {
+        "schema_validate": lambda: validate(instance=PARAMS, schema=SCHEMA),
+        "cache_key": lambda: registry._get_cache_key("bench.cached:v1", PARAMS),
+        "json_dumps_result": lambda: json.dumps(small_result),
+        "json_loads_result": lambda: json.loads(encoded_small),
+        "json_dumps_large_result": lambda: json.dumps(large_result),
+        "json_loads_large_result": lambda: json.loads(encoded_large),
+        "redis_get": lambda: redis_client.get(cache_key),
+        "redis_set": lambda: redis_client.set(cache_key, encoded_small, ex=3600),
+    }
+    # 大型結果的案例耗時較長，減少次數
+    heavy = {"large_payload_hit", "large_payload_miss", "json_dumps_large_result", "json_loads_large_result"}
+
+    def measure_all(funcs: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        return {
+            name: _measure(func, max(1, number // 20) if name in heavy else number, repeat)
+            for name, func in funcs.items()
+        }
+
+    return {
+        "backend": type(redis_client).__module__.split(".")[0],
+        "large_rows": LARGE_ROWS,
+        "cases": measure_all(cases),
+        "stages": measure_all(stages),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    與先前的結果比較各案例的中位數（ratio > 1 表示變慢）。
+    """
+    report = {}
+    for section in ("cases", "stages"):
+        for name, result in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before or not before.get("median_us"):
+                continue
+            report[f"{section}.{name}"] = {
+                "baseline_us": before["median_us"],
+                "current_us": result["median_us"],
+                "ratio": round(result["median_us"] / before["median_us"], 3),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=1000, help="每次量測的呼叫次數")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--redis-host", help="使用實際的 Redis（預設 fakeredis）")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 結果比較")
+    args = parser.parse_args()
+
+    redis_client = None
+    if args.redis_host:
+        import redis
+        redis_client = redis.Redis(host=args.redis_host, port=6379, db=0, decode_responses=True)
+
+    results = run(redis_client, number=args.number, repeat=args.repeat)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            results["comparison"] = compare(results, json.load(f))
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+離線模擬服務（Ollama、TEJ、SearXNG），供本機負載測試與基準測試使用
+
+用法：
+    python -m benchmarks.mocks --ollama-port 11434 --tej-port 8090 --searxng-port 8088 --latency 0.2 --tokens-per-sec 40
+
+啟動後依輸出設定 OLLAMA_HOST、TEJ_BASE_URL、SEARXNG_HOST（以及任意的 TEJ_API_KEY），
+worker 就會改用模擬服務，不需要 GPU 也不需要真的 TEJ 金鑰。
+"""
+
+from benchmarks.mocks.ollama import OllamaMock, OllamaMockConfig
+from benchmarks.mocks.searxng import SearxngMock, SearxngMockConfig
+from benchmarks.mocks.tej import TEJMock, TEJMockConfig
+
+__all__ = ["OllamaMock", "OllamaMockConfig", "SearxngMock", "SearxngMockConfig", "TEJMock", "TEJMockConfig"]
@@ -0,0 +1,55 @@
+import argparse
+import threading
+
+from benchmarks.mocks import OllamaMock, OllamaMockConfig, SearxngMock, SearxngMockConfig, TEJMock, TEJMockConfig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="啟動模擬的 Ollama、TEJ 與 SearXNG 服務")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--tej-port", type=int, default=8090)
+    parser.add_argument("--searxng-port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.05, help="LLM 開始輸出前的延遲（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="LLM 產生速度，0 表示不限速")
+    parser.add_argument("--speech-tokens", type=int, default=80)
+    parser.add_argument("--native-tool-calls", action="store_true", help="以 message.tool_calls 回傳工具呼叫")
+    parser.add_argument("--tej-latency", type=float, default=0.02)
+    parser.add_argument("--tej-rows", type=int, default=120, help="每個表格的合成資料筆數")
+    parser.add_argument("--tej-429-every", type=int, default=0, help="每 N 個 TEJ 請求回 429")
+    parser.add_argument("--tej-429-ratio", type=float, default=0.0, help="TEJ 請求回 429 的機率")
+    parser.add_argument("--searxng-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ollama = OllamaMock(OllamaMockConfig(
+        latency=args.latency,
+        tokens_per_sec=args.tokens_per_sec,
+        speech_tokens=args.speech_tokens,
+        native_tool_calls=args.native_tool_calls,
+    ), host=args.host, port=args.ollama_port).start()
+    tej = TEJMock(TEJMockConfig(
+        latency=args.tej_latency,
+        rows_per_table=args.tej_rows,
+        rate_limit_every=args.tej_429_every,
+        rate_limit_ratio=args.tej_429_ratio,
+        seed=args.seed,
+    ), host=args.host, port=args.tej_port).start()
+    searxng = SearxngMock(SearxngMockConfig(latency=args.searxng_latency), host=args.host, port=args.searxng_port).start()
+
+    print(f"OLLAMA_HOST={ollama.url}")
+    print(f"TEJ_BASE_URL={tej.base_url}")
+    print("TEJ_API_KEY=mock")
+    print(f"SEARXNG_HOST={searxng.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ollama.stop()
+        tej.stop()
+        searxng.stop()
+
+
+if __name__ == "__main__":
+    main()
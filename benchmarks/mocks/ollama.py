@@ -0,0 +1,176 @@
+"""
+模擬 Ollama /api/chat
+
+依請求內容回傳固定格式的回應，讓整個辯論流程不需要 GPU 也能跑完：
+- system prompt 含「賽前分析」：主席賽前分析的 JSON
+- 帶 format（structured output）或提問要求調用工具：依序輪流回傳 tool_calls 中的工具呼叫
+- system prompt 含「摘要」：短摘要
+- 其他：發言
+
+延遲模型：latency 秒後開始輸出（模擬 prefill），之後以 tokens_per_sec 的速度產生 token。
+stream=true 時以 NDJSON 逐段輸出；用戶端提早斷線（例如 call_llm 讀到完整 JSON 物件就關閉連線）
+會停止產生並記錄在 stats["aborted_streams"]。
+"""
+
+import itertools
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from benchmarks.mocks.server import MockHandler, MockServer
+
+DEFAULT_TOOL_CALLS = [
+    {"tool": "tej.stock_price", "params": {"coid": "2330", "start_date": "2024-10-01", "end_date": "2024-12-31"}},
+    {"tool": "tej.monthly_revenue", "params": {"coid": "2330"}},
+]
+
+ANALYSIS_RESULT = {
+    "step1_type": "事實性",
+    "step2_elements": "股價、營收、法人持股",
+    "step3_causal_chain": "營收成長 -> 獲利提升 -> 股價上漲",
+    "step4_sub_questions": "營收是否成長？股價是否反映？",
+    "step5_summary": "以實際股價與營收數據比較。",
+    "step6_notes": "請引用具體數據。",
+    "step7_tools": "tej.stock_price, tej.monthly_revenue",
+}
+
+SPEECH_VOCABULARY = ["根據", "數據", "顯示", "，", "本季", "營收", "成長", "明顯", "，", "因此", "我方", "立場", "成立", "。"]
+
+
+@dataclass
+class OllamaMockConfig:
+    latency: float = 0.05
+    tokens_per_sec: float = 200.0  # 0 表示不限速
+    speech_tokens: int = 80
+    summary_tokens: int = 40
+    chunk_tokens: int = 4  # 串流時每個 chunk 的 token 數
+    native_tool_calls: bool = False  # 以 message.tool_calls 回傳工具呼叫（部分模型的行為）
+    tool_calls: List[Dict[str, Any]] = field(default_factory=lambda: list(DEFAULT_TOOL_CALLS))
+
+
+def _speech_tokens(count: int) -> List[str]:
+    return list(itertools.islice(itertools.cycle(SPEECH_VOCABULARY), count))
+
+
+def _json_tokens(obj: Any) -> List[str]:
+    # 約 4 個字元一個 token，與 worker/debate_context.estimate_tokens 的英文估算一致
+    text = json.dumps(obj, ensure_ascii=False)
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+class OllamaHandler(MockHandler):
+    def do_GET(self) -> None:
+        if self.path == "/api/version":
+            self.send_json(200, {"version": "mock"})
+        elif self.path == "/api/tags":
+            self.send_json(200, {"models": []})
+        elif self.path == "/_mock/stats":
+            self.send_json(200, self.service.stats)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/api/chat":
+            self.send_json(404, {"error": "not found"})
+            return
+        service: OllamaMock = self.service
+        payload = self.read_json()
+        service.count("requests")
+        kind, tokens, tool_call = service.plan_response(payload)
+        service.count(f"requests_{kind}")
+
+        time.sleep(service.config.latency)
+        if payload.get("stream", True):
+            self._stream(payload, tokens, tool_call)
+        else:
+            service.pace(len(tokens))
+            service.count("generated_tokens", len(tokens))
+            self.send_json(200, service.final_chunk(payload, tokens, tool_call, include_content=True))
+
+    def _stream(self, payload: Dict[str, Any], tokens: List[str], tool_call: Optional[Dict[str, Any]]) -> None:
+        service: OllamaMock = self.service
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        step = max(1, service.config.chunk_tokens)
+        try:
+            if tool_call is None:
+                for i in range(0, len(tokens), step):
+                    chunk = tokens[i:i + step]
+                    service.pace(len(chunk))
+                    line = {"model": payload.get("model"), "message": {"role": "assistant", "content": "".join(chunk)}, "done": False}
+                    self.wfile.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    service.count("generated_tokens", len(chunk))
+            else:
+                service.pace(len(tokens))
+                service.count("generated_tokens", len(tokens))
+            final = service.final_chunk(payload, tokens, tool_call, include_content=False)
+            self.wfile.write(json.dumps(final, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            service.count("aborted_streams")
+
+
+class OllamaMock(MockServer):
+    """
+    模擬的 Ollama 伺服器。OLLAMA_HOST 設為 self.url 即可讓 call_llm 改用這個伺服器。
+    """
+
+    handler_class = OllamaHandler
+
+    def __init__(self, config: Optional[OllamaMockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.config = config or OllamaMockConfig()
+        self._tool_cycle = itertools.cycle(self.config.tool_calls or DEFAULT_TOOL_CALLS)
+        self._cycle_lock = threading.Lock()
+
+    def pace(self, token_count: int) -> None:
+        if self.config.tokens_per_sec > 0:
+            time.sleep(token_count / self.config.tokens_per_sec)
+
+    def plan_response(self, payload: Dict[str, Any]):
+        """
+        回傳 (種類, token 列表, 原生工具呼叫或 None)。
+        """
+        messages = payload.get("messages") or []
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt = messages[-1]["content"] if messages else ""
+
+        if "賽前分析" in system_prompt:
+            return "analysis", _json_tokens(ANALYSIS_RESULT), None
+        if payload.get("format") is not None or "調用工具" in prompt:
+            with self._cycle_lock:
+                call = next(self._tool_cycle)
+            if self.config.native_tool_calls:
+                return "tool", _json_tokens(call), call
+            return "tool", _json_tokens(call), None
+        if "摘要" in system_prompt:
+            return "summary", _speech_tokens(self.config.summary_tokens), None
+        return "speech", _speech_tokens(self.config.speech_tokens), None
+
+    def final_chunk(
+        self,
+        payload: Dict[str, Any],
+        tokens: List[str],
+        tool_call: Optional[Dict[str, Any]],
+        include_content: bool,
+    ) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"role": "assistant", "content": ""}
+        if tool_call is not None:
+            message["tool_calls"] = [{"function": {"name": tool_call["tool"], "arguments": tool_call["params"]}}]
+        elif include_content:
+            message["content"] = "".join(tokens)
+        prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages") or [])
+        return {
+            "model": payload.get("model"),
+            "message": message,
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_chars // 4,
+            "eval_count": len(tokens),
+        }
@@ -0,0 +1,52 @@
+"""
+模擬 SearXNG /search（format=json）
+
+依查詢字串產生固定的搜尋結果；SEARXNG_HOST 設為 self.url 即可改用這個伺服器。
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.mocks.server import MockHandler, MockServer
+
+
+@dataclass
+class SearxngMockConfig:
+    latency: float = 0.05
+    results: int = 10
+
+
+class SearxngHandler(MockHandler):
+    def do_GET(self) -> None:
+        service: SearxngMock = self.service
+        parsed = urlparse(self.path)
+        if parsed.path == "/_mock/stats":
+            self.send_json(200, service.stats)
+            return
+        if parsed.path != "/search":
+            self.send_json(404, {"error": "not found"})
+            return
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        service.count("requests")
+        time.sleep(service.config.latency)
+        q = query.get("q", "")
+        results = [
+            {
+                "title": f"{q} - 結果 {i + 1}",
+                "url": f"https://example.com/{i + 1}",
+                "content": f"關於「{q}」的第 {i + 1} 筆搜尋摘要。",
+                "engine": "mock",
+            }
+            for i in range(service.config.results)
+        ]
+        self.send_json(200, {"query": q, "number_of_results": len(results), "results": results})
+
+
+class SearxngMock(MockServer):
+    handler_class = SearxngHandler
+
+    def __init__(self, config: Optional[SearxngMockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.config = config or SearxngMockConfig()
@@ -0,0 +1,88 @@
+"""
+模擬服務共用的 HTTP 伺服器外殼
+
+以標準函式庫的 ThreadingHTTPServer 在背景執行緒提供服務，port=0 時由系統分配空閒埠，
+可以在測試或基準測試中直接啟動，不需要額外的行程或套件。
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Type
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    處理器基底：提供 JSON 讀寫輔助，並關閉預設的存取日誌。
+    self.server.service 為對應的模擬服務物件。
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockServer:
+    """
+    在背景執行緒執行的模擬服務；可當作 context manager 使用。
+    """
+
+    handler_class: Type[MockHandler] = MockHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def start(self) -> "MockServer":
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self.handler_class)
+        self._httpd.daemon_threads = True
+        self._httpd.service = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
@@ -0,0 +1,132 @@
+"""
+模擬 TEJ Datatables API
+
+GET {url}/api/datatables/{db}/{table}.json 回傳可重現的合成資料：
+- 同一組（表格、公司代碼、日期）每次產生相同的數值
+- 支援 opts.limit / opts.offset 分頁與 mdate.gte / mdate.lte 日期篩選
+- 缺少 api_key 回傳 401
+- 以 rate_limit_every（每 N 個請求）或 rate_limit_ratio（機率，固定亂數種子）注入 429
+
+TEJBaseAdapter 的 base_url（或環境變數 TEJ_BASE_URL）設為 self.base_url 即可改用這個伺服器。
+"""
+
+import datetime
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.mocks.server import MockHandler, MockServer
+
+PATH_PREFIX = "/api/datatables/"
+DEFAULT_END_DATE = datetime.date(2024, 12, 31)
+NUMERIC_COLUMNS = ["open_d", "high_d", "low_d", "close_d", "volume", "value"]
+
+
+@dataclass
+class TEJMockConfig:
+    latency: float = 0.02
+    rows_per_table: int = 120
+    rate_limit_every: int = 0  # 每 N 個請求回 429，0 表示不注入
+    rate_limit_ratio: float = 0.0  # 以此機率回 429
+    seed: int = 0
+
+
+def _row_value(table: str, coid: str, mdate: str, column: str) -> float:
+    digest = hashlib.sha256(f"{table}|{coid}|{mdate}|{column}".encode("utf-8")).digest()
+    return round(int.from_bytes(digest[:4], "big") / 2 ** 32 * 1000, 2)
+
+
+def synthetic_rows(table: str, coid: str, start: Optional[str], end: Optional[str], count: int) -> List[Dict[str, Any]]:
+    """
+    產生最多 count 筆日資料（日期新到舊），數值由表格、公司代碼與日期決定。
+    """
+    end_date = datetime.date.fromisoformat(end[:10]) if end else DEFAULT_END_DATE
+    start_date = datetime.date.fromisoformat(start[:10]) if start else None
+    rows = []
+    day = end_date
+    while len(rows) < count and (start_date is None or day >= start_date):
+        mdate = day.isoformat()
+        row: Dict[str, Any] = {"coid": coid, "mdate": mdate}
+        for column in NUMERIC_COLUMNS:
+            row[column] = _row_value(table, coid, mdate, column)
+        rows.append(row)
+        day -= datetime.timedelta(days=1)
+    return rows
+
+
+class TEJHandler(MockHandler):
+    def do_GET(self) -> None:
+        service: TEJMock = self.service
+        parsed = urlparse(self.path)
+        if parsed.path == "/_mock/stats":
+            self.send_json(200, service.stats)
+            return
+        if not parsed.path.startswith(PATH_PREFIX) or not parsed.path.endswith(".json"):
+            self.send_json(404, {"error": "Resource Not Found"})
+            return
+        parts = parsed.path[len(PATH_PREFIX):-len(".json")].split("/")
+        if len(parts) != 2:
+            self.send_json(404, {"error": "Resource Not Found"})
+            return
+        db, table = parts
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+
+        service.count("requests")
+        time.sleep(service.config.latency)
+        if not query.get("api_key"):
+            service.count("unauthorized")
+            self.send_json(401, {"error": "Invalid API Key"})
+            return
+        if service.should_rate_limit():
+            service.count("rate_limited")
+            self.send_json(429, {"error": "Rate Limit Exceeded"}, headers={"Retry-After": "1"})
+            return
+
+        limit = int(query.get("opts.limit", 50))
+        offset = int(query.get("opts.offset", 0))
+        rows = synthetic_rows(
+            table,
+            query.get("coid", "0000"),
+            query.get("mdate.gte"),
+            query.get("mdate.lte"),
+            service.config.rows_per_table,
+        )
+        page = rows[offset:offset + limit]
+        next_offset = offset + len(page) if offset + len(page) < len(rows) else None
+        service.count("rows", len(page))
+        self.send_json(200, {
+            "data": page,
+            "columns": ["coid", "mdate"] + NUMERIC_COLUMNS,
+            "meta": {"db": db, "table": table, "total": len(rows), "next_offset": next_offset},
+        })
+
+
+class TEJMock(MockServer):
+    """
+    模擬的 TEJ API 伺服器。
+    """
+
+    handler_class = TEJHandler
+
+    def __init__(self, config: Optional[TEJMockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.config = config or TEJMockConfig()
+        self._random = random.Random(self.config.seed)
+        self._request_index = 0
+        self._limit_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}{PATH_PREFIX.rstrip('/')}"
+
+    def should_rate_limit(self) -> bool:
+        with self._limit_lock:
+            self._request_index += 1
+            every = self.config.rate_limit_every
+            if every and self._request_index % every == 0:
+                return True
+            return self._random.random() < self.config.rate_limit_ratio
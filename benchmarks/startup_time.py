@@ -0,0 +1,78 @@
+"""
+工具註冊冷啟動時間基準測試
+
+比較兩種註冊方式在全新 Python 行程中的耗時：
+- eager：import 所有 adapter 模組並逐一實例化、註冊（舊做法）
+- lazy：只登記工具清單（api.tool_manifest.register_builtin_tools）
+
+用法：
+    python -m benchmarks.startup_time --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+EAGER_CODE = """
+import importlib
+from api.tool_manifest import TOOL_MANIFEST
+from api.tool_registry import ToolRegistry
+registry = ToolRegistry()
+for name, module_path, class_name in TOOL_MANIFEST:
+    registry.register(getattr(importlib.import_module(module_path), class_name)())
+"""
+
+LAZY_CODE = """
+from api.tool_manifest import register_builtin_tools
+from api.tool_registry import ToolRegistry
+register_builtin_tools(ToolRegistry())
+"""
+
+BASELINE_CODE = "pass"
+
+
+def _time_subprocess(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run(runs: int = 5) -> dict:
+    results = {}
+    for label, code in (("interpreter", BASELINE_CODE), ("eager", EAGER_CODE), ("lazy", LAZY_CODE)):
+        # 第一次執行暖身（.pyc 編譯、檔案系統快取），不列入統計
+        _time_subprocess(code)
+        samples = [_time_subprocess(code) for _ in range(runs)]
+        results[label] = {
+            "median_sec": round(statistics.median(samples), 4),
+            "min_sec": round(min(samples), 4),
+            "max_sec": round(max(samples), 4),
+            "runs": runs,
+        }
+
+    base = results["interpreter"]["median_sec"]
+    eager = results["eager"]["median_sec"] - base
+    lazy = results["lazy"]["median_sec"] - base
+    results["speedup"] = round(eager / lazy, 2) if lazy > 0 else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
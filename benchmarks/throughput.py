@@ -0,0 +1,321 @@
+"""
+並行辯論端對端吞吐量基準測試
+
+在單一行程內同時執行 N 場辯論（run_debate_cycle，LLM 與工具在行程內執行，等同一個 worker 節點），
+LLM / TEJ / SearXNG 使用 benchmarks.mocks 的模擬服務，並為每場辯論訂閱 SSE 使用的
+Redis 頻道 debate:{id}:log_stream（與 GET /api/v1/debates/{id}/stream 相同的來源）。
+
+回報：
+- debates_per_hour      成功辯論數 / 牆鐘時間
+- turn_latency          每位辯士一次發言（選工具 -> 工具 -> 發言）的耗時分位數
+- time_to_first_event   從送出辯論到訂閱端收到第一則事件的時間
+- redis_commands        執行期間 Redis 處理的指令數（INFO total_commands_processed 差值）
+- rss_kb_per_debate     執行期間行程 RSS 峰值增量 / 同時進行的辯論數
+
+需要可連線的 Redis（REDIS_HOST）。辯論存檔預設寫入暫存的 SQLite（--database-url 可覆寫）。
+
+用法：
+    python -m benchmarks.throughput --debates 20 --concurrency 8 --rounds 2 --output throughput.json
+    python -m benchmarks.throughput --debates 20 --concurrency 8 --compare throughput.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from benchmarks.mocks import OllamaMock, OllamaMockConfig, SearxngMock, SearxngMockConfig, TEJMock, TEJMockConfig
+
+DEFAULT_TOPIC = "台積電 2024 年第四季股價表現是否優於大盤？"
+
+# --compare 時比較的指標與方向（True 表示越大越好）
+COMPARED_METRICS = [
+    ("debates_per_hour", True),
+    ("turn_latency.p50", False),
+    ("turn_latency.p90", False),
+    ("turn_latency.p99", False),
+    ("time_to_first_event.p50", False),
+    ("redis_commands_per_debate", False),
+    ("rss_kb_per_debate", False),
+]
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank 分位數；q 介於 0 到 100。
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 4),
+        "p50": round(percentile(samples, 50), 4),
+        "p90": round(percentile(samples, 90), 4),
+        "p99": round(percentile(samples, 99), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def _lookup(results: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    與先前的結果比較；change 為相對變化，regression 表示往不好的方向變化。
+    """
+    report = {}
+    for path, higher_is_better in COMPARED_METRICS:
+        now, before = _lookup(current, path), _lookup(baseline, path)
+        if now is None or before is None:
+            continue
+        change = (now - before) / before if before else None
+        regression = change is not None and (change < 0 if higher_is_better else change > 0)
+        report[path] = {"baseline": before, "current": now, "change": round(change, 4) if change is not None else None, "regression": regression}
+    return report
+
+
+class EventSubscriber(threading.Thread):
+    """
+    訂閱辯論的事件頻道並記錄每則事件的到達時間；收到結束事件或 stop() 後結束。
+    建構時即完成訂閱，避免錯過辯論開始時的事件。
+    """
+
+    def __init__(self, redis_client, debate_id: str):
+        super().__init__(daemon=True)
+        self.debate_id = debate_id
+        self.pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(f"debate:{debate_id}:log_stream")
+        self.events: List[float] = []
+        self._stop_event = threading.Event()
+
+    @property
+    def first_event(self) -> Optional[float]:
+        return self.events[0] if self.events else None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                message = self.pubsub.get_message(timeout=0.1)
+                if not message:
+                    continue
+                self.events.append(time.perf_counter())
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                if "has ended" in json.loads(data).get("content", ""):
+                    break
+        finally:
+            self.pubsub.close()
+
+
+@contextmanager
+def timed_turns(samples: List[float]):
+    """
+    執行期間記錄每次 DebateCycle._agent_turn 的耗時。
+    """
+    from worker.debate_cycle import DebateCycle
+
+    original = DebateCycle._agent_turn
+
+    def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    DebateCycle._agent_turn = timed
+    try:
+        yield
+    finally:
+        DebateCycle._agent_turn = original
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = _rss_kb()
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, _rss_kb())
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, _rss_kb())
+
+
+def _redis_commands(redis_client) -> int:
+    return int(redis_client.info("stats")["total_commands_processed"])
+
+
+def run(
+    debates: int = 10,
+    concurrency: int = 4,
+    rounds: int = 2,
+    topic: str = DEFAULT_TOPIC,
+    refresh_analysis: bool = False,
+    ollama_config: Optional[OllamaMockConfig] = None,
+    tej_config: Optional[TEJMockConfig] = None,
+    searxng_config: Optional[SearxngMockConfig] = None,
+    database_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    with OllamaMock(ollama_config) as ollama, TEJMock(tej_config) as tej, SearxngMock(searxng_config) as searxng:
+        os.environ.update({
+            "OLLAMA_HOST": ollama.url,
+            "TEJ_BASE_URL": tej.base_url,
+            "TEJ_API_KEY": os.getenv("TEJ_API_KEY") or "mock",
+            "SEARXNG_HOST": searxng.url,
+            "SEARXNG_URL": searxng.url,
+            # 量測單一 worker 節點：LLM 與工具都在行程內執行
+            "LLM_DISPATCH": "inline",
+            "TOOL_DISPATCH": "inline",
+            "DATABASE_URL": database_url or f"sqlite:///{tempfile.mkdtemp()}/benchmark.db",
+        })
+        # 環境變數要在 import 前設定（dispatch 模式、資料庫連線在 import 時決定）
+        import redis
+        from worker.tasks import run_debate_cycle
+
+        redis_client = redis.Redis(host=os.getenv("REDIS_HOST", "redis"), port=6379, db=0)
+        turn_samples: List[float] = []
+
+        def run_one(_: int) -> Dict[str, Any]:
+            debate_id = f"bench-{uuid.uuid4()}"
+            subscriber = EventSubscriber(redis_client, debate_id)
+            subscriber.start()
+            submitted = time.perf_counter()
+            result = run_debate_cycle.apply(
+                args=[topic, [], [], rounds],
+                kwargs={"refresh_analysis": refresh_analysis},
+                task_id=debate_id,
+            )
+            finished = time.perf_counter()
+            subscriber.stop()
+            subscriber.join()
+            first_event = subscriber.first_event
+            return {
+                "ok": result.successful(),
+                "duration": finished - submitted,
+                "time_to_first_event": first_event - submitted if first_event is not None else None,
+                "events": len(subscriber.events),
+            }
+
+        commands_before = _redis_commands(redis_client)
+        sampler = RssSampler()
+        sampler.start()
+        start = time.perf_counter()
+        with timed_turns(turn_samples), ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(run_one, range(debates)))
+        wall = time.perf_counter() - start
+        sampler.stop()
+        redis_commands = _redis_commands(redis_client) - commands_before
+
+        succeeded = [o for o in outcomes if o["ok"]]
+        return {
+            "config": {
+                "debates": debates,
+                "concurrency": concurrency,
+                "rounds": rounds,
+                "topic": topic,
+                "refresh_analysis": refresh_analysis,
+                "ollama": vars(ollama.config),
+                "tej": vars(tej.config),
+                "searxng": vars(searxng.config),
+            },
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "succeeded": len(succeeded),
+            "failed": len(outcomes) - len(succeeded),
+            "wall_sec": round(wall, 3),
+            "debates_per_hour": round(len(succeeded) / wall * 3600, 2) if wall > 0 else None,
+            "debate_duration": latency_summary([o["duration"] for o in succeeded]),
+            "turn_latency": latency_summary(turn_samples),
+            "time_to_first_event": latency_summary([o["time_to_first_event"] for o in outcomes if o["time_to_first_event"] is not None]),
+            "sse_events": sum(o["events"] for o in outcomes),
+            "redis_commands": redis_commands,
+            "redis_commands_per_debate": round(redis_commands / debates, 1) if debates else None,
+            "rss_kb_baseline": sampler.baseline,
+            "rss_kb_peak": sampler.peak,
+            "rss_kb_per_debate": round((sampler.peak - sampler.baseline) / max(1, min(concurrency, debates)), 1),
+            "mock_stats": {"ollama": ollama.stats, "tej": tej.stats, "searxng": searxng.stats},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debates", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--topic", default=DEFAULT_TOPIC)
+    parser.add_argument("--refresh-analysis", action="store_true", help="每場辯論都重新做賽前分析（不使用快取）")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="模擬 LLM 開始輸出前的延遲（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="模擬 LLM 的產生速度")
+    parser.add_argument("--tej-latency", type=float, default=0.02)
+    parser.add_argument("--searxng-latency", type=float, default=0.05)
+    parser.add_argument("--database-url", help="辯論存檔的資料庫（預設為暫存 SQLite）")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔案")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 結果比較")
+    args = parser.parse_args()
+
+    results = run(
+        debates=args.debates,
+        concurrency=args.concurrency,
+        rounds=args.rounds,
+        topic=args.topic,
+        refresh_analysis=args.refresh_analysis,
+        ollama_config=OllamaMockConfig(latency=args.llm_latency, tokens_per_sec=args.tokens_per_sec),
+        tej_config=TEJMockConfig(latency=args.tej_latency),
+        searxng_config=SearxngMockConfig(latency=args.searxng_latency),
+        database_url=args.database_url,
+    )
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            results["comparison"] = compare(results, json.load(f))
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
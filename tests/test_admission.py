@@ -0,0 +1,69 @@
+import fakeredis
+import pytest
+
+from api.admission import AdmissionController, ACTIVE_KEY, DEFAULT_CLIENT_ID, DURATION_KEY, parse_networks, resolve_client_id
+
+
+@pytest.fixture
+def controller():
+    return AdmissionController(
+        redis_client=fakeredis.FakeRedis(decode_responses=True),
+        max_active=3,
+        max_per_client=2,
+        lease_ttl=60,
+    )
+
+
+def test_per_client_and_global_limits(controller):
+    assert controller.admit("d1", "alice").admitted
+    assert controller.admit("d2", "alice").admitted
+
+    rejected = controller.admit("d3", "alice")
+    assert not rejected.admitted
+    assert rejected.reason == "client"
+    assert rejected.retry_after > 0
+
+    assert controller.admit("d4", "bob").admitted
+    rejected = controller.admit("d5", "carol")
+    assert not rejected.admitted
+    assert rejected.reason == "global"
+    assert rejected.active == 3
+
+    controller.release("d1")
+    assert controller.admit("d5", "carol").admitted
+    assert controller.status("alice")["client_active_debates"] == 1
+
+
+def test_release_is_idempotent_and_records_duration(controller):
+    controller.admit("d1", "alice")
+    controller.release("d1")
+    controller.release("d1")
+    assert controller.status()["active_debates"] == 0
+    assert controller.redis_client.get(DURATION_KEY) is not None
+
+
+def test_stale_leases_are_reclaimed(controller):
+    controller.admit("d1", "alice")
+    controller.admit("d2", "alice")
+    # 模擬 worker 異常終止：名額超過 lease TTL 未釋放
+    r = controller.redis_client
+    r.zadd(ACTIVE_KEY, {"d1": 0, "d2": 0})
+    r.zadd("debates:active:client:alice", {"d1": 0, "d2": 0})
+
+    assert controller.admit("d3", "alice").admitted
+    assert controller.status("alice")["client_active_debates"] == 1
+
+
+def test_client_id_comes_from_the_peer_unless_proxied_by_a_trusted_proxy():
+    trusted = parse_networks("10.0.0.0/8, not-an-ip")
+    spoofed = {"X-Client-Id": "fresh-id", "X-Forwarded-For": "198.51.100.1"}
+
+    # 直接連線：自訂的 ID 與標頭不影響辨識，換一個 ID 也繞不過上限
+    assert resolve_client_id("203.0.113.5", spoofed, {"client_id": "other"}, trusted) == "203.0.113.5"
+    assert resolve_client_id(None, {}, None, trusted) == DEFAULT_CLIENT_ID
+
+    # 可信任的代理：採用代理設定的 ID，沒有時取 X-Forwarded-For 中最後一個不是代理的位址
+    assert resolve_client_id("10.0.0.2", spoofed, {}, trusted) == "fresh-id"
+    assert resolve_client_id("10.0.0.2", {}, {"tenant_id": "lab"}, trusted) == "lab"
+    forwarded = {"X-Forwarded-For": "192.0.2.9, 198.51.100.1, 10.0.0.3"}
+    assert resolve_client_id("10.0.0.2", forwarded, {}, trusted) == "198.51.100.1"
@@ -0,0 +1,34 @@
+import fakeredis
+import pytest
+
+from worker import analysis_cache
+
+
+@pytest.fixture(autouse=True)
+def fake_redis():
+    analysis_cache.set_redis_client(fakeredis.FakeRedis(decode_responses=True))
+    yield
+    analysis_cache.set_redis_client(None)
+
+
+def test_normalized_topics_share_cache_entry():
+    analysis_cache.store_analysis("台積電 2024 Q4 股價會超越大盤嗎？", {"step5_summary": "s"}, model="m1")
+
+    assert analysis_cache.get_cached_analysis("  台積電  2024 Ｑ４ 股價會超越大盤嗎", model="m1") == {"step5_summary": "s"}
+    # 不同模型不共用
+    assert analysis_cache.get_cached_analysis("台積電 2024 Q4 股價會超越大盤嗎？", model="m2") is None
+
+
+def test_freshness_window(monkeypatch):
+    analysis_cache.store_analysis("topic", {"step5_summary": "s"}, model="m1")
+    now = analysis_cache.time.time()
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: now + 120)
+
+    assert analysis_cache.get_cached_analysis("topic", model="m1", max_age=300) is not None
+    assert analysis_cache.get_cached_analysis("topic", model="m1", max_age=60) is None
+
+
+def test_catalog_version_is_part_of_key(monkeypatch):
+    key = analysis_cache.cache_key("topic", model="m1")
+    monkeypatch.setattr(analysis_cache, "TOOL_CATALOG_VERSION", "other")
+    assert analysis_cache.cache_key("topic", model="m1") != key
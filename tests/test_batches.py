@@ -0,0 +1,123 @@
+import time
+
+import fakeredis
+import pytest
+
+from api.admission import AdmissionController
+from api.batches import BatchManager
+from api.scheduling import DebateScheduler
+from worker.tool_config import get_prewarm_tool_calls
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_batch_fans_out_with_concurrency_limit(redis_client):
+    sent = []
+    scheduler = DebateScheduler(redis_client=redis_client, sender=sent.append, slots=0, weights={})
+    manager = BatchManager(redis_client=redis_client)
+    jobs = [{"debate_id": f"d{i}", "topic": "t", "pro_team": [], "con_team": [], "rounds": 1} for i in range(5)]
+    manager.create("b1", "t", jobs, concurrency=2, tenant="lab", priority_class="batch")
+
+    # 分析完成前不送出任何辯論
+    assert manager.launch_next("b1", scheduler) == []
+
+    manager.set_analysis("b1", {"step5_summary": "shared"})
+    assert manager.launch_next("b1", scheduler) == ["d0", "d1"]
+    assert all(job["analysis"] == {"step5_summary": "shared"} for job in sent)
+    assert manager.launch_next("b1", scheduler) == []
+
+    assert manager.batch_of("d0") == "b1"
+    assert not manager.record_result("b1", "d0", success=True)
+    # 重複回報（例如 errback 與 worker 都回報）只計一次
+    assert not manager.record_result("b1", "d0", success=True)
+    assert manager.launch_next("b1", scheduler) == ["d2"]
+
+    progress = manager.progress("b1")
+    assert progress["running"] == 2
+    assert progress["pending"] == 2
+    assert progress["completed"] == 1
+
+    for debate_id, success in (("d1", False), ("d2", True)):
+        manager.record_result("b1", debate_id, success)
+        manager.launch_next("b1", scheduler)
+    manager.record_result("b1", "d3", True)
+    assert manager.record_result("b1", "d4", True)
+
+    progress = manager.progress("b1")
+    assert progress["status"] == "finished"
+    assert progress["failed"] == 1
+    assert progress["progress"] == 1.0
+    assert [job["debate_id"] for job in sent] == ["d0", "d1", "d2", "d3", "d4"]
+
+
+def test_batch_concurrency_is_capped_by_client_quota(redis_client):
+    admission = AdmissionController(redis_client=redis_client, max_active=10, max_per_client=3)
+    manager = BatchManager(redis_client=redis_client)
+    assert admission.admit("other", "lab").admitted
+
+    concurrency, _ = manager.admit("b1", "lab", 4, admission)
+    assert concurrency == 2
+    assert manager.admit("b2", "lab", 4, admission)[0] == 0
+
+    jobs = [{"debate_id": "d0", "topic": "t", "pro_team": [], "con_team": [], "rounds": 1}]
+    manager.create("b1", "t", jobs, concurrency, tenant="lab", priority_class="batch")
+    manager.release_leases("b1")
+    assert admission.status("lab")["client_active_debates"] == 1
+
+
+def test_batch_leases_are_renewed_while_the_batch_runs(redis_client):
+    admission = AdmissionController(redis_client=redis_client, max_active=10, max_per_client=3, lease_ttl=60)
+    scheduler = DebateScheduler(redis_client=redis_client, sender=lambda job: None, slots=0, weights={})
+    manager = BatchManager(redis_client=redis_client, admission=admission)
+    jobs = [{"debate_id": f"d{i}", "topic": "t", "pro_team": [], "con_team": [], "rounds": 1} for i in range(3)]
+    concurrency, _ = manager.admit("b1", "lab", 2, admission)
+    manager.create("b1", "t", jobs, concurrency, tenant="lab", priority_class="batch")
+    manager.set_analysis("b1", {})
+    manager.launch_next("b1", scheduler)
+
+    # 批次執行得比名額的 TTL 久：每結束一場就更新名額，不會被當成過期回收
+    for key in ("debates:active", "debates:active:client:lab"):
+        redis_client.zadd(key, {manager.lease_id("b1", 0): time.time() - 50, manager.lease_id("b1", 1): time.time() - 50})
+    manager.debate_finished("d0", True, scheduler)
+    assert admission.status("lab")["client_active_debates"] == 2
+    assert min(score for _, score in redis_client.zrange("debates:active", 0, -1, withscores=True)) > time.time() - 5
+
+    manager.debate_finished("d1", True, scheduler)
+    manager.debate_finished("d2", True, scheduler)
+    assert admission.status("lab")["client_active_debates"] == 0
+
+
+def test_failed_dispatch_is_reported_to_the_batch(redis_client):
+    def sender(job):
+        if job["debate_id"] == "d1":
+            raise ConnectionError("broker down")
+
+    scheduler = DebateScheduler(redis_client=redis_client, sender=sender, slots=0, weights={})
+    manager = BatchManager(redis_client=redis_client)
+    scheduler.on_failure = lambda debate_id: manager.debate_finished(debate_id, False, scheduler)
+    jobs = [{"debate_id": f"d{i}", "topic": "t", "pro_team": [], "con_team": [], "rounds": 1} for i in range(3)]
+    manager.create("b1", "t", jobs, concurrency=2, tenant="lab", priority_class="batch")
+    manager.set_analysis("b1", {})
+
+    # d1 送不出去：記為失敗並補上 d2
+    assert "d1" not in manager.launch_next("b1", scheduler)
+    progress = manager.progress("b1")
+    assert (progress["running"], progress["failed"], progress["pending"]) == (2, 1, 0)
+
+    manager.debate_finished("d0", True, scheduler)
+    manager.debate_finished("d2", True, scheduler)
+    manager.debate_finished("d2", True, scheduler)
+    progress = manager.progress("b1")
+    assert progress["status"] == "finished" and (progress["completed"], progress["failed"]) == (2, 1)
+
+
+def test_prewarm_calls_use_topic_stock_codes():
+    calls = get_prewarm_tool_calls("台積電 2024 Q4 股價會漲嗎")
+    assert ("tej.company_info", {"coid": "2330"}) in calls
+    assert all(params.get("coid") == "2330" for _, params in calls)
+
+    calls = get_prewarm_tool_calls("遠距工作是否提升生產力")
+    assert calls == [("searxng.search", {"q": "遠距工作是否提升生產力", "engines": "google cse"})]
@@ -0,0 +1,56 @@
+from worker import llm_utils
+from worker.conversation import Conversation
+
+
+class FakeLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def __call__(self, prompt, system_prompt=None, history=None, **kwargs):
+        self.calls.append((prompt, system_prompt, list(history or [])))
+        return self.replies.pop(0)
+
+
+def test_conversation_accumulates_messages_across_turns():
+    llm = FakeLLM(['{"tool": "x", "params": {}}', "speech 1", "Error: timeout", "speech 2"])
+    conversation = Conversation("system", llm=llm)
+
+    conversation.ask("round 1")
+    conversation.ask("tool result")
+    conversation.ask("round 2")
+    conversation.ask("round 2 again")
+
+    # 工具結果的提問帶著同一回合的第一則問答
+    assert llm.calls[1][2] == [
+        {"role": "user", "content": "round 1"},
+        {"role": "assistant", "content": '{"tool": "x", "params": {}}'},
+    ]
+    # 錯誤回應不寫入對話
+    assert len(llm.calls[3][2]) == 4
+    assert all(call[1] == "system" for call in llm.calls)
+
+    restored = Conversation.from_dict(conversation.to_dict(), llm=llm)
+    assert restored.messages == conversation.messages
+
+
+def test_call_llm_sends_history_and_keep_alive(monkeypatch):
+    captured = {}
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"message": {"content": "ok"}}
+
+    def fake_post(url, json):
+        captured.update(json)
+        return Response()
+
+    monkeypatch.setattr(llm_utils.requests, "post", fake_post)
+    history = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}]
+
+    assert llm_utils.call_llm("q2", system_prompt="sys", history=history, keep_alive="-1") == "ok"
+    assert [m["content"] for m in captured["messages"]] == ["sys", "q1", "a1", "q2"]
+    assert captured["keep_alive"] == -1
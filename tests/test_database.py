@@ -0,0 +1,67 @@
+from sqlalchemy import inspect, select, text
+from sqlalchemy.pool import QueuePool
+
+from api import models
+from api.database import (
+    create_async_db_engine, create_db_engine, get_engine_options, normalize_database_url
+)
+
+
+def test_sqlite_file_engine_applies_pragmas(tmp_path):
+    db_file = tmp_path / "nested" / "debate.db"
+    engine = create_db_engine(f"sqlite:///{db_file}")
+
+    assert db_file.parent.exists()
+    assert isinstance(engine.pool, QueuePool)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_memory_sqlite_keeps_default_pool():
+    options = get_engine_options("sqlite://")
+    assert "pool_size" not in options
+    assert options["connect_args"]["check_same_thread"] is False
+
+
+def test_hot_path_indexes_created(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'debate.db'}")
+    models.Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    agent_indexes = {tuple(i["column_names"]) for i in inspector.get_indexes("agents")}
+    toolset_indexes = {tuple(i["column_names"]) for i in inspector.get_indexes("toolsets")}
+    assignment_indexes = {tuple(i["column_names"]) for i in inspector.get_indexes("agent_toolsets")}
+
+    assert ("role",) in agent_indexes
+    assert ("is_global",) in toolset_indexes
+    assert ("agent_id", "toolset_id") in assignment_indexes
+
+
+def test_normalize_database_url_selects_drivers():
+    pg = "postgres://debate:secret@db:5432/debate"
+    assert normalize_database_url(pg) == "postgresql+psycopg://debate:secret@db:5432/debate"
+    assert normalize_database_url(pg, use_async=True) == "postgresql+asyncpg://debate:secret@db:5432/debate"
+    assert normalize_database_url("sqlite:///./data/debate.db", use_async=True) == "sqlite+aiosqlite:///./data/debate.db"
+    assert normalize_database_url("sqlite:///./data/debate.db") == "sqlite:///./data/debate.db"
+
+
+def test_async_engine_crud_with_json_columns(tmp_path):
+    import asyncio
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async def run():
+        engine = create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'debate.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with session_factory() as db:
+            db.add(models.Agent(name="a", system_prompt="p", config_json={"temperature": 0.2}))
+            await db.commit()
+            agents = (await db.execute(select(models.Agent))).scalars().all()
+        await engine.dispose()
+        return agents
+
+    agents = asyncio.run(run())
+    assert agents[0].config_json == {"temperature": 0.2}
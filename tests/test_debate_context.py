@@ -0,0 +1,66 @@
+import threading
+
+from worker.conversation import Conversation
+from worker.debate_context import DebateContext, estimate_tokens, truncate_to_tokens
+
+
+def _summarizer(calls):
+    def summarize(previous, turns):
+        calls.append([t["content"] for t in turns])
+        return (previous + " " if previous else "") + "+".join(t["content"] for t in turns)
+    return summarize
+
+
+def test_summary_is_incremental_and_keeps_recent_turns_verbatim():
+    calls = []
+    context = DebateContext(summarizer=_summarizer(calls), recent_turns=2, token_budget=500, background=False)
+    for round_num in range(1, 4):
+        context.add_turn("正方", f"p{round_num}", round_num)
+        context.add_turn("反方", f"c{round_num}", round_num)
+        context.schedule_summary()
+
+    # 每回合只送出新滑出視窗的發言
+    assert calls == [["p1", "c1"], ["p2", "c2"]]
+    rendered = context.render()
+    assert "p1+c1 p2+c2" in rendered
+    assert "[第 3 輪] 正方：p3" in rendered
+    assert "[第 2 輪] 正方：p2" not in rendered
+
+
+def test_background_summary_does_not_block_render():
+    release = threading.Event()
+
+    def slow_summarizer(previous, turns):
+        release.wait(5)
+        return "summary"
+
+    context = DebateContext(summarizer=slow_summarizer, recent_turns=1, token_budget=500)
+    context.add_turn("正方", "old", 1)
+    context.add_turn("反方", "new", 1)
+    context.schedule_summary()
+
+    # 摘要尚未完成：較舊的發言暫時逐字保留
+    assert "old" in context.render()
+    release.set()
+    state = context.to_dict()
+    assert state["summary"] == "summary" and state["summarized"] == 1
+    context.close()
+
+
+def test_render_respects_token_budget():
+    context = DebateContext(recent_turns=50, token_budget=200, background=False)
+    for round_num in range(1, 21):
+        context.add_turn("正方", "台積電營收成長" * 20, round_num)
+    rendered = context.render()
+    assert estimate_tokens(rendered) <= 200 + 20
+    assert "[第 20 輪]" in rendered and "[第 1 輪]" not in rendered
+
+
+def test_truncate_and_conversation_trim():
+    assert estimate_tokens(truncate_to_tokens("一" * 100, 10)) <= 10
+
+    conversation = Conversation("sys", llm=lambda prompt, **kwargs: "好" * 100, max_history_tokens=300)
+    for i in range(10):
+        conversation.ask(f"q{i}")
+    assert sum(estimate_tokens(m["content"]) for m in conversation.messages) <= 300 + 110
+    assert conversation.messages[-2]["content"] == "q9"
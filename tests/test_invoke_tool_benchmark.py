@@ -0,0 +1,21 @@
+import fakeredis
+
+from benchmarks.invoke_tool import PARAMS, build_registry, compare, run
+
+
+def test_benchmark_cases_exercise_the_intended_paths():
+    registry = build_registry(fakeredis.FakeRedis(decode_responses=True))
+
+    assert registry.invoke_tool("bench.cached", PARAMS)["used_cache"] is False
+    assert registry.invoke_tool("bench.cached", PARAMS)["used_cache"] is True
+    assert registry.invoke_tool("bench.uncached", PARAMS)["used_cache"] is False
+    assert "error" in registry.invoke_tool("bench.cached", {"coid": 2330})
+
+
+def test_run_reports_every_case_and_stage():
+    results = run(number=2, repeat=1)
+
+    assert set(results["cases"]) >= {"cache_hit", "cache_miss", "validation_failure", "large_payload_hit"}
+    assert results["stages"]["cache_key"]["median_us"] > 0
+    report = compare(results, results)
+    assert report["cases.cache_hit"]["ratio"] == 1.0
@@ -0,0 +1,71 @@
+import io
+import json
+import logging
+
+import pytest
+
+from api import log
+
+
+@pytest.fixture
+def output(monkeypatch):
+    monkeypatch.setenv("TEJ_API_KEY", "tej-secret-123")
+    stream = io.StringIO()
+    log.configure(level="INFO", levels="worker.noisy=WARNING,worker.verbose=DEBUG", stream=stream)
+    yield stream
+    log.configure(levels="")
+
+
+def test_levels_are_configured_per_module(output):
+    logging.getLogger("worker.noisy").info("hidden")
+    logging.getLogger("worker.verbose").debug("shown")
+    logging.getLogger("worker.other").debug("hidden too")
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 1 and lines[0].endswith("worker.verbose: shown")
+
+
+def test_secrets_are_redacted(output):
+    logger = logging.getLogger("adapters.tej_adapter")
+    logger.warning("Requesting %s with params %s", "https://tej/x.json", {"api_key": "abcdef", "coid": "2330"})
+    logger.warning("key in env: tej-secret-123, url ?api_key=xyz&coid=2330")
+
+    text = output.getvalue()
+    assert "abcdef" not in text and "tej-secret-123" not in text and "xyz" not in text
+    assert "'api_key': '***'" in text and "api_key=***&coid=2330" in text
+
+
+def test_large_payloads_are_previewed_lazily(output, monkeypatch):
+    class Expensive:
+        def __repr__(self):
+            raise AssertionError("formatted although the level is disabled")
+
+    logging.getLogger("worker.other").debug("result: %s", log.preview(Expensive()))
+    logging.getLogger("worker.other").info("rows: %s", log.preview({"rows": list(range(10000))}, limit=50))
+    monkeypatch.setattr(log, "LOG_MAX_CHARS", 20)
+    logging.getLogger("worker.other").info("x" * 100)
+
+    first, second = output.getvalue().splitlines()
+    assert len(first.split("rows: ", 1)[1]) < 80
+    assert second.endswith("x" * 20 + "…(+80 chars)")
+
+
+def test_sampled_messages_are_thinned(output):
+    logger = logging.getLogger("worker.other")
+    for i in range(10):
+        logger.info("turn %d", i, extra=log.sample(5))
+
+    lines = output.getvalue().splitlines()
+    assert [line.split(": ", 1)[1] for line in lines] == ["turn 0 [sampled 1/5]", "turn 5 [sampled 1/5]"]
+
+
+def test_json_format():
+    stream = io.StringIO()
+    log.configure(level="INFO", fmt="json", stream=stream)
+    try:
+        logging.getLogger("api.main").info("hello %s", "world")
+    finally:
+        log.configure(levels="")
+
+    entry = json.loads(stream.getvalue())
+    assert entry["level"] == "INFO" and entry["logger"] == "api.main" and entry["message"] == "hello world"
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from adapters.meta_search_adapter import META_SEARCH_PARTIAL_CACHE_TTL, MetaSearchAdapter, hamming_distance, merge_results, normalize_url, simhash
+from benchmarks.mocks import SearxngMock, SearxngMockConfig
+
+
+def test_normalize_url_ignores_tracking_and_cosmetic_differences():
+    assert normalize_url("https://www.Example.com/a/?utm_source=x&b=2&a=1#top") == "example.com/a?a=1&b=2"
+    assert normalize_url("http://example.com/a") == normalize_url("https://www.example.com/a/")
+    assert normalize_url("https://example.com/a?id=1") != normalize_url("https://example.com/a?id=2")
+
+
+def test_simhash_detects_near_duplicate_snippets():
+    snippet = "台積電 2024 年第四季營收創新高，先進製程需求強勁，毛利率優於市場預期。"
+
+    assert hamming_distance(simhash(snippet), simhash("台積電2024年第四季營收創新高！先進製程需求強勁，毛利率優於市場預期")) == 0
+    assert hamming_distance(simhash(snippet), simhash("遠距工作對生產力的影響：多項研究顯示結果分歧，取決於職務類型。")) > 3
+
+
+def test_merge_results_dedupes_and_ranks_by_agreement():
+    syndicated = "央行宣布升息半碼，重貼現率調升至 2%，為近十年來最高水準，市場反應平淡。"
+    merged = merge_results({
+        "searxng:google": [
+            {"title": "A", "url": "https://news.example/a?utm_medium=rss", "snippet": "a"},
+            {"title": "B", "url": "https://b.example/rate", "snippet": syndicated},
+        ],
+        "duckduckgo": [
+            {"title": "B'", "url": "https://mirror.example/rate-hike", "snippet": syndicated.replace("，", " ")},
+            {"title": "C", "url": "https://c.example", "snippet": "c"},
+            {"title": "A", "url": "http://www.news.example/a/", "snippet": "a"},
+        ],
+    }, limit=10)
+
+    assert [r["title"] for r in merged] == ["B", "A", "C"]
+    assert merged[0]["sources"] == ["searxng:google", "duckduckgo"]
+    assert merged[2]["sources"] == ["duckduckgo"]
+
+
+@pytest.fixture
+def searxng(monkeypatch):
+    with SearxngMock(SearxngMockConfig(latency=0, results=5)) as server:
+        monkeypatch.setenv("SEARXNG_HOST", server.url)
+        yield server
+
+
+def test_invoke_queries_engines_concurrently_and_merges(searxng):
+    adapter = MetaSearchAdapter(engines=["google cse", "brave api"], duckduckgo=False)
+
+    result = adapter.invoke(q="台積電", limit=3)
+
+    assert searxng.stats["requests"] == 2
+    assert len(result["data"]) == 3
+    assert result["data"][0]["sources"] == ["searxng:google cse", "searxng:brave api"]
+    assert {s["status"] for s in result["raw"]["backends"].values()} == {"ok"}
+
+
+def test_invoke_returns_within_budget_without_slow_backends(searxng, monkeypatch):
+    adapter = MetaSearchAdapter(engines=[], duckduckgo=True, budget=0.3)
+    original = adapter.backends
+
+    def backends(q, category, limit):
+        funcs = original(q, category, limit)
+        funcs["duckduckgo"] = lambda: time.sleep(2) or []
+        return funcs
+
+    monkeypatch.setattr(adapter, "backends", backends)
+    start = time.perf_counter()
+    result = adapter.invoke(q="台積電")
+
+    assert time.perf_counter() - start < 1
+    assert result["raw"]["backends"]["duckduckgo"] == {"status": "timeout"}
+    assert result["raw"]["backends"]["searxng"]["status"] == "ok"
+    assert len(result["data"]) == 5
+    # 缺少逾時後端的部分結果只短暫快取
+    assert result["cache_ttl"] == META_SEARCH_PARTIAL_CACHE_TTL
+
+
+def test_complete_results_use_the_adapter_cache_ttl(searxng):
+    result = MetaSearchAdapter(engines=[], duckduckgo=False).invoke(q="台積電")
+
+    assert "cache_ttl" not in result
+
+
+def test_explicit_zero_timeouts_are_kept():
+    adapter = MetaSearchAdapter(engines=[], duckduckgo=False, backend_timeout=0, budget=0)
+
+    assert (adapter.backend_timeout, adapter.budget) == (0, 0)
+
+
+def test_invoke_fails_when_every_backend_fails(monkeypatch):
+    monkeypatch.setenv("SEARXNG_HOST", "http://127.0.0.1:9")
+    adapter = MetaSearchAdapter(engines=[], duckduckgo=False, backend_timeout=0.5)
+
+    with pytest.raises(RuntimeError):
+        adapter.invoke(q="台積電")
@@ -0,0 +1,89 @@
+import fakeredis
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from api import metrics
+from api.tool_registry import ToolRegistry
+from worker import llm_utils
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class CachedTool:
+    name = "metrics.cached"
+    schema = {"type": "object", "properties": {"q": {"type": "integer"}}}
+    cache_ttl = 60
+
+    def describe(self):
+        return {"name": self.name}
+
+    def invoke(self, **kwargs):
+        return {"data": kwargs}
+
+
+def test_tool_invocations_count_cache_hits_and_errors():
+    registry = ToolRegistry()
+    registry._redis_client = fakeredis.FakeRedis(decode_responses=True)
+    registry.register(CachedTool())
+    tool = "metrics.cached:v1"
+    before = {outcome: _value("debate_tool_invocations_total", tool=tool, outcome=outcome) for outcome in ("hit", "miss", "error")}
+
+    registry.invoke_tool("metrics.cached", {"q": 1})
+    registry.invoke_tool("metrics.cached", {"q": 1})
+    registry.invoke_tool("metrics.cached", {"q": "x"})
+
+    for outcome in ("hit", "miss", "error"):
+        assert _value("debate_tool_invocations_total", tool=tool, outcome=outcome) == before[outcome] + 1
+    assert _value("debate_tool_invoke_seconds_count", tool=tool) >= 3
+
+
+def test_call_llm_records_latency_and_tokens(monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {
+                "message": {"content": "ok"},
+                "prompt_eval_count": 120,
+                "eval_count": 40,
+                "eval_duration": 2 * 10 ** 9,
+            }
+
+    monkeypatch.setattr(llm_utils.requests, "post", lambda url, json: Response())
+    before = _value("debate_llm_tokens_total", model="metrics-model", kind="completion")
+
+    assert llm_utils.call_llm("hi", model="metrics-model") == "ok"
+
+    assert _value("debate_llm_tokens_total", model="metrics-model", kind="completion") == before + 40
+    assert _value("debate_llm_tokens_total", model="metrics-model", kind="prompt") >= 120
+    assert _value("debate_llm_tokens_per_second_sum", model="metrics-model") >= 20
+    assert _value("debate_llm_call_seconds_count", model="metrics-model") >= 1
+
+
+def test_db_queries_are_timed_by_operation():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    before = _value("debate_db_query_seconds_count", operation="SELECT")
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert "metrics_query_start" not in conn.info
+
+    # 失敗的 SQL 不計入，也不影響下一個 SQL 的計時
+    assert _value("debate_db_query_seconds_count", operation="SELECT") == before + 1
+
+
+def test_render_outputs_prometheus_text():
+    metrics.SSE_SUBSCRIBERS.inc()
+    content, content_type = metrics.render()
+    metrics.SSE_SUBSCRIBERS.dec()
+
+    assert content_type.startswith("text/plain")
+    assert b"debate_sse_subscribers" in content
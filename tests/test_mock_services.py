@@ -0,0 +1,70 @@
+import json
+
+import pytest
+import requests
+
+from adapters.base import UpstreamError
+from adapters.tej_adapter import TEJStockPrice
+from benchmarks.mocks import OllamaMock, OllamaMockConfig, TEJMock, TEJMockConfig
+from worker import llm_utils
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    with OllamaMock(OllamaMockConfig(latency=0, tokens_per_sec=0, speech_tokens=12)) as server:
+        monkeypatch.setenv("OLLAMA_HOST", server.url)
+        yield server
+
+
+def test_ollama_mock_serves_speech_and_tool_calls(ollama):
+    speech = llm_utils.call_llm("請發言", system_prompt="你是辯士")
+    tool_call = llm_utils.call_llm("請現在就調用工具", format={"type": "object"})
+
+    assert speech
+    assert json.loads(tool_call)["tool"] == "tej.stock_price"
+    assert ollama.stats["requests_speech"] == 1
+    assert ollama.stats["requests_tool"] == 1
+
+
+def test_ollama_mock_native_tool_calls(monkeypatch):
+    config = OllamaMockConfig(latency=0, tokens_per_sec=0, native_tool_calls=True)
+    with OllamaMock(config) as server:
+        monkeypatch.setenv("OLLAMA_HOST", server.url)
+        result = llm_utils.call_llm("請現在就調用工具")
+
+    assert json.loads(result) == config.tool_calls[0]
+
+
+def test_ollama_mock_streams_ndjson(ollama):
+    response = requests.post(f"{ollama.url}/api/chat", json={"messages": [{"role": "user", "content": "hi"}]}, stream=True)
+    lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert lines[-1]["done"] is True
+    assert "".join(line["message"]["content"] for line in lines[:-1])
+
+
+def test_tej_mock_paginates_deterministic_rows():
+    with TEJMock(TEJMockConfig(latency=0, rows_per_table=30)) as server:
+        adapter = TEJStockPrice(base_url=server.base_url, api_key="mock")
+        first = adapter.invoke(coid="2330", limit=20)
+        second = adapter.invoke(coid="2330", limit=20, offset=20)
+        again = adapter.invoke(coid="2330", limit=20)
+
+    assert len(first.data["rows"]) == 20
+    assert len(second.data["rows"]) == 10
+    assert first.raw["meta"]["next_offset"] == 20
+    assert first.data["rows"] == again.data["rows"]
+
+
+def test_tej_mock_injects_rate_limit_and_auth_errors(monkeypatch):
+    with TEJMock(TEJMockConfig(latency=0, rate_limit_every=2)) as server:
+        monkeypatch.setenv("TEJ_BASE_URL", server.base_url)
+        adapter = TEJStockPrice(api_key="mock")
+        adapter.invoke(coid="2330")
+        with pytest.raises(UpstreamError) as excinfo:
+            adapter.invoke(coid="2330")
+        assert excinfo.value.code == "ERR-RATE-LIMIT"
+
+        response = requests.get(f"{server.base_url}/TRAIL/TAPRCD.json")
+        assert response.status_code == 401
+        assert server.stats["rate_limited"] == 1
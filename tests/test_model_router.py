@@ -0,0 +1,25 @@
+import pytest
+
+from worker.model_router import model_settings, resolve_model
+
+
+def test_resolution_order(monkeypatch):
+    monkeypatch.setenv("OLLAMA_MODEL", "base:20b")
+    monkeypatch.setenv("OLLAMA_MODEL_TOOL_SELECT", "small:3b")
+    monkeypatch.delenv("OLLAMA_MODEL_SPEECH", raising=False)
+
+    assert resolve_model("speech") == "base:20b"
+    assert resolve_model("tool_select") == "small:3b"
+
+    agent_config = {"models": {"speech": "agent-speech"}, "model": "agent-default", "temperature": 0.3}
+    assert resolve_model("speech", agent_config) == "agent-speech"
+    assert resolve_model("tool_select", agent_config) == "agent-default"
+    assert model_settings(agent_config) == {"models": {"speech": "agent-speech"}, "model": "agent-default"}
+
+
+def test_default_and_unknown_role(monkeypatch):
+    monkeypatch.delenv("OLLAMA_MODEL", raising=False)
+    monkeypatch.setenv("OLLAMA_MODEL_SUMMARY", "")
+    assert resolve_model("summary") == "gpt-oss:20b"
+    with pytest.raises(ValueError):
+        resolve_model("vision")
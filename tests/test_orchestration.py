@@ -0,0 +1,23 @@
+from celery import Celery
+
+from worker.orchestration import build_debate_chain
+
+
+def test_debate_chain_structure():
+    app = Celery("test")
+    workflow = build_debate_chain(app, "debate-1", "topic", [{"name": "A"}], [{"name": "B"}], rounds=3)
+
+    names = [sig.task for sig in workflow.tasks]
+    assert names == (
+        ["worker.tasks.prepare_debate"]
+        + ["worker.tasks.run_debate_round"] * 3
+        + ["worker.tasks.finalize_debate"]
+    )
+    assert workflow.tasks[0].immutable
+    assert workflow.tasks[0].args == ("debate-1", "topic", [{"name": "A"}], [{"name": "B"}], 3)
+    assert workflow.tasks[-1].options["task_id"] == "debate-1"
+    assert all(
+        [errback["task"] for errback in sig.options["link_error"]] == ["worker.tasks.abort_debate"]
+        for sig in workflow.tasks
+    )
+    assert workflow.tasks[1].options["link_error"][0]["args"] == ("debate-1",)
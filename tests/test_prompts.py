@@ -0,0 +1,28 @@
+from worker import prompts
+
+
+def test_agent_prompts_share_static_prefix():
+    prefix = prompts.get_fragments().agent_prefix
+    pro = prompts.build_agent_system_prompt("正方辯士 1", "正方", "台積電股價會漲嗎")
+    con = prompts.build_agent_system_prompt("反方辯士 1", "反方", "另一個辯題")
+
+    assert pro.startswith(prefix) and con.startswith(prefix)
+    assert "tej.stock_price" in prefix
+    # 每回合的 user prompt 不重複工具目錄
+    assert "tej.stock_price" not in prompts.build_agent_turn_prompt(2, "摘要")
+
+
+def test_fragments_built_once_per_catalog_version(monkeypatch):
+    first = prompts.get_fragments()
+    assert prompts.get_fragments() is first
+
+    monkeypatch.setattr(prompts, "TOOL_CATALOG_VERSION", "next-version")
+    assert prompts.get_fragments() is not first
+    assert prompts.get_fragments().catalog_version == "next-version"
+
+
+def test_analysis_prompt_keeps_recommended_tools_after_prefix():
+    system_prompt = prompts.build_analysis_system_prompt(["tej.stock_price"])
+    assert system_prompt.startswith(prompts.get_fragments().chairman_prefix)
+    assert system_prompt.rstrip().endswith("tej.stock_price")
+    assert len(prompts.prefix_hash("chairman")) == 16
@@ -0,0 +1,126 @@
+import time
+
+import fakeredis
+import pytest
+
+from api.admission import AdmissionController
+from api.scheduling import DebateScheduler, resolve_priority
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def scheduler(sent):
+    return DebateScheduler(
+        redis_client=fakeredis.FakeRedis(decode_responses=True),
+        sender=lambda job: sent.append(job["debate_id"]),
+        slots=1,
+        weights={},
+    )
+
+
+def test_tenants_take_turns(scheduler, sent):
+    scheduler.submit({"debate_id": "running"}, "bulk", "batch")
+    for i in range(4):
+        scheduler.submit({"debate_id": f"bulk-{i}"}, "bulk", "batch")
+    scheduler.submit({"debate_id": "small-0"}, "small", "batch")
+
+    for _ in range(3):
+        scheduler.complete(sent[-1])
+    # bulk 已經用掉一個空位，新加入的 small 先輪到
+    assert sent == ["running", "small-0", "bulk-0", "bulk-1"]
+
+
+def test_interactive_jumps_ahead_of_batch(scheduler, sent):
+    scheduler.submit({"debate_id": "b-0"}, "bulk", "batch")
+    scheduler.submit({"debate_id": "b-1"}, "bulk", "batch")
+    result = scheduler.submit({"debate_id": "i-0"}, "alice", "interactive")
+    assert not result["dispatched"]
+    assert scheduler.pending() == {"interactive": 1, "batch": 1}
+
+    scheduler.complete("b-0")
+    scheduler.complete("i-0")
+    assert sent == ["b-0", "i-0", "b-1"]
+
+
+def test_weights_bias_share(sent):
+    scheduler = DebateScheduler(
+        redis_client=fakeredis.FakeRedis(decode_responses=True),
+        sender=lambda job: sent.append(job["debate_id"]),
+        slots=1,
+        weights={"heavy": 2},
+    )
+    scheduler.submit({"debate_id": "x"}, "other", "batch")
+    for i in range(4):
+        scheduler.submit({"debate_id": f"h-{i}"}, "heavy", "batch")
+        scheduler.submit({"debate_id": f"l-{i}"}, "light", "batch")
+    for _ in range(6):
+        scheduler.complete(sent[-1])
+    assert sent[1:] == ["h-0", "l-0", "h-1", "h-2", "l-1", "h-3"]
+
+
+def test_resolve_priority():
+    assert resolve_priority({}) == ("interactive", 0)
+    assert resolve_priority({"priority": "batch"}) == ("batch", 9)
+    assert resolve_priority({"priority": 7}) == ("batch", 7)
+    with pytest.raises(ValueError):
+        resolve_priority({"priority": "urgent"})
+
+
+def test_dispatch_failure_releases_lease_and_reports_error():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    admission = AdmissionController(redis_client=r, max_active=5, max_per_client=1)
+
+    def broken(job):
+        raise ConnectionError("broker down")
+
+    scheduler = DebateScheduler(redis_client=r, sender=broken, slots=1, weights={})
+    assert admission.admit("d1", "alice").admitted
+
+    result = scheduler.submit({"debate_id": "d1"}, "alice", "interactive")
+
+    assert not result["dispatched"] and "broker down" in result["error"]
+    assert r.get("debate:d1:error") == result["error"]
+    assert scheduler.status()["inflight_debates"] == 0
+    assert admission.admit("d2", "alice").admitted
+
+
+def test_expired_slots_are_reclaimed_unless_kept_alive(sent):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    scheduler = DebateScheduler(
+        redis_client=r, sender=lambda job: sent.append(job["debate_id"]), slots=1, weights={}, inflight_ttl=0.3
+    )
+    scheduler.submit({"debate_id": "alive"}, "alice", "interactive")
+    scheduler.submit({"debate_id": "next"}, "alice", "interactive")
+
+    with scheduler.keep_alive("alive"):
+        time.sleep(0.5)
+        assert scheduler.dispatch() == []
+
+    # 心跳停止（worker 異常終止）後，空位逾期回收，定期派送送出下一場
+    time.sleep(0.4)
+    assert scheduler.dispatch() == ["next"]
+    assert sent == ["alive", "next"]
+
+
+def test_expired_debate_is_not_readmitted_over_the_slot_limit(sent):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    scheduler = DebateScheduler(
+        redis_client=r, sender=lambda job: sent.append(job["debate_id"]), slots=1, weights={}, inflight_ttl=0.3
+    )
+    scheduler.submit({"debate_id": "chained"}, "alice", "interactive")
+    scheduler.submit({"debate_id": "next"}, "bob", "interactive")
+
+    # chain 的下一回合在佇列中等待，沒有心跳：空位逾期後交給下一場
+    time.sleep(0.4)
+    assert scheduler.dispatch() == ["next"]
+
+    assert not scheduler.heartbeat("chained")
+    assert scheduler.status()["inflight_debates"] == 1
+
+    scheduler.complete("next")
+    assert scheduler.heartbeat("chained")
+    assert r.zrange("sched:inflight", 0, -1) == ["chained"]
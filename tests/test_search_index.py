@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api import models, search_index
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    search_index.init_search_index(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _archive(topic, pro, con):
+    return models.DebateArchive(
+        topic=topic,
+        analysis_json={"step5_summary": f"{topic} 戰略摘要"},
+        rounds_json=[{
+            "round": 1,
+            "pro_agent": "正方辯士 1", "pro_content": pro,
+            "con_agent": "反方辯士 1", "con_content": con,
+            "summary": "Round 1 completed."
+        }],
+        logs_json={}
+    )
+
+
+def test_search_ranks_and_snippets(db):
+    db.add(_archive("台積電 2024 Q4 股價是否會上漲", "台積電月營收年增 30%", "外資持續賣超"))
+    db.add(_archive("AI 是否應受監管", "監管可降低風險", "監管會阻礙創新"))
+    db.commit()
+
+    result = search_index.search_debates(db, "台積電")
+    assert result["total"] == 1
+    hit = result["results"][0]
+    assert hit["topic"].startswith("台積電")
+    assert "<mark>" in hit["snippet"]
+
+
+def test_search_short_cjk_term_falls_back_to_like(db):
+    db.add(_archive("AI 是否應受監管", "監管可降低風險", "監管會阻礙創新"))
+    db.commit()
+
+    result = search_index.search_debates(db, "創新")
+    assert result["total"] == 1
+    assert "<mark>創新</mark>" in result["results"][0]["snippet"]
+
+
+def test_like_snippet_marks_the_first_term_found_in_the_row(db):
+    db.add(_archive("AI 是否應受監管", "監管可降低風險", "監管會阻礙創新"))
+    db.commit()
+
+    # "AI" 只出現在主題：片段改以內容中出現的「創新」為中心
+    assert "<mark>創新</mark>" in search_index.search_debates(db, "AI 創新")["results"][0]["snippet"]
+    # 各詞都不在發言內容中時以主題為片段
+    assert search_index.search_debates(db, "ai 是否")["results"][0]["snippet"] == "<mark>AI</mark> 是否應受監管"
+
+
+def test_search_pagination_and_delete(db):
+    for i in range(5):
+        db.add(_archive(f"辯題 {i} 半導體景氣", "半導體景氣回升", "庫存仍高"))
+    db.commit()
+
+    page = search_index.search_debates(db, "半導體", skip=2, limit=2)
+    assert page["total"] == 5
+    assert len(page["results"]) == 2
+
+    db.delete(db.query(models.DebateArchive).first())
+    db.commit()
+    assert search_index.search_debates(db, "半導體")["total"] == 4
+
+
+def test_backfill_existing_archives():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    with engine.begin() as conn:
+        conn.execute(models.DebateArchive.__table__.insert(), {
+            "topic": "既有存檔 聯發科", "analysis_json": {}, "rounds_json": [], "logs_json": {}
+        })
+
+    search_index.init_search_index(engine)
+    assert search_index.search_debates(session, "聯發科")["total"] == 1
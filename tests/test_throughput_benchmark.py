@@ -0,0 +1,43 @@
+import json
+import time
+
+import fakeredis
+
+from benchmarks.throughput import EventSubscriber, compare, latency_summary, percentile
+
+
+def test_percentile_nearest_rank():
+    samples = [0.4, 0.1, 0.3, 0.2]
+
+    assert percentile(samples, 50) == 0.2
+    assert percentile(samples, 90) == 0.4
+    assert percentile([], 50) is None
+    assert latency_summary(samples)["p99"] == 0.4
+    assert latency_summary([]) == {"count": 0}
+
+
+def test_compare_flags_regressions_by_direction():
+    baseline = {"debates_per_hour": 100.0, "turn_latency": {"p50": 1.0}}
+    current = {"debates_per_hour": 80.0, "turn_latency": {"p50": 0.5}}
+
+    report = compare(current, baseline)
+
+    assert report["debates_per_hour"]["regression"] is True
+    assert report["debates_per_hour"]["change"] == -0.2
+    assert report["turn_latency.p50"]["regression"] is False
+    assert "rss_kb_per_debate" not in report
+
+
+def test_event_subscriber_stops_at_debate_end():
+    client = fakeredis.FakeRedis()
+    subscriber = EventSubscriber(client, "d1")
+    subscriber.start()
+
+    channel = "debate:d1:log_stream"
+    client.publish(channel, json.dumps({"role": "System", "content": "Debate 'd1' has started."}))
+    client.publish(channel, json.dumps({"role": "System", "content": "Debate 'd1' has ended."}))
+    subscriber.join(timeout=5)
+
+    assert not subscriber.is_alive()
+    assert len(subscriber.events) == 2
+    assert subscriber.first_event <= time.perf_counter()
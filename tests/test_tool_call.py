@@ -0,0 +1,94 @@
+import json
+
+from worker import llm_utils
+from worker.json_stream import JsonObjectParser
+from api.tool_registry import tool_registry
+from worker.tool_call import NO_TOOL, build_tool_call_schema, parse_tool_call, tool_call_schema
+
+
+def test_parser_finds_object_across_chunks():
+    parser = JsonObjectParser()
+    chunks = ['好的，', '{"tool": "tej.stock', '_price", "params": {"coid": ', '"2330"}}', ' 多餘的文字']
+
+    results = [parser.feed(chunk) for chunk in chunks]
+
+    assert results[:3] == [None, None, None]
+    assert json.loads(results[3]) == {"tool": "tej.stock_price", "params": {"coid": "2330"}}
+
+
+def test_parser_ignores_braces_inside_strings():
+    text = '{"tool": "searxng.search", "params": {"q": "a } b \\" { c"}} {"other": 1}'
+
+    assert parse_tool_call(text) == {"tool": "searxng.search", "params": {"q": 'a } b " { c'}}
+
+
+def test_parse_tool_call_rejects_invalid_shapes():
+    assert parse_tool_call("沒有工具呼叫") is None
+    assert parse_tool_call('{"tool": "x", "params": {') is None
+    assert parse_tool_call('{"params": {}}') is None
+    assert parse_tool_call('{"tool": "x", "params": []}') is None
+    assert parse_tool_call('{"tool": "x"}') == {"tool": "x", "params": {}}
+
+
+def test_tool_call_schema_has_one_branch_per_tool():
+    schema = build_tool_call_schema(["unknown.tool_a", "unknown.tool_b"])
+
+    assert [branch["properties"]["tool"]["enum"] for branch in schema["anyOf"]] == [
+        ["unknown.tool_a"], ["unknown.tool_b"], [NO_TOOL]
+    ]
+    assert schema["anyOf"][0]["properties"]["params"] == {"type": "object"}
+    assert tool_call_schema() is tool_call_schema()
+    assert parse_tool_call('{"tool": "none", "params": {}}') is None
+
+
+def test_tool_call_schema_does_not_load_lazy_tools(monkeypatch):
+    monkeypatch.setattr(tool_registry, "_lazy_tools", {"lazy.tool:v1": ("adapters.does_not_exist", "Missing")})
+
+    schema = build_tool_call_schema(["lazy.tool"])
+
+    assert schema["anyOf"][0]["properties"]["params"] == {"type": "object"}
+    assert "lazy.tool:v1" in tool_registry._lazy_tools
+
+
+def test_call_llm_with_format_stops_at_first_object(monkeypatch):
+    captured = {}
+    lines = [
+        {"message": {"content": '{"tool": "tej.stock_price", '}, "done": False},
+        {"message": {"content": '"params": {"coid": "2330"}}'}, "done": False},
+        {"message": {"content": "never read"}, "done": False},
+    ]
+
+    class Response:
+        def __init__(self):
+            self.read = 0
+            self.closed = False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self):
+            for line in lines:
+                self.read += 1
+                yield json.dumps(line).encode()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.closed = True
+
+    response = Response()
+
+    def fake_post(url, json, stream=False):
+        captured.update(json, stream_arg=stream)
+        return response
+
+    monkeypatch.setattr(llm_utils.requests, "post", fake_post)
+
+    result = llm_utils.call_llm("call a tool", format={"type": "object"})
+
+    assert json.loads(result) == {"tool": "tej.stock_price", "params": {"coid": "2330"}}
+    assert captured["format"] == {"type": "object"}
+    assert captured["stream"] is True and captured["stream_arg"] is True
+    assert response.read == 2
+    assert response.closed
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from api.tool_manifest import TOOL_MANIFEST, register_builtin_tools
+from api.tool_registry import ToolRegistry
+
+
+def test_manifest_entries_resolve_to_matching_tools():
+    registry = register_builtin_tools(ToolRegistry(), include_entry_points=False)
+    assert len(registry.tool_ids()) == len(TOOL_MANIFEST)
+
+    for name, _, _ in TOOL_MANIFEST:
+        info = registry.get_tool_info(name)
+        assert info is not None
+        assert info["name"] == name
+
+
+def test_registration_does_not_import_adapters():
+    code = (
+        "import sys\n"
+        "from api.tool_manifest import register_builtin_tools\n"
+        "from api.tool_registry import ToolRegistry\n"
+        "registry = register_builtin_tools(ToolRegistry(), include_entry_points=False)\n"
+        "assert 'yfinance' not in sys.modules\n"
+        "assert 'adapters.tej_adapter' not in sys.modules\n"
+        "registry.get_tool_data('tej.stock_price')\n"
+        "assert 'adapters.tej_adapter' in sys.modules\n"
+        "assert 'yfinance' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from api.tool_registry import ToolNotFoundError, ToolRegistry
+
+
+class SlowTool:
+    name = "fake.slow"
+    schema = {"type": "object", "properties": {"delay": {"type": "number"}}}
+
+    def describe(self):
+        return {"name": self.name, "description": "sleeps"}
+
+    def invoke(self, **kwargs):
+        time.sleep(kwargs.get("delay", 0))
+        return {"data": kwargs}
+
+
+@pytest.fixture
+def registry():
+    registry = ToolRegistry(max_async_workers=2)
+    registry._redis_client = fakeredis.FakeRedis(decode_responses=True)
+    registry.register(SlowTool())
+    return registry
+
+
+def test_ainvoke_does_not_block_event_loop(registry):
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await registry.ainvoke_tool("fake.slow", {"delay": 0.2})
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+    assert result["data"] == {"delay": 0.2}
+    assert ticks >= 5
+
+
+def test_ainvoke_timeout(registry):
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(registry.ainvoke_tool("fake.slow", {"delay": 0.5}, timeout=0.05))
+
+
+def test_ainvoke_unknown_tool_raises_not_found(registry):
+    with pytest.raises(ToolNotFoundError):
+        asyncio.run(registry.ainvoke_tool("missing.tool", {}))
+
+
+class PartialTool(SlowTool):
+    name = "fake.partial"
+    cache_ttl = 3600
+
+    def invoke(self, **kwargs):
+        return {"data": kwargs, "cache_ttl": 5}
+
+
+def test_result_cache_ttl_overrides_tool_ttl(registry):
+    registry.register(PartialTool())
+
+    result = registry.invoke_tool("fake.partial", {"delay": 0})
+
+    assert "cache_ttl" not in result
+    key = registry._get_cache_key("fake.partial:v1", {"delay": 0})
+    assert 0 < registry._redis_client.ttl(key) <= 5
@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from api import models
+from api.tool_registry import tool_registry
+from api.toolset_service import ToolSetService, agent_tools_cache
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+        self.schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+
+    def describe(self):
+        return {"name": self.name, "description": f"{self.name} description"}
+
+    def invoke(self, **kwargs):
+        return {"data": kwargs}
+
+
+@pytest.fixture
+def db():
+    for name in ("fake.a", "fake.b", "fake.global"):
+        tool_registry.register(FakeTool(name))
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    agent_tools_cache.invalidate()
+    yield session
+    session.close()
+
+
+def _count_selects(session):
+    statements = []
+
+    def before_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", before_execute)
+    return statements
+
+
+def _setup_agent(db, toolset_count=5):
+    agent = models.Agent(name="a", system_prompt="p", config_json={})
+    db.add(agent)
+    db.add(models.ToolSet(name="global", tool_names=["fake.global"], is_global=True))
+    for i in range(toolset_count):
+        toolset = models.ToolSet(name=f"ts{i}", tool_names=["fake.a", "fake.b:v1"])
+        db.add(toolset)
+        db.flush()
+        db.add(models.AgentToolSet(agent_id=agent.id, toolset_id=toolset.id))
+    db.commit()
+    return agent
+
+
+def test_available_tools_uses_single_query_and_caches(db):
+    agent_id = _setup_agent(db, toolset_count=10).id
+    statements = _count_selects(db)
+
+    tools = ToolSetService.get_agent_available_tools(db, agent_id)
+    assert [t["name"] for t in tools] == ["fake.a", "fake.b", "fake.global"]
+    assert [t["source"] for t in tools] == ["assigned", "assigned", "global"]
+    assert len(statements) == 1
+
+    ToolSetService.get_agent_available_tools(db, agent_id)
+    assert len(statements) == 1
+
+
+def test_agent_toolsets_lists_assigned_then_global(db):
+    agent = _setup_agent(db, toolset_count=3)
+    toolsets = ToolSetService.get_agent_toolsets(db, agent.id)
+    assert [t["source"] for t in toolsets] == ["assigned"] * 3 + ["global"]
+    assert toolsets[-1]["tool_count"] == 1
+
+
+def test_cache_invalidated_after_assignment_commit(db):
+    agent = _setup_agent(db, toolset_count=1)
+    assert len(ToolSetService.get_agent_available_tools(db, agent.id)) == 3
+
+    db.query(models.AgentToolSet).filter(models.AgentToolSet.agent_id == agent.id).delete()
+    global_toolset = db.query(models.ToolSet).filter(models.ToolSet.is_global == True).first()
+    global_toolset.tool_names = []
+    db.commit()
+
+    assert ToolSetService.get_agent_available_tools(db, agent.id) == []
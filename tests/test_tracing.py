@@ -0,0 +1,130 @@
+import json
+
+import fakeredis
+import pytest
+
+from api import tracing
+from api.tool_registry import ToolRegistry
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure("file", str(path))
+    yield path
+    tracing.configure("none")
+
+
+def _spans(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_spans_are_noop_by_default(tmp_path):
+    tracing.configure("none")
+
+    with tracing.span("debate.run", debate_id="d1") as span:
+        span.set_attribute("ignored", True)
+
+    assert not tracing.enabled()
+    assert tracing.current_span() is tracing.NOOP_SPAN
+
+
+def test_nested_spans_share_the_debate_trace(trace_file):
+    @tracing.traced("llm.call")
+    def call():
+        tracing.current_span().set_attribute("llm.model", "m")
+
+    with tracing.span("debate.run", debate_id="d1"):
+        with tracing.span("debate.round", round=1):
+            call()
+    with tracing.span("debate.round", debate_id="d1", round=2):
+        pass
+
+    llm, round1, run, round2 = _spans(trace_file)
+    assert {s["trace_id"] for s in (llm, round1, run, round2)} == {run["trace_id"]}
+    assert llm["parent_span_id"] == round1["span_id"]
+    assert round1["parent_span_id"] == run["span_id"]
+    assert run["parent_span_id"] is None
+    assert llm["attributes"] == {"debate.id": "d1", "llm.model": "m"}
+    assert llm["duration_ms"] >= 0
+
+
+def test_span_records_errors(trace_file):
+    with pytest.raises(ValueError):
+        with tracing.span("debate.archive", debate_id="d1"):
+            raise ValueError("db down")
+
+    (record,) = _spans(trace_file)
+    assert record["status"] == "ERROR"
+    assert "db down" in record["attributes"]["error"]
+
+
+def test_traceparent_continues_trace_in_subtask(trace_file):
+    with tracing.span("debate.agent_turn", debate_id="d1"):
+        headers = tracing.propagation_headers()
+
+    with tracing.continue_trace(**headers):
+        with tracing.span("llm.call"):
+            pass
+
+    turn, llm = _spans(trace_file)
+    assert headers["debate_id"] == "d1"
+    assert llm["trace_id"] == turn["trace_id"]
+    assert llm["parent_span_id"] == turn["span_id"]
+    assert llm["attributes"]["debate.id"] == "d1"
+
+
+def test_traceparent_continues_trace_with_otel_exporter():
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    tracing.configure("otel")
+    try:
+        with tracing.span("debate.agent_turn", debate_id="d1"):
+            headers = tracing.propagation_headers()
+
+        with tracing.continue_trace(**headers):
+            with tracing.span("llm.call"):
+                pass
+    finally:
+        tracing.configure("none")
+
+    turn, llm = sorted(exporter.get_finished_spans(), key=lambda s: s.name)
+    assert headers["debate_id"] == "d1" and headers["traceparent"].startswith("00-")
+    assert llm.context.trace_id == turn.context.trace_id
+    assert llm.parent.span_id == turn.context.span_id
+    assert llm.attributes["debate.id"] == "d1"
+
+
+class CachedTool:
+    name = "bench.cached"
+    schema = {"type": "object"}
+    cache_ttl = 60
+
+    def describe(self):
+        return {"name": self.name}
+
+    def invoke(self, **kwargs):
+        return {"data": kwargs}
+
+
+def test_invoke_tool_span_flags_cache_hits(trace_file, capsys):
+    registry = ToolRegistry()
+    registry._redis_client = fakeredis.FakeRedis(decode_responses=True)
+    registry.register(CachedTool())
+
+    with tracing.span("debate.agent_turn", debate_id="d1"):
+        registry.invoke_tool("bench.cached", {"q": 1})
+        registry.invoke_tool("bench.cached", {"q": 1})
+
+    miss, hit, _ = _spans(trace_file)
+    assert miss["name"] == "tool.invoke"
+    assert miss["attributes"]["tool.cache_hit"] is False
+    assert hit["attributes"]["tool.cache_hit"] is True
+    assert hit["attributes"]["debate.id"] == "d1"
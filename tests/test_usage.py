@@ -0,0 +1,98 @@
+import json
+
+from worker import llm_utils, usage
+from worker.llm_utils import LLMResult
+from worker.usage import Usage, UsageLedger
+
+
+def test_call_llm_returns_token_counts_and_timings(monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {
+                "message": {"content": "論點"},
+                "prompt_eval_count": 300,
+                "eval_count": 50,
+                "total_duration": 3 * 10 ** 9,
+                "eval_duration": 2 * 10 ** 9,
+            }
+
+    monkeypatch.setattr(llm_utils.requests, "post", lambda url, json: Response())
+
+    result = llm_utils.call_llm("發言", model="usage-model")
+
+    assert result == "論點" and isinstance(result, str)
+    assert (result.model, result.prompt_tokens, result.completion_tokens) == ("usage-model", 300, 50)
+    assert result.total_tokens == 350
+    assert result.total_duration == 3 * 10 ** 9
+    restored = LLMResult.from_dict(json.loads(json.dumps(result.to_dict())))
+    assert restored == result and restored.eval_duration == result.eval_duration
+
+
+def test_streamed_call_counts_chunks_read(monkeypatch):
+    lines = [
+        {"message": {"content": '{"tool": "x", '}, "done": False},
+        {"message": {"content": '"params": {}}'}, "done": False},
+    ]
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self):
+            return (json.dumps(line).encode() for line in lines)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    monkeypatch.setattr(llm_utils.requests, "post", lambda url, json, stream=False: Response())
+
+    result = llm_utils.call_llm("call a tool", system_prompt="選擇工具", format={"type": "object"})
+
+    assert result.completion_tokens == 2
+    assert result.total_duration > 0
+    # 收不到 Ollama 的 prompt_eval_count：以訊息長度估計（4 個中文字 + 11 個 ASCII 字元）
+    assert result.prompt_tokens == 4 + 3 and result.prompt_tokens_estimated
+
+    ledger = UsageLedger()
+    ledger.record_llm(result, "正方辯士 1", 1)
+    ledger.record_llm(LLMResult("論點", "m", prompt_tokens=100), "正方辯士 1", 1)
+    total = ledger.to_dict()["total"]
+    assert total["prompt_tokens"] == 107 and total["estimated_prompt_tokens"] == 7
+
+
+def test_ledger_aggregates_by_participant_round_and_turn():
+    ledger = UsageLedger()
+    ledger.record_llm(LLMResult("分析", "m", prompt_tokens=1000, completion_tokens=200, total_duration=10 ** 9), "主席")
+    ledger.record_llm(LLMResult("{}", "m", prompt_tokens=400, completion_tokens=20), "正方辯士 1", 1)
+    ledger.record_tool({"data": {}, "cost": 0.5, "used_cache": False}, "正方辯士 1", 1)
+    ledger.record_tool({"data": {}, "cost": 0.5, "used_cache": True}, "反方辯士 1", 1)
+    ledger.record_llm("Error: timeout", "反方辯士 1", 2)
+
+    data = ledger.to_dict()
+
+    assert data["total"]["total_tokens"] == 1620
+    assert data["total"]["llm_calls"] == 3 and data["total"]["tool_calls"] == 2
+    assert data["total"]["cost"] == 0.5
+    assert data["by_participant"]["主席"]["llm_seconds"] == 1.0
+    assert data["by_round"]["1"]["prompt_tokens"] == 400
+    assert "主席" not in {t["participant"] for t in data["turns"]}
+    assert {(t["round"], t["participant"]) for t in data["turns"]} == {
+        (1, "正方辯士 1"), (1, "反方辯士 1"), (2, "反方辯士 1")
+    }
+    assert UsageLedger.from_dict(json.loads(json.dumps(data))).to_dict() == data
+
+
+def test_llm_token_cost_uses_model_price(monkeypatch):
+    monkeypatch.setattr(usage, "LLM_TOKEN_COST", {"big": {"prompt": 1.0, "completion": 2.0}, "*": {"prompt": 0.1}})
+    total = Usage()
+
+    total.add_llm(LLMResult("a", "big", prompt_tokens=1000, completion_tokens=500))
+    total.add_llm(LLMResult("b", "small", prompt_tokens=1000, completion_tokens=500))
+
+    assert round(total.cost, 6) == 2.1
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import pytest
+
+from adapters import web_fetch_adapter
+from adapters.web_fetch_adapter import ContentCache, WebFetchAdapter, _FetchLoop, extract_main_text
+from benchmarks.mocks.server import MockHandler, MockServer
+
+ARTICLE = """
+<html><head><title>央行升息半碼</title><style>body { color: red }</style></head>
+<body>
+  <nav><a href="/">首頁</a> <a href="/news">新聞</a></nav>
+  <header>財經新聞網</header>
+  <article>
+    <h1>央行宣布升息半碼</h1>
+    <p>重貼現率調升至 2%，為近十年來最高水準。</p>
+    <p>市場反應平淡，&amp; 債券殖利率小幅上升。</p>
+  </article>
+  <aside>熱門文章</aside>
+  <script>track()</script>
+  <footer>版權所有</footer>
+</body></html>
+"""
+
+
+class PageHandler(MockHandler):
+    def do_GET(self):
+        service = self.service
+        service.count("requests")
+        with service._lock:
+            service.active += 1
+            service.peak = max(service.peak, service.active)
+        try:
+            time.sleep(service.latency)
+            if self.headers.get("If-None-Match"):
+                service.conditional.append(self.path)
+            service.hosts.append(self.headers.get("Host"))
+            if self.path == "/moved":
+                self.send_page(301, b"", {"Location": "/article"})
+            elif self.path == "/big5":
+                page = ARTICLE.replace("<head>", '<head><meta charset="big5">')
+                self.send_page(200, page.encode("cp950"), {"Content-Type": "text/html"})
+            elif self.path == "/gone":
+                self.send_page(304, b"", {})
+            elif self.headers.get("If-None-Match") == service.etag:
+                service.count("not_modified")
+                self.send_page(304, b"", {"ETag": service.etag})
+            else:
+                self.send_page(200, ARTICLE.encode("utf-8"), {
+                    "Content-Type": "text/html; charset=utf-8", "ETag": service.etag,
+                })
+        finally:
+            with service._lock:
+                service.active -= 1
+
+    def send_page(self, status, body, headers):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PageServer(MockServer):
+    handler_class = PageHandler
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.etag = '"v1"'
+        self.active = 0
+        self.peak = 0
+        self.conditional = []
+        self.hosts = []
+
+
+@pytest.fixture
+def server():
+    with PageServer() as server:
+        yield server
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    return WebFetchAdapter(cache_dir=str(tmp_path), allow_private=True)
+
+
+def test_extract_main_text_skips_boilerplate():
+    title, text = extract_main_text(ARTICLE)
+
+    assert title == "央行升息半碼"
+    assert text.splitlines() == ["央行宣布升息半碼", "重貼現率調升至 2%，為近十年來最高水準。", "市場反應平淡，& 債券殖利率小幅上升。"]
+
+
+def test_fetch_extracts_and_caches(server, adapter):
+    result = adapter.invoke(urls=[f"{server.url}/moved"])
+    entry = result["data"][0]
+
+    assert entry["cache"] == "miss" and entry["final_url"] == f"{server.url}/article"
+    assert entry["title"] == "央行升息半碼" and "重貼現率" in entry["text"]
+    assert result["citations"][0]["url"] == f"{server.url}/article"
+
+    again = adapter.invoke(urls=[f"{server.url}/moved"], max_chars=200)
+    assert again["data"][0]["cache"] == "hit" and again["data"][0]["text"] == entry["text"]
+    assert server.stats["requests"] == 2
+
+
+def test_stale_entries_are_revalidated_with_etag(server, tmp_path):
+    adapter = WebFetchAdapter(cache_dir=str(tmp_path), fresh_seconds=0, allow_private=True)
+    url = f"{server.url}/article"
+
+    first = adapter.invoke(urls=[url])["data"][0]
+    second = adapter.invoke(urls=[url])["data"][0]
+
+    assert second["cache"] == "revalidated" and second["text"] == first["text"]
+    assert server.stats["not_modified"] == 1
+
+    # 內容相同的網址共用同一個內容檔
+    adapter.invoke(urls=[f"{server.url}/article?copy=1"])
+    assert len(list((tmp_path / "objects").rglob("*.txt"))) == 1
+
+
+def test_concurrency_is_limited_per_domain(tmp_path):
+    with PageServer(latency=0.2) as server:
+        adapter = WebFetchAdapter(cache_dir=str(tmp_path), allow_private=True)
+        urls = [f"{server.url}/article?n={i}" for i in range(5)]
+
+        start = time.perf_counter()
+        result = adapter.invoke(urls=urls)
+
+        assert [entry["cache"] for entry in result["data"]] == ["miss"] * 5
+        assert server.peak == 2
+        assert time.perf_counter() - start >= 0.6
+
+
+def test_private_addresses_are_rejected(server, tmp_path):
+    adapter = WebFetchAdapter(cache_dir=str(tmp_path), allow_private=False)
+
+    with pytest.raises(RuntimeError, match="non-public address"):
+        adapter.invoke(urls=[f"{server.url}/article"])
+    assert server.stats.get("requests", 0) == 0
+
+
+def test_meta_charset_is_used_when_header_has_none(server, adapter):
+    entry = adapter.invoke(urls=[f"{server.url}/big5"])["data"][0]
+
+    assert entry["title"] == "央行升息半碼" and "重貼現率調升至 2%" in entry["text"]
+
+
+def test_unsolicited_not_modified_is_an_error(server, adapter):
+    gone, article = adapter.invoke(urls=[f"{server.url}/gone", f"{server.url}/article"])["data"]
+
+    assert "304" in gone["error"] and article["cache"] == "miss"
+
+
+def test_sweep_evicts_expired_and_oldest_entries(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=250, max_age=3600, sweep_interval=3600)
+    for i in range(4):
+        cache.put(f"https://example.com/{i}", str(i) * 100, title=str(i))
+    old = cache.get("https://example.com/0")
+    old["fetched_at"] -= 7200
+    cache._write(cache._index_path("https://example.com/0"), json.dumps(old))
+    # 讓未引用的內容檔超過清理的寬限時間
+    for path in (tmp_path / "objects").rglob("*.txt"):
+        os.utime(path, (0, 0))
+
+    cache.sweep()
+
+    assert cache.get("https://example.com/0") is None
+    assert cache.get("https://example.com/1") is None
+    assert cache.get("https://example.com/2") and cache.get("https://example.com/3")
+    assert len(list((tmp_path / "objects").rglob("*.txt"))) == 2
+
+
+def test_object_swept_after_lookup_is_refetched(server, adapter, monkeypatch):
+    url = f"{server.url}/article"
+    adapter.invoke(urls=[url])
+    meta = adapter.cache.get(url)
+    # 另一個 worker 在 get() 之後清掉了內容檔
+    monkeypatch.setattr(adapter.cache, "get", lambda url: meta)
+    os.remove(adapter.cache._object_path(meta["content_hash"]))
+
+    entry = adapter.invoke(urls=[url])["data"][0]
+
+    assert entry["cache"] == "miss" and "重貼現率" in entry["text"]
+    assert server.stats["requests"] == 2
+
+
+def test_touch_restores_a_swept_object(tmp_path):
+    cache = ContentCache(str(tmp_path))
+    meta = cache.put("https://example.com/a", "正文", title="a")
+    os.remove(cache._object_path(meta["content_hash"]))
+
+    cache.touch("https://example.com/a", meta, "正文")
+
+    assert cache.read(cache.get("https://example.com/a")) == "正文"
+
+
+def test_validators_are_only_sent_to_the_cached_url(server, tmp_path):
+    adapter = WebFetchAdapter(cache_dir=str(tmp_path), fresh_seconds=0, allow_private=True)
+
+    adapter.invoke(urls=[f"{server.url}/moved"])
+    entry = adapter.invoke(urls=[f"{server.url}/moved"])["data"][0]
+
+    assert entry["cache"] == "revalidated"
+    assert server.conditional == ["/article"]
+
+
+def test_connection_uses_the_checked_address(server, tmp_path, monkeypatch):
+    answers = []
+
+    async def resolve(host):
+        return [answers.pop(0) if answers else "127.0.0.1"]
+
+    monkeypatch.setattr(web_fetch_adapter, "_resolve", resolve)
+    monkeypatch.setattr(web_fetch_adapter, "_is_public", lambda address: str(address) != "10.0.0.1")
+    adapter = WebFetchAdapter(cache_dir=str(tmp_path), allow_private=False)
+    port = server.url.rsplit(":", 1)[1]
+
+    # 無法由 DNS 解析的主機名稱：連得上就表示連線使用的是檢查過的位址
+    entry = adapter.invoke(urls=[f"http://rebind.test:{port}/article"])["data"][0]
+    assert "重貼現率" in entry["text"] and server.hosts == [f"rebind.test:{port}"]
+
+    # DNS rebinding：請求前的檢查拿到可連線的位址，建立連線時改指向內網
+    answers.extend(["127.0.0.1", "10.0.0.1"])
+    with pytest.raises(RuntimeError, match="non-public address 10.0.0.1"):
+        adapter.invoke(urls=[f"http://rebind2.test:{port}/article"])
+    assert len(server.hosts) == 1
+
+
+def test_timed_out_fetches_are_cancelled():
+    fetch_loop = _FetchLoop(max_connections=1, per_domain=1, timeout=1)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(FuturesTimeoutError):
+        fetch_loop.run(slow(), timeout=0.1)
+    time.sleep(0.1)
+    assert cancelled == [True]
@@ -0,0 +1,91 @@
+"""
+賽前分析快取
+
+同一辯題的賽前分析結果只取決於辯題、工具目錄（影響 system prompt）與模型，
+因此以「正規化辯題 + 工具目錄版本 + 模型」為 key 存在 Redis，
+在 ANALYSIS_CACHE_TTL 秒（新鮮期）內重複的辯題直接沿用。
+建立辯論時帶 config.refresh_analysis = true 可強制重新分析並覆寫快取。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+import redis
+
+from worker.model_router import default_model
+from worker.tool_config import TOOL_CATALOG_VERSION
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+KEY_PREFIX = "analysis_cache:"
+
+_redis_client = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        redis_host = os.getenv("REDIS_HOST", "redis")
+        _redis_client = redis.Redis(host=redis_host, port=6379, db=0, decode_responses=True)
+    return _redis_client
+
+
+def set_redis_client(client: redis.Redis) -> None:
+    global _redis_client
+    _redis_client = client
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    正規化辯題：全形轉半形（NFKC）、英文轉小寫、合併空白、去除結尾標點。
+    """
+    text = unicodedata.normalize("NFKC", topic).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?？!！。.")
+
+
+def resolve_model(model: Optional[str] = None) -> str:
+    return model or default_model("analysis")
+
+
+def cache_key(topic: str, model: Optional[str] = None) -> str:
+    raw = f"{normalize_topic(topic)}|{TOOL_CATALOG_VERSION}|{resolve_model(model)}"
+    return KEY_PREFIX + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_analysis(topic: str, model: Optional[str] = None, max_age: int = ANALYSIS_CACHE_TTL) -> Optional[Dict[str, Any]]:
+    """
+    取得新鮮期內的分析結果；沒有或已過期時回傳 None。Redis 無法連線時視為未命中。
+    """
+    try:
+        payload = _get_redis().get(cache_key(topic, model))
+    except redis.RedisError as e:
+        logger.warning("Analysis cache unavailable: %s", e)
+        return None
+    if not payload:
+        return None
+    entry = json.loads(payload)
+    if time.time() - entry.get("created_at", 0) > max_age:
+        return None
+    return entry["analysis"]
+
+
+def store_analysis(topic: str, analysis: Dict[str, Any], model: Optional[str] = None, ttl: int = ANALYSIS_CACHE_TTL) -> None:
+    entry = {
+        "topic": topic,
+        "model": resolve_model(model),
+        "catalog_version": TOOL_CATALOG_VERSION,
+        "created_at": time.time(),
+        "analysis": analysis,
+    }
+    try:
+        _get_redis().set(cache_key(topic, model), json.dumps(entry, ensure_ascii=False), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning("Analysis cache unavailable: %s", e)
@@ -2,61 +2,98 @@ import sys
 sys.path.insert(0, '/app')
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
+from kombu import Queue
 from dotenv import load_dotenv
 import os
 
-from api.database import init_db
-from adapters.searxng_adapter import SearXNGAdapter
-from adapters.duckduckgo_adapter import DuckDuckGoAdapter
-from adapters.yfinance_adapter import YFinanceAdapter
-from adapters.tej_adapter import (
-    TEJCompanyInfo, TEJStockPrice, TEJMonthlyRevenue, TEJInstitutionalHoldings,
-    TEJMarginTrading, TEJForeignHoldings, TEJFinancialSummary, TEJFundNAV,
-    TEJShareholderMeeting, TEJFundBasicInfo, TEJOffshoreFundInfo, TEJOffshoreFundDividend,
-    TEJOffshoreFundHoldingsRegion, TEJOffshoreFundHoldingsIndustry, TEJOffshoreFundNAVRank,
-    TEJOffshoreFundNAVDaily, TEJOffshoreFundSuspension, TEJOffshoreFundPerformance,
-    TEJIFRSAccountDescriptions, TEJFinancialCoverCumulative, TEJFinancialSummaryQuarterly,
-    TEJFinancialCoverQuarterly, TEJFuturesData, TEJOptionsBasicInfo, TEJOptionsDailyTrading
-)
-from api.tool_registry import tool_registry
-
+# 先載入 .env：api.log 在 import 時讀取 LOG_* 設定與要遮蔽的機密
 load_dotenv()
 
+import api.log  # 設定 api / worker / adapters 的 logger（見 api/log.py）
+from api.database import init_db
+from api.tool_manifest import register_builtin_tools
+from api.metrics import start_metrics_server
+
 # 建立 Celery 實例
 redis_host = os.getenv('REDIS_HOST', 'localhost')
 app = Celery('worker', broker=f'redis://{redis_host}:6379/0', backend=f'redis://{redis_host}:6379/0')
+
+# 佇列劃分：
+# - debates：辯論流程編排（單一長任務或逐輪的鏈式任務）
+# - llm：LLM 呼叫（GPU 綁定，併發數應與 Ollama 可並行的請求數一致）
+# - tools：工具呼叫（I/O 綁定，可開高併發）
+# 併發數與 prefetch 在各 worker 啟動時以 -Q / -c / --prefetch-multiplier 指定（見 docker-compose.yml）
+DEBATES_QUEUE = 'debates'
+LLM_QUEUE = 'llm'
+TOOLS_QUEUE = 'tools'
+
+# 任務優先權：0 最高（互動式辯論），9 最低（批次辯論）
+PRIORITY_STEPS = [0, 3, 6, 9]
+PRIORITY_SEP = ':'
+DEFAULT_PRIORITY = 3
+
+app.conf.update(
+    task_queues=(Queue(DEBATES_QUEUE), Queue(LLM_QUEUE), Queue(TOOLS_QUEUE)),
+    task_default_queue=DEBATES_QUEUE,
+    task_routes={
+        'worker.tasks.execute_tool': {'queue': TOOLS_QUEUE},
+        'worker.tasks.llm_generate': {'queue': LLM_QUEUE},
+        'worker.tasks.run_debate_cycle': {'queue': DEBATES_QUEUE},
+        'worker.tasks.prepare_debate': {'queue': DEBATES_QUEUE},
+        'worker.tasks.prepare_batch': {'queue': DEBATES_QUEUE},
+        'worker.tasks.run_debate_round': {'queue': DEBATES_QUEUE},
+        'worker.tasks.finalize_debate': {'queue': DEBATES_QUEUE},
+        'worker.tasks.abort_debate': {'queue': DEBATES_QUEUE},
+    },
+    # 長任務：一次只預取一個，並在完成後才 ack，避免 worker 重啟時遺失辯論
+    worker_prefetch_multiplier=int(os.getenv('CELERY_PREFETCH_MULTIPLIER', '1')),
+    task_acks_late=True,
+    # Redis broker 的優先權：每個佇列依 PRIORITY_STEPS 拆成多個 list，數字越小越先被取出
+    broker_transport_options={
+        'priority_steps': PRIORITY_STEPS,
+        'sep': PRIORITY_SEP,
+        'queue_order_strategy': 'priority',
+    },
+    task_default_priority=DEFAULT_PRIORITY,
+)
+
+
+def queue_keys(queue: str) -> list:
+    """
+    回傳佇列在 Redis broker 中各優先權對應的 list key（用於計算佇列深度）。
+    """
+    return [queue if step == 0 else f"{queue}{PRIORITY_SEP}{step}" for step in PRIORITY_STEPS]
+
+# 工具 / LLM 呼叫方式："inline" 在辯論任務內直接執行；"task" 派送到對應佇列並等待結果
+TOOL_DISPATCH = os.getenv('TOOL_DISPATCH', 'inline')
+LLM_DISPATCH = os.getenv('LLM_DISPATCH', 'inline')
+TOOL_TASK_TIMEOUT = float(os.getenv('TOOL_TASK_TIMEOUT', '60'))
+LLM_TASK_TIMEOUT = float(os.getenv('LLM_TASK_TIMEOUT', '600'))
+
+# 設定 WORKER_METRICS_PORT 時在 worker 主行程啟動 Prometheus exporter（見 api/metrics.py）
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '0'))
+
+
+@worker_init.connect
+def _start_metrics_exporter(**kwargs):
+    if WORKER_METRICS_PORT:
+        start_metrics_server(WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+# 辯論編排方式："single" 一個任務跑完整場；"chain" 每輪一個任務串接，輪與輪之間釋放 worker
+DEBATE_ORCHESTRATION = os.getenv('DEBATE_ORCHESTRATION', 'single')
+
 app.autodiscover_tasks(['worker'])
 
-# 在 worker 啟動時註冊工具
-tool_registry.register(SearXNGAdapter())
-tool_registry.register(DuckDuckGoAdapter())
-tool_registry.register(YFinanceAdapter())
-tool_registry.register(TEJCompanyInfo())
-tool_registry.register(TEJStockPrice())
-tool_registry.register(TEJMonthlyRevenue())
-tool_registry.register(TEJInstitutionalHoldings())
-tool_registry.register(TEJMarginTrading())
-tool_registry.register(TEJForeignHoldings())
-tool_registry.register(TEJFinancialSummary())
-tool_registry.register(TEJFundNAV())
-tool_registry.register(TEJShareholderMeeting())
-tool_registry.register(TEJFundBasicInfo())
-tool_registry.register(TEJOffshoreFundInfo())
-tool_registry.register(TEJOffshoreFundDividend())
-tool_registry.register(TEJOffshoreFundHoldingsRegion())
-tool_registry.register(TEJOffshoreFundHoldingsIndustry())
-tool_registry.register(TEJOffshoreFundNAVRank())
-tool_registry.register(TEJOffshoreFundNAVDaily())
-tool_registry.register(TEJOffshoreFundSuspension())
-tool_registry.register(TEJOffshoreFundPerformance())
-tool_registry.register(TEJIFRSAccountDescriptions())
-tool_registry.register(TEJFinancialCoverCumulative())
-tool_registry.register(TEJFinancialSummaryQuarterly())
-tool_registry.register(TEJFinancialCoverQuarterly())
-tool_registry.register(TEJFuturesData())
-tool_registry.register(TEJOptionsBasicInfo())
-tool_registry.register(TEJOptionsDailyTrading())
+# 在 worker 啟動時註冊工具（宣告式、延遲載入）
+register_builtin_tools()
 
 # 在 worker 啟動時初始化資料庫
 init_db()
-
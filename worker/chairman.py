@@ -1,70 +1,65 @@
 from agentscope.agent import AgentBase
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import logging
+import os
 import redis
 import json
-from worker.llm_utils import call_llm
-from worker.tool_config import get_tools_description, get_recommended_tools_for_topic, STOCK_CODES, CURRENT_DATE
+from worker.dispatch import run_llm
+from worker.analysis_cache import get_cached_analysis, store_analysis
+from worker.tool_config import get_recommended_tools_for_topic
+from worker.prompts import build_analysis_system_prompt
+from worker.debate_context import format_turns
+from worker.model_router import resolve_model, model_settings
+from worker.usage import UsageLedger
+from api.log import preview
+from api.tracing import traced, current_span
+
+logger = logging.getLogger(__name__)
 
 class Chairman(AgentBase):
     """
     主席智能體，負責主持辯論、賽前分析和賽後總結。
     """
 
-    def __init__(self, name: str, **kwargs: Any):
+    def __init__(self, name: str, model_config: Dict[str, Any] = None, **kwargs: Any):
         super().__init__()
         self.name = name
+        # 模型路由設定（格式同 Agent.config_json，見 worker/model_router.py）
+        self.model_settings = model_settings(model_config)
 
     def speak(self, content: str):
         """
         主席發言。
         """
-        print(f"Chairman '{self.name}': {content}")
+        logger.info("Chairman '%s': %s", self.name, content)
 
-    def pre_debate_analysis(self, topic: str) -> Dict[str, Any]:
+    @traced("chairman.pre_debate_analysis")
+    def pre_debate_analysis(self, topic: str, refresh: bool = False, usage: Optional[UsageLedger] = None) -> Dict[str, Any]:
         """
         執行賽前分析的 7 步管線。
+        相同辯題（正規化後）、工具目錄與模型的分析結果會快取，refresh=True 時強制重新分析。
+        提供 usage 時記錄分析的 LLM 用量（命中快取時沒有用量）。
         """
-        print(f"Chairman '{self.name}' is starting pre-debate analysis for topic: '{topic}'")
-
-        # 獲取推薦工具
-        recommended_tools = get_recommended_tools_for_topic(topic)
-        tools_desc = get_tools_description()
-        
-        system_prompt = f"""你是辯論賽的主席與分析師。你的任務是對辯題進行深度的賽前分析。
-請嚴格按照以下步驟進行分析，並輸出結果：
+        model = resolve_model('analysis', self.model_settings)
+        if not refresh:
+            cached = get_cached_analysis(topic, model)
+            if cached is not None:
+                logger.info("Chairman '%s' reused cached pre-debate analysis for topic: '%s'", self.name, topic)
+                current_span().set_attribute("analysis.cached", True)
+                return cached
+        current_span().set_attribute("analysis.cached", False)
 
-Step 1: 題型識別 (這是一個怎樣的問題？例如：事實性、政策性、價值性)
-Step 2: 核心要素萃取 (有哪些東西和這個問題是強相關)
-Step 3: 因果鏈建構 (例如：A -> B -> C)
-Step 4: 子題拆解 (Sub-questions) (如果命題為真，關係鏈是什麼？有哪些子問題需要驗證？)
-Step 5: 戰略分析總結 (給 Agent 的戰前情報摘要)
-Step 6: 主席備註 (Chairman Notes) (將注入 Agent Prompt 的注意事項)
-Step 7: 工具策略預覽 (Tool Strategy) (推薦使用的工具)
+        logger.info("Chairman '%s' is starting pre-debate analysis for topic: '%s'", self.name, topic)
 
-{tools_desc}
-
-**重要常數**：
-{chr(10).join([f"- {name}: {code}" for name, code in STOCK_CODES.items()])}
-- 當前日期：{CURRENT_DATE}
-
-**針對此辯題的推薦工具**：{', '.join(recommended_tools)}
-
-請務必使用「繁體中文」進行回答。
+        # 靜態前綴（步驟、工具列表、常數、輸出格式）每個工具目錄版本只組一次，推薦工具放在最後
+        recommended_tools = get_recommended_tools_for_topic(topic)
+        system_prompt = build_analysis_system_prompt(recommended_tools)
 
-請以 JSON 格式輸出，包含以下欄位：
-{{
-    "step1_type": "...",
-    "step2_elements": "...",
-    "step3_causal_chain": "...",
-    "step4_sub_questions": "...",
-    "step5_summary": "...",
-    "step6_notes": "...",
-    "step7_tools": "..."
-}}
-"""
         prompt = f"請對以下辯題進行分析：{topic}"
         
-        response = call_llm(prompt, system_prompt=system_prompt)
+        response = run_llm(prompt, system_prompt=system_prompt, model=model)
+        if usage is not None:
+            usage.record_llm(response, self.name)
         
         try:
             # 嘗試解析 JSON，如果 LLM 返回了 Markdown code block，需要處理
@@ -74,8 +69,10 @@ Step 7: 工具策略預覽 (Tool Strategy) (推薦使用的工具)
                 response = response.split("```")[1].split("```")[0].strip()
             
             analysis_result = json.loads(response)
+            # 只快取成功解析的結果，fallback 不寫入
+            store_analysis(topic, analysis_result, model)
         except Exception as e:
-            print(f"Error parsing analysis result: {e}. Raw response: {response}")
+            logger.warning("Error parsing analysis result: %s. Raw response: %s", e, preview(response))
             # Fallback structure
             analysis_result = {
                 "step1_type": "未識別",
@@ -87,16 +84,36 @@ Step 7: 工具策略預覽 (Tool Strategy) (推薦使用的工具)
                 "step7_tools": ", ".join(recommended_tools)
             }
 
-        print(f"Pre-debate analysis completed.")
+        logger.info("Pre-debate analysis completed.")
         return analysis_result
 
+    def summarize_history(self, previous_summary: str, turns: List[Dict[str, Any]]) -> str:
+        """
+        將較早的發言併入滾動摘要（增量：只送出上一版摘要與新滑出視窗的發言）。
+        """
+        system_prompt = """你是辯論賽的主席。請將辯論的前情摘要與新增發言整合成一份更新後的摘要。
+要求：
+- 保留雙方的核心論點、引用的關鍵數據與尚未回應的質疑
+- 刪除重複與客套內容，不加入新的觀點
+- 以條列呈現，總長不超過 300 字
+- 使用繁體中文
+"""
+        prompt = f"""前情摘要：
+{previous_summary or '（無）'}
+
+新增發言：
+{format_turns(turns)}
+
+請輸出更新後的摘要："""
+        return run_llm(prompt, system_prompt=system_prompt, model=resolve_model('summary', self.model_settings))
+
     def summarize_round(self, debate_id: str, round_num: int):
         """
         對本輪辯論進行總結。
         """
-        print(f"Chairman '{self.name}' is summarizing round {round_num}.")
+        logger.info("Chairman '%s' is summarizing round %d.", self.name, round_num)
         
-        redis_client = redis.Redis(host='redis', port=6379, db=0)
+        redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'redis'), port=6379, db=0)
         evidence_key = f"debate:{debate_id}:evidence"
         
         # 這裡應該要獲取本輪的所有發言紀錄，而不僅僅是證據
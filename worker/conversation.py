@@ -0,0 +1,69 @@
+"""
+Agent 的多輪對話
+
+每個 Agent 在一場辯論中維持一段對話：system prompt 固定，之後每次提問與回覆依序累積。
+同一回合的「選工具」與「根據工具結果發言」是同一段對話的連續兩則訊息，
+下一回合也接在前面的對話之後，送給 Ollama 的訊息前綴與上一次呼叫相同，
+伺服器可以沿用已經 prefill 過的前綴（搭配 OLLAMA_KEEP_ALIVE 讓模型保持載入）。
+
+Ollama 的 /api/chat 不回傳 /api/generate 那種 context token 陣列，
+前綴重用是由伺服器比對訊息前綴完成，因此這裡只需要保證訊息逐字不變地累積。
+
+對話長度以 AGENT_HISTORY_TOKEN_BUDGET 為上限：超過時一次捨棄最舊的問答到預算的一半，
+之後幾個回合的前綴又能保持穩定，而不是每回合都因為截斷而改變前綴。
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from worker.dispatch import run_llm
+from worker.debate_context import estimate_tokens
+
+AGENT_HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "6000"))
+
+
+class Conversation:
+    """
+    累積訊息的對話；可序列化，供鏈式任務在輪與輪之間傳遞。
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        messages: Optional[List[Dict[str, str]]] = None,
+        llm: Callable[..., str] = run_llm,
+        max_history_tokens: int = AGENT_HISTORY_TOKEN_BUDGET,
+    ):
+        self.system_prompt = system_prompt
+        self.messages = list(messages or [])
+        self._llm = llm
+        self.max_history_tokens = max_history_tokens
+
+    def _trim(self) -> None:
+        total = sum(estimate_tokens(m["content"]) for m in self.messages)
+        if total <= self.max_history_tokens:
+            return
+        target = self.max_history_tokens // 2
+        while self.messages and total > target:
+            # 以一組問答為單位捨棄
+            for message in self.messages[:2]:
+                total -= estimate_tokens(message["content"])
+            del self.messages[:2]
+
+    def ask(self, prompt: str, **kwargs: Any) -> str:
+        """
+        送出一則訊息並把問答加入對話。LLM 回傳錯誤時不寫入，避免錯誤訊息污染後續的前綴。
+        """
+        self._trim()
+        response = self._llm(prompt, system_prompt=self.system_prompt, history=self.messages, **kwargs)
+        if response and not response.startswith("Error:"):
+            self.messages.append({"role": "user", "content": prompt})
+            self.messages.append({"role": "assistant", "content": response})
+        return response
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"system_prompt": self.system_prompt, "messages": self.messages}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], llm: Callable[..., str] = run_llm) -> "Conversation":
+        return cls(data["system_prompt"], data.get("messages"), llm=llm)
@@ -0,0 +1,175 @@
+"""
+辯論上下文：滾動摘要與 token 預算
+
+讓 Agent 看到對手先前的發言才能反駁，但把整段歷史原封不動塞進 prompt，長度會隨回合數二次成長。
+DebateContext 的做法：
+- 最近 K 則發言（DEBATE_CONTEXT_RECENT_TURNS）逐字保留；
+- 更早的發言由主席壓縮成一段滾動摘要，每回合結束時只把新滑出視窗的發言併入摘要（增量），
+  並在背景執行緒進行，下一回合的第一位發言者不必等待；摘要還沒完成時，那幾則發言暫時逐字保留；
+- render() 以本地的 token 估算把輸出限制在預算內（DEBATE_CONTEXT_TOKEN_BUDGET），
+  超過時優先截斷摘要與較舊的發言。
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEBATE_CONTEXT_RECENT_TURNS = int(os.getenv("DEBATE_CONTEXT_RECENT_TURNS", "4"))
+DEBATE_CONTEXT_TOKEN_BUDGET = int(os.getenv("DEBATE_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# CJK 字元（含全形標點）大約一個字一個 token；其餘文字大約 4 個字元一個 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    快速估算 token 數（不需要載入 tokenizer），偏保守。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """
+    將文字截斷到估算的 token 數以內；keep="tail" 保留結尾。
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        part = text[:mid] if keep == "head" else text[-mid:]
+        if estimate_tokens(part) <= max_tokens - 1:
+            lo = mid
+        else:
+            hi = mid - 1
+    part = text[:lo] if keep == "head" else text[-lo:]
+    return part + "…" if keep == "head" else "…" + part
+
+
+def format_turns(turns: List[Dict[str, Any]]) -> str:
+    return "\n".join(f"[第 {t['round']} 輪] {t['role']}：{t['content']}" for t in turns)
+
+
+class DebateContext:
+    """
+    保存辯論發言，並產生給 Agent 的上下文區塊。summarizer(previous_summary, turns) 回傳新的摘要。
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None,
+        recent_turns: int = DEBATE_CONTEXT_RECENT_TURNS,
+        token_budget: int = DEBATE_CONTEXT_TOKEN_BUDGET,
+        background: bool = True,
+    ):
+        self.summarizer = summarizer
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.turns: List[Dict[str, Any]] = []
+        self.summary = ""
+        # turns[:summarized] 已併入 summary
+        self.summarized = 0
+        self._background = background
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
+
+    def add_turn(self, role: str, content: str, round_num: int) -> None:
+        self.turns.append({"role": role, "content": content, "round": round_num})
+
+    def schedule_summary(self) -> None:
+        """
+        回合結束時呼叫：把滑出最近 K 則視窗、尚未摘要的發言併入摘要。
+        """
+        self._collect()
+        if self.summarizer is None or self._pending is not None:
+            return
+        end = len(self.turns) - self.recent_turns
+        if end <= self.summarized:
+            return
+        previous, new_turns = self.summary, self.turns[self.summarized:end]
+
+        def work():
+            return end, self.summarizer(previous, new_turns)
+
+        if self._background:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debate-summary")
+            self._pending = self._executor.submit(work)
+        else:
+            self._apply(work())
+
+    def _apply(self, result) -> None:
+        end, summary = result
+        if summary and not summary.startswith("Error:"):
+            self.summary = summary
+            self.summarized = end
+
+    def _collect(self, wait: bool = False) -> None:
+        """
+        已完成（或 wait=True 時等待完成）的背景摘要寫回。摘要失敗時保留原本的摘要，下回合再併入。
+        """
+        if self._pending is None or not (wait or self._pending.done()):
+            return
+        future, self._pending = self._pending, None
+        try:
+            self._apply(future.result())
+        except Exception as e:
+            logger.warning("History summarization failed: %s", e)
+
+    def render(self, token_budget: Optional[int] = None) -> str:
+        """
+        產生上下文區塊：前情摘要 + 尚未摘要的發言（含最近 K 則），總長不超過 token 預算。
+        """
+        self._collect()
+        budget = self.token_budget if token_budget is None else token_budget
+        turns = self.turns[self.summarized:]
+        if not turns and not self.summary:
+            return ""
+
+        # 由新到舊放入發言，直到用完預算的大部分；剩下的給摘要
+        lines: List[str] = []
+        used = 0
+        for turn in reversed(turns):
+            line = format_turns([turn])
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                remaining = budget - used
+                if not lines and remaining > 0:
+                    lines.append(truncate_to_tokens(line, remaining))
+                    used = budget
+                break
+            lines.append(line)
+            used += cost
+        lines.reverse()
+
+        sections = []
+        summary_budget = budget - used
+        if self.summary and summary_budget > 10:
+            sections.append("前情摘要：\n" + truncate_to_tokens(self.summary, summary_budget - 8, keep="tail"))
+        if lines:
+            sections.append("近期發言：\n" + "\n".join(lines))
+        return "\n\n".join(sections)
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._collect(wait=True)
+        return {"turns": self.turns, "summary": self.summary, "summarized": self.summarized}
+
+    def load(self, data: Dict[str, Any]) -> None:
+        self.turns = list(data.get("turns", []))
+        self.summary = data.get("summary", "")
+        self.summarized = data.get("summarized", 0)
+
+    def close(self) -> None:
+        self._collect(wait=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -1,11 +1,22 @@
 from typing import List, Dict, Any
 from worker.chairman import Chairman
 from agentscope.agent import AgentBase
+import logging
+import os
 import redis
 import json
 from worker import tasks
-from worker.llm_utils import call_llm
-from worker.tool_config import get_tools_description, get_tools_examples, STOCK_CODES, CURRENT_DATE
+from worker.dispatch import run_tool
+from worker.prompts import build_agent_system_prompt, build_agent_turn_prompt, prompt_version
+from worker.conversation import Conversation
+from worker.debate_context import DebateContext
+from worker.model_router import resolve_model
+from worker.tool_call import STRUCTURED_TOOL_CALLS, parse_tool_call, tool_call_schema
+from worker.usage import UsageLedger
+from api.log import preview, sample
+from api.tracing import span, traced, current_span
+
+logger = logging.getLogger(__name__)
 
 class DebateCycle:
     """
@@ -19,11 +30,18 @@ class DebateCycle:
         self.pro_team = pro_team
         self.con_team = con_team
         self.rounds = rounds
-        self.redis_client = redis.Redis(host='redis', port=6379, db=0)
+        self.redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'redis'), port=6379, db=0)
         self.evidence_key = f"debate:{self.debate_id}:evidence"
+        self.usage_key = f"debate:{self.debate_id}:usage"
         self.rounds_data = []
         self.analysis_result = {}
         self.history = []
+        # 每個 Agent 一段跨回合累積的對話（見 worker/conversation.py）
+        self.conversations: Dict[str, Conversation] = {}
+        # 給 Agent 反駁用的上下文：最近發言逐字保留，較早的由主席滾動摘要（見 worker/debate_context.py）
+        self.context = DebateContext(summarizer=self._summarize_history)
+        # token 數、LLM 耗時與工具成本，依參與者 / 回合加總（見 worker/usage.py）
+        self.usage = UsageLedger()
 
     def _publish_log(self, role: str, content: str):
         """
@@ -32,28 +50,117 @@ class DebateCycle:
         message = json.dumps({"role": role, "content": content}, ensure_ascii=False)
         self.redis_client.publish(f"debate:{self.debate_id}:log_stream", message)
 
-    def start(self) -> Dict[str, Any]:
+    def _publish_usage(self):
+        """
+        更新 Redis 中的用量統計，供 GET /api/v1/debates/{task_id} 查詢進行中的辯論。
+        """
+        try:
+            self.redis_client.set(self.usage_key, json.dumps(self.usage.to_dict(), ensure_ascii=False))
+        except redis.RedisError as e:
+            logger.error("Error publishing usage of debate %s: %s", self.debate_id, e)
+
+    def _summarize_history(self, previous_summary: str, turns: List[Dict[str, Any]]) -> str:
+        """
+        主席的滾動摘要（在背景執行緒中呼叫），並記錄用量。
+        """
+        summary = self.chairman.summarize_history(previous_summary, turns)
+        self.usage.record_llm(summary, self.chairman.name)
+        return summary
+
+    def start(self, analysis: Dict[str, Any] = None, refresh_analysis: bool = False) -> Dict[str, Any]:
         """
         开始辩论循环。
         """
-        print(f"Debate '{self.debate_id}' has started.")
+        self.prepare(analysis, refresh_analysis)
+        while len(self.rounds_data) < self.rounds:
+            self.run_next_round()
+        return self.finish()
+
+    def prepare(self, analysis: Dict[str, Any] = None, refresh_analysis: bool = False):
+        """
+        宣布開始並進行賽前分析。
+        提供 analysis（例如批次辯論共用的分析結果）時直接沿用，不再呼叫 LLM；
+        refresh_analysis=True 時略過賽前分析快取。
+        """
+        logger.info("Debate '%s' has started.", self.debate_id)
         self._publish_log("System", f"Debate '{self.debate_id}' has started.")
         
         # 0. 賽前分析
-        self.analysis_result = self.chairman.pre_debate_analysis(self.topic)
+        with span("debate.prepare", debate_id=self.debate_id, reused_analysis=bool(analysis)):
+            self.analysis_result = analysis or self.chairman.pre_debate_analysis(
+                self.topic, refresh=refresh_analysis, usage=self.usage
+            )
+        self._publish_usage()
         summary = self.analysis_result.get('step5_summary', '無')
         self.chairman.speak(f"賽前分析完成。戰略摘要：{summary}")
         self._publish_log("Chairman (Analysis)", f"賽前分析完成。\n戰略摘要：{summary}")
-        
-        for i in range(1, self.rounds + 1):
-            print(f"--- Round {i} ---")
-            self._publish_log("System", f"--- Round {i} ---")
+
+    def run_next_round(self) -> Dict[str, Any]:
+        """
+        執行下一輪辯論並記錄結果。
+        """
+        i = len(self.rounds_data) + 1
+        logger.info("Debate '%s' round %d", self.debate_id, i)
+        self._publish_log("System", f"--- Round {i} ---")
+        with span("debate.round", debate_id=self.debate_id, round=i):
             round_result = self._run_round(i)
-            self.rounds_data.append(round_result)
-        
-        print(f"Debate '{self.debate_id}' has ended.")
+        self.rounds_data.append(round_result)
+        self._publish_usage()
+        return round_result
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        宣布結束並返回辯論結果。
+        """
+        logger.info("Debate '%s' has ended.", self.debate_id)
         self._publish_log("System", f"Debate '{self.debate_id}' has ended.")
-        return {"topic": self.topic, "rounds_data": self.rounds_data, "analysis": self.analysis_result}
+        self.context.close()
+        self._publish_usage()
+        return {
+            "topic": self.topic,
+            "rounds_data": self.rounds_data,
+            "analysis": self.analysis_result,
+            "usage": self.usage.to_dict(),
+            "prompt_version": prompt_version()
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        將辯論進度序列化（供鏈式任務在輪與輪之間傳遞）。
+        """
+        return {
+            "debate_id": self.debate_id,
+            "topic": self.topic,
+            "pro_team": [agent.name for agent in self.pro_team],
+            "con_team": [agent.name for agent in self.con_team],
+            "agent_models": {
+                agent.name: getattr(agent, 'model_settings', {}) for agent in self.pro_team + self.con_team
+            },
+            "rounds": self.rounds,
+            "analysis": self.analysis_result,
+            "rounds_data": self.rounds_data,
+            "history": self.history,
+            "conversations": {name: conv.to_dict() for name, conv in self.conversations.items()},
+            "context": self.context.to_dict(),
+            # 放在 context 之後：context.to_dict() 會等背景摘要完成，摘要的用量才會包含在內
+            "usage": self.usage.to_dict(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], chairman: Chairman, pro_team: List[AgentBase], con_team: List[AgentBase]) -> "DebateCycle":
+        """
+        由 to_state() 的結果還原辯論進度。
+        """
+        debate = cls(state["debate_id"], state["topic"], chairman, pro_team, con_team, state["rounds"])
+        debate.analysis_result = state.get("analysis", {})
+        debate.rounds_data = state.get("rounds_data", [])
+        debate.history = state.get("history", [])
+        debate.conversations = {
+            name: Conversation.from_dict(data) for name, data in state.get("conversations", {}).items()
+        }
+        debate.context.load(state.get("context", {}))
+        debate.usage = UsageLedger.from_dict(state.get("usage"))
+        return debate
 
     def _run_round(self, round_num: int) -> Dict[str, Any]:
         """
@@ -69,15 +176,18 @@ class DebateCycle:
         pro_agent = tasks._select_agent(self.pro_team, round_num)
         pro_content = self._agent_turn(pro_agent, "正方", round_num)
         self.history.append({"role": f"Pro ({pro_agent.name})", "content": pro_content})
+        self.context.add_turn(f"正方 {pro_agent.name}", pro_content, round_num)
         self._publish_log(f"Pro ({pro_agent.name})", pro_content)
         
         con_agent = tasks._select_agent(self.con_team, round_num)
         con_content = self._agent_turn(con_agent, "反方", round_num)
         self.history.append({"role": f"Con ({con_agent.name})", "content": con_content})
+        self.context.add_turn(f"反方 {con_agent.name}", con_content, round_num)
         self._publish_log(f"Con ({con_agent.name})", con_content)
 
-        # 3. 主席总结
+        # 3. 主席总结；較早的發言在背景併入滾動摘要，不阻塞下一輪
         self.chairman.summarize_round(self.debate_id, round_num)
+        self.context.schedule_summary()
         self._publish_log("Chairman", f"Round {round_num} summary completed.")
         
         return {
@@ -89,111 +199,101 @@ class DebateCycle:
             "summary": f"Round {round_num} completed."
         }
 
+    def _conversation(self, agent: AgentBase, side: str) -> Conversation:
+        """
+        取得 Agent 在這場辯論中的對話，第一次發言時建立。
+        """
+        if agent.name not in self.conversations:
+            system_prompt = build_agent_system_prompt(agent.name, side, self.topic)
+            self.conversations[agent.name] = Conversation(system_prompt)
+        return self.conversations[agent.name]
+
+    def _ask(self, conversation: Conversation, agent: AgentBase, round_num: int, prompt: str, **kwargs: Any) -> str:
+        """
+        在 Agent 的對話中提問，並將這次 LLM 呼叫記入該回合的用量。
+        """
+        response = conversation.ask(prompt, **kwargs)
+        self.usage.record_llm(response, agent.name, round_num)
+        return response
+
+    @traced("debate.agent_turn")
     def _agent_turn(self, agent: AgentBase, side: str, round_num: int) -> str:
         """
         執行單個 Agent 的回合：思考 -> 工具 -> 發言
         """
-        print(f"Agent {agent.name} ({side}) is thinking...")
+        turn_span = current_span()
+        turn_span.set_attribute("agent", agent.name)
+        turn_span.set_attribute("side", side)
+        turn_span.set_attribute("round", round_num)
+        logger.debug("Agent %s (%s) is thinking...", agent.name, side)
         
         # 構建 Prompt - 強烈鼓勵使用工具
-        tools_desc = get_tools_description()
-        tools_examples = get_tools_examples()
-        
-        system_prompt = f"""你是 {agent.name}，代表{side}。
-辯題：{self.topic}
-
-**重要指示**：
-1. 你必須先使用工具獲取真實數據，再發表論點
-2. 對於台股相關問題，必須使用 TEJ 工具
-3. 工具調用格式必須是純 JSON，不要有其他文字
-4. 調用工具後，你會收到數據，然後基於數據發言
-"""
+        # 工具列表等靜態內容在 system prompt 最前面，各回合共用同一前綴（見 worker/prompts.py）；
+        # 本回合的提問接在這個 Agent 先前的對話之後
+        conversation = self._conversation(agent, side)
+        user_prompt = build_agent_turn_prompt(
+            round_num, self.analysis_result.get('step5_summary', '無'), self.context.render()
+        )
         
-        user_prompt = f"""
-這是第 {round_num} 輪辯論。主席戰略摘要：{self.analysis_result.get('step5_summary', '無')}
+        # 選工具與發言可以使用不同模型（見 worker/model_router.py）
+        agent_models = getattr(agent, 'model_settings', {})
+        tool_model = resolve_model('tool_select', agent_models)
+        speech_model = resolve_model('speech', agent_models)
 
-**背景資訊**：
-- 當前日期：{CURRENT_DATE}
-- 辯題涉及：2024 年 Q4（2024-10-01 至 2024-12-31）
-- 你需要查詢 2024 年的實際股價數據進行比較
+        # 以工具 schema 約束輸出（Ollama structured output），物件一結束就停止生成（見 worker/tool_call.py）
+        ask_kwargs = {"format": tool_call_schema()} if STRUCTURED_TOOL_CALLS else {}
+        response = self._ask(conversation, agent, round_num, user_prompt, model=tool_model, **ask_kwargs)
+        logger.debug("Agent %s raw response: %s", agent.name, preview(response), extra=sample())
+        # 受 schema 約束的回應只會是工具呼叫，不能直接當成發言
+        speech_ready = not STRUCTURED_TOOL_CALLS and tool_model == speech_model
 
-**重要常數**：
-{chr(10).join([f"- {name}: {code}" for name, code in STOCK_CODES.items()])}
-
-**第一步：必須先調用工具獲取數據**
+        # Retry 機制
+        if not response:
+            logger.warning("Empty response from %s, retrying with simple prompt...", agent.name)
+            retry_prompt = f"請針對辯題「{self.topic}」發表你的{side}論點。請務必使用繁體中文。"
+            response = self._ask(conversation, agent, round_num, retry_prompt, model=speech_model)
+            logger.debug("Agent %s retry response: %s", agent.name, preview(response))
+            speech_ready = True
 
-{tools_desc}
+        tool_call = parse_tool_call(response)
+        turn_span.set_attribute("tool", tool_call["tool"] if tool_call else None)
+        if tool_call is None:
+            logger.debug("No tool call found in response of %s (length: %d)", agent.name, len(response))
+            return self._speech_without_tool(conversation, agent, side, round_num, response, speech_ready, speech_model)
 
-{tools_examples}
+        tool_name = tool_call["tool"]
+        params = tool_call["params"]
 
-**請現在就調用工具**（只輸出 JSON，不要其他文字）：
-"""
-        
-        response = call_llm(user_prompt, system_prompt=system_prompt)
-        print(f"DEBUG: Agent {agent.name} raw response: {response[:500]}")  # 只印前 500 字符
+        logger.info("Agent %s is calling tool %s with %s", agent.name, tool_name, preview(params))
+        self._publish_log(f"{agent.name} (Tool)", f"Calling {tool_name} with {params}")
 
-        # Retry 機制
-        if not response:
-            print(f"WARNING: Empty response from {agent.name}, retrying with simple prompt...")
-            retry_prompt = f"請針對辯題「{self.topic}」發表你的{side}論點。請務必使用繁體中文。"
-            response = call_llm(retry_prompt, system_prompt=system_prompt)
-            print(f"DEBUG: Agent {agent.name} retry response: {response[:500]}")
-        
-        # 檢查是否調用工具
-        print(f"DEBUG: Checking for tool call in response (length: {len(response)})")
-        
+        # 執行工具 (支援所有註冊的工具)
         try:
-            if "{" in response and "}" in response:
-                # 嘗試提取 JSON
-                json_str = response[response.find("{"):response.rfind("}")+1]
-                print(f"DEBUG: Extracted JSON string: {json_str[:200]}...")
-                
-                try:
-                    tool_call = json.loads(json_str)
-                    print(f"DEBUG: Successfully parsed JSON: {tool_call}")
-                except json.JSONDecodeError as e:
-                    print(f"WARNING: JSON decode failed: {e}")
-                    print(f"DEBUG: Failed JSON string: {json_str}")
-                    return response
-
-                if "tool" in tool_call and "params" in tool_call:
-                    tool_name = tool_call["tool"]
-                    params = tool_call["params"]
-                    
-                    print(f"✓ Agent {agent.name} is calling tool: {tool_name}")
-                    print(f"✓ Tool parameters: {json.dumps(params, ensure_ascii=False)}")
-                    self._publish_log(f"{agent.name} (Tool)", f"Calling {tool_name} with {params}")
-                    
-                    # 執行工具 (支援所有註冊的工具)
-                    try:
-                        print(f"DEBUG: Executing tool {tool_name}...")
-                        tool_result = tasks.execute_tool(tool_name, params)
-                        print(f"✓ Tool execution successful")
-                        print(f"DEBUG: Tool result preview: {str(tool_result)[:300]}...")
-                    except Exception as e:
-                        tool_result = {"error": f"Tool execution error: {str(e)}"}
-                        print(f"ERROR: Tool {tool_name} execution failed: {e}")
-                    
-                    # 將工具結果反饋給 Agent 生成最終發言
-                    prompt_with_tool = f"""工具 {tool_name} 的執行結果：
+            tool_result = run_tool(tool_name, params)
+            logger.debug("Tool %s result: %s", tool_name, preview(tool_result), extra=sample())
+        except Exception as e:
+            tool_result = {"error": f"Tool execution error: {str(e)}"}
+            logger.error("Tool %s execution failed: %s", tool_name, e)
+        self.usage.record_tool(tool_result, agent.name, round_num)
+
+        # 將工具結果反饋給 Agent 生成最終發言
+        prompt_with_tool = f"""工具 {tool_name} 的執行結果：
 
 {json.dumps(tool_result, ensure_ascii=False, indent=2)}
 
 請根據這些證據進行發言。請務必使用繁體中文，並引用具體數據。"""
-                    
-                    print(f"DEBUG: Asking agent to generate final response based on tool result...")
-                    final_response = call_llm(prompt_with_tool, system_prompt=system_prompt)
-                    print(f"DEBUG: Agent {agent.name} final response: {final_response[:500]}...")
-                    return final_response
-                else:
-                    print(f"DEBUG: JSON parsed but missing 'tool' or 'params' keys: {tool_call.keys()}")
-            else:
-                print(f"DEBUG: No JSON structure found in response")
-        except Exception as e:
-            print(f"ERROR: Tool execution parsing failed: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        return response
+
+        final_response = self._ask(conversation, agent, round_num, prompt_with_tool, model=speech_model)
+        logger.debug("Agent %s final response: %s", agent.name, preview(final_response), extra=sample())
+        return final_response
+
+    def _speech_without_tool(self, conversation: Conversation, agent: AgentBase, side: str, round_num: int, response: str, speech_ready: bool, speech_model: str) -> str:
+        """
+        沒有工具呼叫時的發言。回應本身不能當作發言時（受 schema 約束的輸出，
+        或由不同於發言模型的小模型產生），改由發言模型發言。
+        """
+        if speech_ready:
+            return response
+        return self._ask(conversation, agent, round_num, f"請直接針對辯題發表你的{side}論點。請務必使用繁體中文。", model=speech_model)
 
 
@@ -0,0 +1,62 @@
+"""
+LLM / 工具呼叫的派送
+
+依 LLM_DISPATCH / TOOL_DISPATCH 設定，在目前行程內直接執行，
+或派送到 llm / tools 佇列由專屬 worker 執行並等待結果。
+派送模式下辯論 worker 與 LLM、工具 worker 是不同行程，等待子任務不會互相佔用 slot。
+子任務沿用所屬辯論任務的優先權，互動式辯論的 LLM / 工具呼叫也會排在批次辯論之前；
+並帶著 traceparent header，子任務的 span 會接在辯論的 trace 之下（見 api/tracing.py）。
+"""
+
+import logging
+from typing import Any, Dict, Optional
+from celery import current_task
+from worker.celery_app import LLM_DISPATCH, TOOL_DISPATCH, LLM_TASK_TIMEOUT, TOOL_TASK_TIMEOUT
+from worker.llm_utils import LLMResult, call_llm
+from worker.tool_invoker import call_tool
+from api.tracing import propagation_headers
+
+logger = logging.getLogger(__name__)
+
+
+def _current_priority() -> Optional[int]:
+    """
+    目前執行中的辯論任務的優先權；不在任務內時回傳 None（使用預設優先權）。
+    """
+    if not current_task or current_task.request.id is None:
+        return None
+    return (current_task.request.delivery_info or {}).get('priority')
+
+
+def run_tool(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    執行工具；派送模式下由 tools 佇列執行。
+    """
+    if TOOL_DISPATCH != 'task':
+        return call_tool(tool_name, params)
+
+    from worker import tasks
+    result = tasks.execute_tool.apply_async(
+        args=[tool_name, params], priority=_current_priority(), headers=propagation_headers()
+    )
+    return result.get(timeout=TOOL_TASK_TIMEOUT, disable_sync_subtasks=False)
+
+
+def run_llm(prompt: str, **kwargs: Any) -> str:
+    """
+    呼叫 LLM；派送模式下由 llm 佇列執行。參數與 call_llm 相同。
+    派送模式下子任務回傳 LLMResult.to_dict()，這裡還原成帶 token 統計的 LLMResult。
+    """
+    if LLM_DISPATCH != 'task':
+        return call_llm(prompt, **kwargs)
+
+    from worker import tasks
+    try:
+        result = tasks.llm_generate.apply_async(
+            args=[prompt], kwargs=kwargs, priority=_current_priority(), headers=propagation_headers()
+        )
+        value = result.get(timeout=LLM_TASK_TIMEOUT, disable_sync_subtasks=False)
+        return LLMResult.from_dict(value) if isinstance(value, dict) else value
+    except Exception as e:
+        logger.error("Error dispatching LLM task: %s", e)
+        return f"Error: {e}"
@@ -0,0 +1,55 @@
+"""
+串流輸出中的 JSON 物件邊界偵測（llm_utils 與 tool_call 共用）
+"""
+
+from typing import Optional
+
+
+class JsonObjectParser:
+    """
+    增量 JSON 物件邊界偵測：追蹤大括號深度，並正確略過字串內的括號與跳脫字元。
+    每個字元只掃描一次。
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._start = 0
+        self._length = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        餵入一段文字；第一個完整的頂層物件結束時回傳該物件的文字，否則回傳 None。
+        """
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"' and self._started:
+                self._in_string = True
+            elif ch == "{":
+                if not self._started:
+                    self._started = True
+                    self._start = offset + i
+                self._depth += 1
+            elif ch == "}" and self._started:
+                self._depth -= 1
+                if self._depth == 0:
+                    text = "".join(self._chunks)
+                    return text[self._start:offset + i + 1]
+        return None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
@@ -1,85 +1,242 @@
+import logging
 import os
+import time
 import requests
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-def call_llm(prompt: str, system_prompt: str = None, model: str = None) -> str:
+from api.log import preview, sample
+from api.metrics import observe_llm_call
+from api.tracing import traced, current_span
+from worker.json_stream import JsonObjectParser
+
+logger = logging.getLogger(__name__)
+
+# How long Ollama keeps the model loaded after a request (e.g. "30m", "-1" to pin it).
+# Avoids unloading the model between turns / debates and reloading it on the next call.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+def _keep_alive_value(value: str):
+    """
+    Ollama accepts a duration string ("30m") or a number of seconds (-1 = forever).
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _tool_calls_to_json(tool_calls: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Convert the first native tool call to the {"tool": ..., "params": {...}} JSON DebateCycle expects.
+    """
+    try:
+        function_call = tool_calls[0]["function"]
+        tool_name = function_call["name"]
+        function_args = function_call["arguments"]
+
+        logger.debug("Detected tool_call %s (arguments as %s)", tool_name, type(function_args).__name__)
+
+        # Some models might return arguments as a string, others as a dict
+        if isinstance(function_args, str):
+            args_dict = json.loads(function_args)
+        else:
+            args_dict = function_args
+
+        # The arguments either wrap the params or are the params themselves
+        params = args_dict["params"] if "params" in args_dict else args_dict
+
+        result_json = json.dumps({"tool": tool_name, "params": params}, ensure_ascii=False)
+        logger.debug("Converted tool_call to JSON: %s", preview(result_json), extra=sample())
+        return result_json
+    except Exception as e:
+        logger.error("Failed to parse tool_calls: %s (%s)", e, preview(tool_calls))
+        return None
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """
+    Rough token count of the messages for when Ollama's own count is not available:
+    one token per non-ASCII character (CJK text is close to one token per character)
+    and one per four ASCII characters.
+    """
+    text = "".join(str(message.get("content") or "") for message in messages)
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+class LLMResult(str):
+    """
+    The response content, usable as a plain str by existing callers, plus the token counts
+    and timings Ollama reports. Durations are in nanoseconds, like Ollama's own fields.
+    prompt_tokens_estimated is True when prompt_tokens comes from estimate_tokens().
+    """
+
+    STATS = ("prompt_tokens", "completion_tokens", "total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+    def __new__(cls, content: str = "", model: Optional[str] = None, **stats: Any) -> "LLMResult":
+        result = super().__new__(cls, content)
+        result.model = model
+        for name in cls.STATS:
+            setattr(result, name, int(stats.get(name) or 0))
+        result.prompt_tokens_estimated = bool(stats.get("prompt_tokens_estimated"))
+        return result
+
+    @classmethod
+    def from_response(cls, content: str, model: str, response: Dict[str, Any], elapsed_ns: int = 0) -> "LLMResult":
+        """
+        Build from the final Ollama response object; elapsed_ns is used when it has no total_duration.
+        """
+        return cls(
+            content,
+            model,
+            prompt_tokens=response.get("prompt_eval_count"),
+            completion_tokens=response.get("eval_count"),
+            total_duration=response.get("total_duration") or elapsed_ns,
+            load_duration=response.get("load_duration"),
+            prompt_eval_duration=response.get("prompt_eval_duration"),
+            eval_duration=response.get("eval_duration"),
+            prompt_tokens_estimated=response.get("prompt_tokens_estimated"),
+        )
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "content": str(self),
+            "model": self.model,
+            **{name: getattr(self, name) for name in self.STATS},
+            "prompt_tokens_estimated": self.prompt_tokens_estimated,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMResult":
+        return cls(
+            data.get("content", ""),
+            data.get("model"),
+            **{name: data.get(name) for name in cls.STATS},
+            prompt_tokens_estimated=data.get("prompt_tokens_estimated"),
+        )
+
+def _stream_json_object(url: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Stream a structured-output response and return the first complete JSON object together
+    with the stats to report. Leaving the `with` block closes the connection, which makes
+    Ollama stop generating; the final chunk with Ollama's counts is then never received,
+    so the completion tokens are the number of chunks read (Ollama streams one token per chunk)
+    and the prompt tokens are estimated from the messages (flagged as prompt_tokens_estimated).
+    """
+    payload = dict(payload, stream=True)
+    parser = JsonObjectParser()
+    content = None
+    final = None
+    chunks = 0
+    with requests.post(url, json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            chunks += 1
+            message = chunk.get("message", {})
+            if message.get("tool_calls"):
+                content = _tool_calls_to_json(message["tool_calls"])
+                if content:
+                    break
+            content = parser.feed(message.get("content", ""))
+            if content is not None:
+                break
+            if chunk.get("done"):
+                final = chunk
+                break
+    if content is None:
+        content = parser.text
+        if not content:
+            logger.warning("LLM returned empty content in structured output mode")
+    if final is None:
+        final = {
+            "eval_count": chunks,
+            "prompt_eval_count": estimate_tokens(payload["messages"]),
+            "prompt_tokens_estimated": True,
+        }
+    return content, final
+
+@traced("llm.call")
+def call_llm(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    history: List[Dict[str, str]] = None,
+    keep_alive: str = None,
+    format: Any = None
+) -> str:
     """
     Call the LLM (Ollama) with the given prompt.
+
+    Returns an LLMResult: the response text, carrying the token counts and timings of the call.
+
+    history holds earlier messages of the same conversation (without the system prompt);
+    they are sent between the system prompt and the new prompt so the server can reuse
+    the already-processed prefix instead of prefilling everything again.
+
+    format is passed to Ollama's structured output ("json" or a JSON schema). The response
+    is then streamed and the connection is closed as soon as the first complete JSON object
+    has been generated, so the model does not keep generating after the object.
     """
     ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
     if not model:
         model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
 
     url = f"{ollama_host}/api/chat"
+    span = current_span()
+    span.set_attribute("llm.model", model)
+    span.set_attribute("llm.structured", format is not None)
+    span.set_attribute("llm.history_messages", len(history or []))
     
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
+    if history:
+        messages.extend(history)
     messages.append({"role": "user", "content": prompt})
 
     payload = {
         "model": model,
         "messages": messages,
-        "stream": False
+        "stream": False,
+        "keep_alive": _keep_alive_value(keep_alive or OLLAMA_KEEP_ALIVE)
     }
 
+    if format is not None:
+        payload["format"] = format
+
+    start = time.perf_counter()
     try:
+        if format is not None:
+            content, stats = _stream_json_object(url, payload)
+            elapsed = time.perf_counter() - start
+            observe_llm_call(model, elapsed, stats)
+            return LLMResult.from_response(content, model, stats, int(elapsed * 1e9))
         response = requests.post(url, json=payload)
         response.raise_for_status()
         result = response.json()
+        elapsed = time.perf_counter() - start
+        observe_llm_call(model, elapsed, result)
         message = result.get("message", {})
         content = message.get("content", "")
         
         # Handle tool_calls if present
-        if not content and "tool_calls" in message:
-            tool_calls = message.get("tool_calls", [])
-            if tool_calls:
-                # Convert the first tool call to the expected JSON format
-                try:
-                    function_call = tool_calls[0]["function"]
-                    tool_name = function_call["name"]
-                    function_args = function_call["arguments"]
-                    
-                    print(f"DEBUG: Detected tool_call - name: {tool_name}, args type: {type(function_args)}")
-                    
-                    # Some models might return arguments as a string, others as a dict
-                    if isinstance(function_args, str):
-                        # Parse JSON string
-                        args_dict = json.loads(function_args)
-                    else:
-                        args_dict = function_args
-                    
-                    print(f"DEBUG: Parsed args_dict: {args_dict}")
-                    
-                    # Construct the JSON string our DebateCycle expects
-                    # Format: {"tool": "tool_name", "params": {...}}
-                    if "params" in args_dict:
-                        params = args_dict["params"]
-                    else:
-                        # The args_dict itself contains the params
-                        params = args_dict
-                        
-                    tool_call_json = {
-                        "tool": tool_name,
-                        "params": params
-                    }
-                    
-                    result_json = json.dumps(tool_call_json, ensure_ascii=False)
-                    print(f"DEBUG: Converted tool_call to JSON: {result_json}")
-                    return result_json
-                    
-                except Exception as e:
-                    print(f"ERROR: Failed to parse tool_calls: {e}")
-                    print(f"DEBUG: tool_calls structure: {tool_calls}")
-                    # Fall through to return empty content
+        if not content and message.get("tool_calls"):
+            converted = _tool_calls_to_json(message["tool_calls"])
+            if converted:
+                content = converted
 
         if not content:
-             print(f"WARNING: LLM returned empty content. Full result: {result}")
-        return content
+             logger.warning("LLM returned empty content: %s", preview(result))
+        return LLMResult.from_response(content, model, result, int(elapsed * 1e9))
     except Exception as e:
-        print(f"Error calling LLM: {e}")
+        observe_llm_call(model, time.perf_counter() - start, error=True)
         if 'response' in locals():
-             print(f"Response status: {response.status_code}")
-             print(f"Response text: {response.text}")
+            logger.error("Error calling LLM %s: %s (HTTP %s: %s)", model, e, response.status_code, preview(response.text))
+        else:
+            logger.error("Error calling LLM %s: %s", model, e)
         return f"Error: {e}"
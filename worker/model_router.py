@@ -0,0 +1,42 @@
+"""
+模型路由
+
+依工作性質選用模型，重活用大模型、輕活用小模型：
+- analysis     主席賽前分析
+- speech       Agent 根據資料發言
+- tool_select  Agent 決定要呼叫哪個工具（輸出工具呼叫 JSON）
+- summary      主席的回合 / 滾動摘要
+
+選用順序：Agent.config_json 的 models.{role} > Agent.config_json 的 model
+> 環境變數 OLLAMA_MODEL_{ROLE}（例如 OLLAMA_MODEL_TOOL_SELECT）> OLLAMA_MODEL > gpt-oss:20b。
+Agent 的設定範例：{"models": {"tool_select": "qwen2.5:3b", "speech": "gpt-oss:20b"}}
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+ROLES = ("analysis", "speech", "tool_select", "summary")
+DEFAULT_MODEL = "gpt-oss:20b"
+
+
+def default_model(role: str) -> str:
+    return os.getenv(f"OLLAMA_MODEL_{role.upper()}") or os.getenv("OLLAMA_MODEL") or DEFAULT_MODEL
+
+
+def resolve_model(role: str, agent_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    回傳指定角色要使用的模型。agent_config 為 Agent.config_json（或其中的模型設定）。
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown model role '{role}', expected one of {ROLES}")
+    agent_config = agent_config or {}
+    models = agent_config.get("models") or {}
+    return models.get(role) or agent_config.get("model") or default_model(role)
+
+
+def model_settings(agent_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    從 Agent.config_json 取出與模型路由相關的設定（用於序列化辯論狀態）。
+    """
+    agent_config = agent_config or {}
+    return {key: agent_config[key] for key in ("models", "model") if key in agent_config}
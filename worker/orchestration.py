@@ -0,0 +1,77 @@
+"""
+辯論流程的鏈式編排
+
+以任務名稱建立 signature，API 端不需要 import worker.tasks（及其 agentscope 相依）。
+每一輪是一個獨立任務，任務之間以可序列化的辯論狀態（dict）傳遞，
+worker 在輪與輪之間會釋放出來處理其他辯論。
+"""
+
+from typing import Any, Dict, List, Optional
+from celery import Celery, chain
+
+
+def _prepare_kwargs(analysis: Optional[Dict[str, Any]], refresh_analysis: bool) -> Dict[str, Any]:
+    kwargs = {}
+    if analysis:
+        kwargs['analysis'] = analysis
+    if refresh_analysis:
+        kwargs['refresh_analysis'] = True
+    return kwargs
+
+
+def build_debate_chain(
+    app: Celery,
+    debate_id: str,
+    topic: str,
+    pro_team_configs: List[Dict],
+    con_team_configs: List[Dict],
+    rounds: int,
+    priority: Optional[int] = None,
+    analysis: Optional[Dict[str, Any]] = None,
+    refresh_analysis: bool = False
+):
+    """
+    建立 prepare -> round x N -> finalize 的任務鏈。
+    最後一個任務的 task_id 即為 debate_id，API 可用同一個 ID 查詢狀態。
+    指定 priority 時鏈上每個任務都帶相同的優先權；指定 analysis 時沿用既有的賽前分析。
+    鏈上任一任務最終失敗時，link_error 呼叫 abort_debate 釋放准入名額與排程空位。
+    """
+    steps = [
+        app.signature(
+            'worker.tasks.prepare_debate',
+            args=(debate_id, topic, pro_team_configs, con_team_configs, rounds),
+            kwargs=_prepare_kwargs(analysis, refresh_analysis),
+            immutable=True
+        )
+    ]
+    steps.extend(app.signature('worker.tasks.run_debate_round') for _ in range(rounds))
+    steps.append(app.signature('worker.tasks.finalize_debate').set(task_id=debate_id))
+    if priority is not None:
+        steps = [step.set(priority=priority) for step in steps]
+    abort = app.signature('worker.tasks.abort_debate', args=(debate_id,), immutable=True)
+    for step in steps:
+        step.link_error(abort)
+    return chain(*steps)
+
+
+def enqueue_debate(app: Celery, job: Dict[str, Any], orchestration: str = 'single'):
+    """
+    將排程器（api/scheduling.py）選出的辯論送進 debates 佇列。
+    job 包含 debate_id、topic、pro_team、con_team、rounds、priority，
+    另可有 refresh_analysis 或批次辯論共用的 analysis；
+    orchestration 對應 DEBATE_ORCHESTRATION。
+    """
+    if orchestration == 'chain':
+        # 每輪一個任務串接；最後一個任務的 ID 即為辯論 ID
+        return build_debate_chain(
+            app, job['debate_id'], job['topic'], job['pro_team'], job['con_team'], job['rounds'],
+            priority=job.get('priority'), analysis=job.get('analysis'),
+            refresh_analysis=job.get('refresh_analysis', False)
+        ).apply_async()
+    return app.send_task(
+        'worker.tasks.run_debate_cycle',
+        args=[job['topic'], job['pro_team'], job['con_team'], job['rounds']],
+        kwargs=_prepare_kwargs(job.get('analysis'), job.get('refresh_analysis', False)),
+        task_id=job['debate_id'],
+        priority=job.get('priority')
+    )
@@ -0,0 +1,168 @@
+"""
+Prompt 組裝
+
+工具列表、工具範例與重要常數只取決於工具目錄，每個工具目錄版本（TOOL_CATALOG_VERSION）只組一次。
+所有 prompt 都把靜態區段放在最前面、每場辯論 / 每回合才變動的內容放在最後，
+讓同一個靜態前綴在各回合、各 Agent 之間逐字相同，LLM 伺服器（Ollama）可以沿用前綴的 KV cache，
+不必每回合重新 prefill 整份工具目錄。
+
+prefix_hash() 回傳靜態前綴的雜湊，可用來確認不同呼叫是否共用同一個前綴。
+"""
+
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List
+
+from worker.tool_config import (
+    TOOL_CATALOG_VERSION,
+    STOCK_CODES,
+    CURRENT_DATE,
+    get_tools_description,
+    get_tools_examples,
+)
+
+
+@dataclass(frozen=True)
+class PromptFragments:
+    catalog_version: str
+    tools_description: str
+    tools_examples: str
+    stock_codes: str
+    agent_prefix: str
+    chairman_prefix: str
+
+    def prefix_hash(self, kind: str = "agent") -> str:
+        prefix = self.agent_prefix if kind == "agent" else self.chairman_prefix
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+def _build_agent_prefix(tools_description: str, tools_examples: str, stock_codes: str) -> str:
+    return f"""你是辯論賽的辯士。
+
+**重要指示**：
+1. 你必須先使用工具獲取真實數據，再發表論點
+2. 對於台股相關問題，必須使用 TEJ 工具
+3. 工具調用格式必須是純 JSON，不要有其他文字
+4. 調用工具後，你會收到數據，然後基於數據發言
+5. 只有在先前取得的數據已足以支持論點時，才可以不調用工具，此時輸出 {{"tool": "none", "params": {{}}}}
+
+**背景資訊**：
+- 當前日期：{CURRENT_DATE}
+- 辯題涉及：2024 年 Q4（2024-10-01 至 2024-12-31）
+- 你需要查詢 2024 年的實際股價數據進行比較
+
+**重要常數**：
+{stock_codes}
+
+{tools_description}
+
+{tools_examples}
+"""
+
+
+def _build_chairman_prefix(tools_description: str, stock_codes: str) -> str:
+    return f"""你是辯論賽的主席與分析師。你的任務是對辯題進行深度的賽前分析。
+請嚴格按照以下步驟進行分析，並輸出結果：
+
+Step 1: 題型識別 (這是一個怎樣的問題？例如：事實性、政策性、價值性)
+Step 2: 核心要素萃取 (有哪些東西和這個問題是強相關)
+Step 3: 因果鏈建構 (例如：A -> B -> C)
+Step 4: 子題拆解 (Sub-questions) (如果命題為真，關係鏈是什麼？有哪些子問題需要驗證？)
+Step 5: 戰略分析總結 (給 Agent 的戰前情報摘要)
+Step 6: 主席備註 (Chairman Notes) (將注入 Agent Prompt 的注意事項)
+Step 7: 工具策略預覽 (Tool Strategy) (推薦使用的工具)
+
+{tools_description}
+
+**重要常數**：
+{stock_codes}
+- 當前日期：{CURRENT_DATE}
+
+請務必使用「繁體中文」進行回答。
+
+請以 JSON 格式輸出，包含以下欄位：
+{{
+    "step1_type": "...",
+    "step2_elements": "...",
+    "step3_causal_chain": "...",
+    "step4_sub_questions": "...",
+    "step5_summary": "...",
+    "step6_notes": "...",
+    "step7_tools": "..."
+}}
+"""
+
+
+@lru_cache(maxsize=4)
+def _build_fragments(catalog_version: str) -> PromptFragments:
+    tools_description = get_tools_description()
+    tools_examples = get_tools_examples()
+    stock_codes = "\n".join(f"- {name}: {code}" for name, code in STOCK_CODES.items())
+    return PromptFragments(
+        catalog_version=catalog_version,
+        tools_description=tools_description,
+        tools_examples=tools_examples,
+        stock_codes=stock_codes,
+        agent_prefix=_build_agent_prefix(tools_description, tools_examples, stock_codes),
+        chairman_prefix=_build_chairman_prefix(tools_description, stock_codes),
+    )
+
+
+def get_fragments() -> PromptFragments:
+    """
+    目前工具目錄版本的 prompt 片段（每個版本只組一次）。
+    """
+    return _build_fragments(TOOL_CATALOG_VERSION)
+
+
+def prefix_hash(kind: str = "agent") -> str:
+    """
+    靜態前綴的雜湊；kind 為 "agent" 或 "chairman"。
+    """
+    return get_fragments().prefix_hash(kind)
+
+
+def prompt_version() -> Dict[str, str]:
+    fragments = get_fragments()
+    return {
+        "catalog_version": fragments.catalog_version,
+        "agent_prefix_hash": fragments.prefix_hash("agent"),
+        "chairman_prefix_hash": fragments.prefix_hash("chairman"),
+    }
+
+
+def build_agent_system_prompt(agent_name: str, side: str, topic: str) -> str:
+    """
+    辯士的 system prompt：靜態前綴 + 這場辯論的身分與辯題。
+    """
+    return f"""{get_fragments().agent_prefix}
+---
+你是 {agent_name}，代表{side}。
+辯題：{topic}
+"""
+
+
+def build_agent_turn_prompt(round_num: int, summary: str, debate_context: str = "") -> str:
+    """
+    每回合的 user prompt，只包含會變動的內容；debate_context 為先前發言的摘要與近期發言。
+    """
+    context_section = f"""
+**辯論進展**（請針對對方論點進行反駁）：
+{debate_context}
+""" if debate_context else ""
+    return f"""這是第 {round_num} 輪辯論。主席戰略摘要：{summary}
+{context_section}
+**第一步：必須先調用工具獲取數據**
+
+**請現在就調用工具**（只輸出 JSON，不要其他文字）：
+"""
+
+
+def build_analysis_system_prompt(recommended_tools: List[str]) -> str:
+    """
+    主席賽前分析的 system prompt：靜態前綴 + 針對此辯題的推薦工具。
+    """
+    return f"""{get_fragments().chairman_prefix}
+**針對此辯題的推薦工具**：{', '.join(recommended_tools)}
+"""
@@ -1,92 +1,258 @@
 from worker.celery_app import app
 from worker.tool_invoker import call_tool
+from worker.llm_utils import LLMResult, call_llm
 from worker.chairman import Chairman
 from worker.debate_cycle import DebateCycle
 from typing import Dict, Any, List
 from agentscope.agent import AgentBase
+from api.tracing import continue_trace, request_headers, span, traced
+import logging
 import redis
 import json
 import os
 
-@app.task
-def execute_tool(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+@app.task(bind=True)
+def execute_tool(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
     """
     執行指定的工具。
     """
-    return call_tool(tool_name, params)
+    with continue_trace(**request_headers(self.request)):
+        return call_tool(tool_name, params)
+
+@app.task(bind=True)
+def llm_generate(self, prompt: str, **kwargs: Any) -> Any:
+    """
+    在 llm 佇列上呼叫 LLM。回傳 LLMResult.to_dict()，token 統計才能隨 JSON 結果傳回（見 worker/dispatch.py）。
+    """
+    with continue_trace(**request_headers(self.request)):
+        result = call_llm(prompt, **kwargs)
+        return result.to_dict() if isinstance(result, LLMResult) else result
 
 from api.database import SessionLocal
 from api import models
+from api.admission import admission_controller
+from api.scheduling import debate_scheduler
+from api.batches import batch_manager
+from worker.celery_app import DEBATE_ORCHESTRATION
+from worker.orchestration import enqueue_debate
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from worker.dispatch import run_tool
+from worker.tool_config import get_prewarm_tool_calls
+from worker.model_router import model_settings
 
-@app.task(bind=True)
-def run_debate_cycle(self, topic: str, pro_team_configs: List[Dict], con_team_configs: List[Dict], rounds: int):
+# 辯論結束時由 worker 派送排程器中的下一場辯論；派送失敗的批次辯論回報給批次
+debate_scheduler.sender = functools.partial(enqueue_debate, app, orchestration=DEBATE_ORCHESTRATION)
+debate_scheduler.on_failure = functools.partial(batch_manager.debate_finished, success=False, scheduler=debate_scheduler)
+
+def _load_agent_configs(agent_ids: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    執行辯論循環並將結果存檔。
+    依 ID 讀取 Agent 的 config_json（用於模型路由）；讀取失敗時回傳空 dict，使用預設模型。
     """
-    debate_id = self.request.id
-    chairman = Chairman(name="主席")
-    
-    # 如果沒有提供正方隊伍配置，創建預設 Agent
-    pro_team = []
-    if not pro_team_configs or len(pro_team_configs) == 0:
-        # 創建預設的正方 Agent
-        for i in range(2):  # 預設 2 個 Agent
-            agent = AgentBase()
-            agent.name = f"正方辯士 {i+1}"
-            pro_team.append(agent)
-    else:
-        for c in pro_team_configs:
-            agent = AgentBase()
-            # 處理字串或字典類型
-            if isinstance(c, dict):
-                agent.name = c.get('name', f"正方辯士")
-            elif isinstance(c, str):
-                agent.name = f"正方辯士 ({c[:8]})"  # 使用 ID 的前 8 個字符
-            else:
-                agent.name = "正方辯士"
-            pro_team.append(agent)
-    
-    # 如果沒有提供反方隊伍配置，創建預設 Agent
-    con_team = []
-    if not con_team_configs or len(con_team_configs) == 0:
-        # 創建預設的反方 Agent
+    if not agent_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Agent.id, models.Agent.config_json).filter(models.Agent.id.in_(agent_ids)).all()
+        return {agent_id: config_json or {} for agent_id, config_json in rows}
+    except Exception as e:
+        logger.error("Error loading agent configs: %s", e)
+        return {}
+    finally:
+        db.close()
+
+def _build_team(team_configs: List[Any], side: str) -> List[AgentBase]:
+    """
+    依配置建立隊伍；未提供配置時建立 2 個預設 Agent。
+    字串配置為 Agent ID，會讀取該 Agent 的 config_json；字典配置可直接帶 models / model 或 config_json。
+    """
+    team = []
+    if not team_configs or len(team_configs) == 0:
         for i in range(2):  # 預設 2 個 Agent
             agent = AgentBase()
-            agent.name = f"反方辯士 {i+1}"
-            con_team.append(agent)
-    else:
-        for c in con_team_configs:
-            agent = AgentBase()
-            # 處理字串或字典類型
-            if isinstance(c, dict):
-                agent.name = c.get('name', f"反方辯士")
-            elif isinstance(c, str):
-                agent.name = f"反方辯士 ({c[:8]})"  # 使用 ID 的前 8 個字符
-            else:
-                agent.name = "反方辯士"
-            con_team.append(agent)
-
-    debate = DebateCycle(debate_id, topic, chairman, pro_team, con_team, rounds)
-    debate_result = debate.start()
+            agent.name = f"{side}辯士 {i+1}"
+            agent.model_settings = {}
+            team.append(agent)
+        return team
+
+    agent_configs = _load_agent_configs([c for c in team_configs if isinstance(c, str)])
+    for c in team_configs:
+        agent = AgentBase()
+        # 處理字串或字典類型
+        if isinstance(c, dict):
+            agent.name = c.get('name', f"{side}辯士")
+            agent.model_settings = model_settings(c.get('config_json') or c)
+        elif isinstance(c, str):
+            agent.name = f"{side}辯士 ({c[:8]})"  # 使用 ID 的前 8 個字符
+            agent.model_settings = model_settings(agent_configs.get(c))
+        else:
+            agent.name = f"{side}辯士"
+            agent.model_settings = {}
+        team.append(agent)
+    return team
 
+def _release_debate(debate_id: str, success: bool = True):
+    """
+    辯論結束（成功或放棄重試）：釋放准入名額與排程空位，並派送下一場排隊中的辯論。
+    屬於批次辯論時更新批次進度並補上下一場；整個批次結束時釋放批次的名額。可重複呼叫。
+    """
+    admission_controller.release(debate_id)
+    batch_manager.debate_finished(debate_id, success, debate_scheduler)
+    debate_scheduler.complete(debate_id)
+
+@traced("debate.archive")
+def _archive_debate(debate_result: Dict[str, Any]):
+    """
+    將辯論結果寫入存檔。失敗時拋出例外，由呼叫端決定是否重試。
+    """
     db = SessionLocal()
     try:
         archive = models.DebateArchive(
             topic=debate_result["topic"],
             analysis_json=debate_result.get("analysis", {}),
             rounds_json=debate_result["rounds_data"],
-            logs_json={}
+            logs_json={"usage": debate_result.get("usage", {})}
         )
         db.add(archive)
         db.commit()
-    except Exception as e:
+    except Exception:
         db.rollback()
-        raise self.retry(exc=e, countdown=5, max_retries=3)
+        raise
     finally:
         db.close()
-    
+
+@app.task(bind=True)
+def run_debate_cycle(self, topic: str, pro_team_configs: List[Dict], con_team_configs: List[Dict], rounds: int, analysis: Dict[str, Any] = None, refresh_analysis: bool = False):
+    """
+    執行辯論循環並將結果存檔。提供 analysis 時沿用既有的賽前分析（批次辯論）；
+    refresh_analysis 時略過賽前分析快取。
+    """
+    debate_id = self.request.id
+    chairman = Chairman(name="主席")
+
+    # 如果沒有提供隊伍配置，會創建預設 Agent
+    pro_team = _build_team(pro_team_configs, "正方")
+    con_team = _build_team(con_team_configs, "反方")
+
+    with span("debate.run", debate_id=debate_id, rounds=rounds):
+        try:
+            with debate_scheduler.keep_alive(debate_id):
+                debate = DebateCycle(debate_id, topic, chairman, pro_team, con_team, rounds)
+                debate_result = debate.start(analysis, refresh_analysis)
+        except Exception:
+            _release_debate(debate_id, success=False)
+            raise
+
+        try:
+            _archive_debate(debate_result)
+        except Exception as e:
+            if self.request.retries >= 3:
+                _release_debate(debate_id, success=False)
+            raise self.retry(exc=e, countdown=5, max_retries=3)
+
+    _release_debate(debate_id)
     return debate_result
 
+# --- 鏈式編排（DEBATE_ORCHESTRATION=chain），見 worker/orchestration.py ---
+
+def _restore_debate(state: Dict[str, Any]) -> DebateCycle:
+    agent_models = state.get("agent_models", {})
+    pro_team = _build_team([{"name": name, **agent_models.get(name, {})} for name in state["pro_team"]], "正方")
+    con_team = _build_team([{"name": name, **agent_models.get(name, {})} for name in state["con_team"]], "反方")
+    return DebateCycle.from_state(state, Chairman(name="主席"), pro_team, con_team)
+
+@app.task
+def prepare_debate(debate_id: str, topic: str, pro_team_configs: List[Dict], con_team_configs: List[Dict], rounds: int, analysis: Dict[str, Any] = None, refresh_analysis: bool = False) -> Dict[str, Any]:
+    """
+    鏈式編排第一步：建立隊伍並進行賽前分析，返回辯論狀態。
+    """
+    with debate_scheduler.keep_alive(debate_id):
+        pro_team = _build_team(pro_team_configs, "正方")
+        con_team = _build_team(con_team_configs, "反方")
+        debate = DebateCycle(debate_id, topic, Chairman(name="主席"), pro_team, con_team, rounds)
+        debate.prepare(analysis, refresh_analysis)
+        return debate.to_state()
+
+@app.task
+def run_debate_round(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    鏈式編排中間步驟：執行下一輪辯論，返回更新後的狀態。
+    """
+    with debate_scheduler.keep_alive(state["debate_id"]):
+        debate = _restore_debate(state)
+        debate.run_next_round()
+        return debate.to_state()
+
+@app.task(bind=True)
+def finalize_debate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    鏈式編排最後一步：宣布結束、存檔並釋放名額。
+    存檔重試用盡時任務失敗，名額由 abort_debate 釋放。
+    """
+    with span("debate.finalize", debate_id=state["debate_id"]):
+        with debate_scheduler.keep_alive(state["debate_id"]):
+            debate_result = _restore_debate(state).finish()
+        try:
+            _archive_debate(debate_result)
+        except Exception as e:
+            raise self.retry(exc=e, countdown=5, max_retries=3)
+    _release_debate(state["debate_id"])
+    return debate_result
+
+@app.task
+def abort_debate(debate_id: str) -> None:
+    """
+    鏈式編排的 link_error：鏈上任一任務最終失敗（含重試用盡）時釋放名額，不等 DEBATE_LEASE_TTL 到期。
+    """
+    logger.warning("Debate %s failed, releasing its lease", debate_id)
+    debate_scheduler.mark_failed(debate_id, "Debate task failed")
+    _release_debate(debate_id, success=False)
+
+def _prewarm_tool(call) -> bool:
+    """
+    執行一次工具呼叫以寫入快取；失敗不影響批次。
+    """
+    tool_name, params = call
+    try:
+        result = run_tool(tool_name, params)
+    except Exception as e:
+        logger.warning("Pre-warm of %s failed: %s", tool_name, e)
+        return False
+    return isinstance(result, dict) and "error" not in result
+
+@app.task
+def prepare_batch(batch_id: str) -> Dict[str, Any]:
+    """
+    批次辯論的共用準備：賽前分析只做一次、預熱工具快取，再依 concurrency 送出第一批辯論。
+    之後每結束一場由 _release_debate 補上下一場。
+    """
+    progress = batch_manager.progress(batch_id)
+    if progress is None:
+        return {"batch_id": batch_id, "status": "missing"}
+    topic = progress["topic"]
+
+    try:
+        analysis = Chairman(name="主席").pre_debate_analysis(topic, refresh=progress["refresh_analysis"])
+
+        # 預熱工具快取：同一辯題的各場辯論查詢相同資料時直接命中 Redis 快取
+        calls = get_prewarm_tool_calls(topic)
+        warmed = 0
+        if calls:
+            with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+                warmed = sum(pool.map(_prewarm_tool, calls))
+        logger.info("Batch %s: pre-warmed %d/%d tool calls", batch_id, warmed, len(calls))
+
+        batch_manager.set_analysis(batch_id, analysis)
+    except Exception as e:
+        batch_manager.mark_failed(batch_id, str(e))
+        batch_manager.release_leases(batch_id)
+        raise
+
+    launched = batch_manager.launch_next(batch_id, debate_scheduler)
+    return {"batch_id": batch_id, "status": "running", "prewarmed": warmed, "launched": launched}
+
 def _select_agent(team: List[AgentBase], round_num: int) -> AgentBase:
     """
     从队伍中选择一个智能体发言。
@@ -0,0 +1,100 @@
+"""
+工具呼叫的結構化輸出與解析
+
+- tool_call_schema()：由工具的 schema 產生 {"tool": ..., "params": {...}} 的 JSON Schema，
+  傳給 Ollama 的 format 參數，讓模型只能輸出合法的工具呼叫，或以 {"tool": "none"} 表示不使用工具。
+  只使用已載入工具的參數 schema，不會為了組 schema 而 import 延遲註冊的 adapter（見 api/tool_manifest.py）；
+  尚未載入的工具 params 只限制為 object，工具第一次執行後下一次組出的 schema 就包含它的參數。
+- JsonObjectParser（worker/json_stream.py）：逐段餵入串流輸出，遇到第一個完整的 JSON 物件就回傳，
+  呼叫端可以在物件結束時立即中斷生成，不必等模型把多餘的文字講完。
+- parse_tool_call()：從完整回應中解析工具呼叫，取代以 find("{") / rfind("}") 擷取字串的做法。
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from api.tool_registry import tool_registry
+from worker.json_stream import JsonObjectParser
+from worker.tool_config import AVAILABLE_TOOLS, TOOL_CATALOG_VERSION
+
+# 設為 false 時不傳 format，改回讓模型自由輸出（部分模型不支援 structured output）
+STRUCTURED_TOOL_CALLS = os.getenv("LLM_STRUCTURED_TOOL_CALLS", "true").lower() in ("1", "true", "yes")
+
+# 模型不使用工具時輸出的工具名稱
+NO_TOOL = "none"
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """
+    回傳文字中第一個完整 JSON 物件的字串。
+    """
+    return JsonObjectParser().feed(text)
+
+
+def parse_tool_call(text: str) -> Optional[Dict[str, Any]]:
+    """
+    解析工具呼叫；不是 {"tool": str, "params": dict} 的格式，或模型選擇不使用工具（NO_TOOL）時回傳 None。
+    """
+    candidate = find_json_object(text or "")
+    if candidate is None:
+        return None
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("tool"), str) or data["tool"] == NO_TOOL:
+        return None
+    params = data.get("params", {})
+    if not isinstance(params, dict):
+        return None
+    return {"tool": data["tool"], "params": params}
+
+
+def _catalog_tool_names() -> Tuple[str, ...]:
+    return tuple(
+        tool["name"] for category_data in AVAILABLE_TOOLS.values() for tool in category_data["tools"]
+    )
+
+
+def build_tool_call_schema(tool_names: Iterable[str]) -> Dict[str, Any]:
+    """
+    由工具的參數 schema 組出工具呼叫的 JSON Schema（anyOf，每個工具一個分支，另加一個不使用工具的分支）。
+    尚未載入或查不到 schema 的工具，params 只限制為 object。
+    """
+    branches = []
+    for name in tool_names:
+        tool_data = tool_registry.peek_tool_data(name)
+        params_schema = (tool_data or {}).get("schema") or {"type": "object"}
+        branches.append({
+            "type": "object",
+            "properties": {
+                "tool": {"type": "string", "enum": [name]},
+                "params": params_schema,
+            },
+            "required": ["tool", "params"],
+        })
+    if not branches:
+        return {"type": "object", "properties": {"tool": {"type": "string"}, "params": {"type": "object"}}}
+    branches.append({
+        "type": "object",
+        "properties": {"tool": {"type": "string", "enum": [NO_TOOL]}, "params": {"type": "object"}},
+        "required": ["tool"],
+    })
+    return {"anyOf": branches}
+
+
+@lru_cache(maxsize=4)
+def _tool_call_schema(catalog_version: str, loaded: Tuple[str, ...]) -> Dict[str, Any]:
+    return build_tool_call_schema(_catalog_tool_names())
+
+
+def tool_call_schema() -> Dict[str, Any]:
+    """
+    Agent prompt 中提供的工具的工具呼叫 schema。
+    每個工具目錄版本與已載入工具的組合只產生一次，有工具新載入時才重新產生。
+    """
+    names = _catalog_tool_names()
+    loaded = tuple(name for name in names if tool_registry.peek_tool_data(name) is not None)
+    return _tool_call_schema(TOOL_CATALOG_VERSION, loaded)
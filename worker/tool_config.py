@@ -3,6 +3,9 @@
 確保所有代理對可用工具有一致的認知。
 """
 
+import hashlib
+import json
+
 # 工具列表定義
 AVAILABLE_TOOLS = {
     "tej": {
@@ -62,6 +65,18 @@ AVAILABLE_TOOLS = {
                 "description": "國際股票查詢",
                 "params": "symbol='股票代碼'",
                 "example": '{"tool": "yfinance.stock_info", "params": {"symbol": "TSM"}}'
+            },
+            {
+                "name": "meta.search",
+                "description": "多引擎網頁搜尋（同時查詢多個搜尋引擎，合併去重，涵蓋面較廣）",
+                "params": "q='關鍵字', limit=10",
+                "example": '{"tool": "meta.search", "params": {"q": "遠距工作 生產力 研究"}}'
+            },
+            {
+                "name": "web.fetch",
+                "description": "讀取網頁正文（搜尋摘要不足以引用時，抓取搜尋結果的網址取得原文）",
+                "params": "urls=['網址', ...]（最多 5 個）, max_chars=4000",
+                "example": '{"tool": "web.fetch", "params": {"urls": ["https://example.com/article"]}}'
             }
         ]
     }
@@ -76,6 +91,14 @@ STOCK_CODES = {
 
 CURRENT_DATE = "2025-12-05"
 
+# 工具目錄版本：工具列表、股票代碼或日期變動時改變，用於賽前分析快取等與目錄綁定的資料
+TOOL_CATALOG_VERSION = hashlib.sha256(
+    json.dumps(
+        {"tools": AVAILABLE_TOOLS, "stock_codes": STOCK_CODES, "current_date": CURRENT_DATE},
+        ensure_ascii=False, sort_keys=True
+    ).encode("utf-8")
+).hexdigest()[:12]
+
 def get_tools_description() -> str:
     """
     生成工具列表的文字描述，供 prompt 使用。
@@ -118,3 +141,28 @@ def get_recommended_tools_for_topic(topic: str) -> list:
     
     # 預設
     return ["searxng.search"]
+
+def get_prewarm_tool_calls(topic: str) -> list:
+    """
+    推測辯題會用到的工具呼叫（工具名稱, 參數），供批次辯論預熱工具快取。
+    以推薦工具的範例參數為基礎，股票代碼換成辯題提到的股票。
+    """
+    examples = {
+        tool['name']: json.loads(tool['example'])['params']
+        for category_data in AVAILABLE_TOOLS.values()
+        for tool in category_data['tools']
+    }
+    codes = sorted({code for name, code in STOCK_CODES.items() if name in topic or code in topic})
+
+    calls = []
+    for tool_name in get_recommended_tools_for_topic(topic):
+        params = examples.get(tool_name)
+        if params is None:
+            continue
+        if tool_name == 'searxng.search':
+            calls.append((tool_name, {**params, 'q': topic}))
+        elif 'coid' in params and codes:
+            calls.extend((tool_name, {**params, 'coid': code}) for code in codes)
+        else:
+            calls.append((tool_name, dict(params)))
+    return calls
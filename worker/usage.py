@@ -0,0 +1,152 @@
+"""
+辯論的 token 與成本統計
+
+每次 LLM 呼叫的 token 數與耗時取自 call_llm 回傳的 LLMResult（見 worker/llm_utils.py），
+工具呼叫的成本取自工具結果的 cost 欄位（命中快取的結果不重複計算）。
+統計依整場辯論、參與者（Agent / 主席）、回合與單一回合發言（回合 + Agent）分別加總，
+隨辯論結果存檔（DebateArchive.logs_json 的 usage），進行中的統計可由 GET /api/v1/debates/{task_id} 查詢。
+
+LLM_TOKEN_COST 可設定各模型每 1K token 的單價（JSON，"*" 為預設），例如：
+{"gpt-oss:20b": {"prompt": 0.0005, "completion": 0.0015}}
+未設定時 LLM 呼叫不計成本，只統計 token 數與耗時（llm_seconds 可用於估算 GPU 用量）。
+
+結構化輸出的串流呼叫在取得第一個完整 JSON 物件後就中斷，收不到 Ollama 的 prompt token 數，
+改以訊息長度估計；prompt_tokens 含估計值，其中估計的部分另計於 estimated_prompt_tokens。
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _load_token_cost(value: Optional[str]) -> Dict[str, Dict[str, float]]:
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        logger.warning("Invalid LLM_TOKEN_COST '%s'; LLM calls will not be costed.", value)
+        return {}
+
+
+LLM_TOKEN_COST = _load_token_cost(os.getenv("LLM_TOKEN_COST"))
+
+
+def llm_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    依 LLM_TOKEN_COST 計算一次呼叫的成本。
+    """
+    price = LLM_TOKEN_COST.get(model or "") or LLM_TOKEN_COST.get("*") or {}
+    return (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1000
+
+
+@dataclass
+class Usage:
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_seconds: float = 0.0
+    estimated_prompt_tokens: int = 0
+    tool_calls: int = 0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_llm(self, result: Any) -> None:
+        """
+        加入一次 LLM 呼叫；result 不是 LLMResult（例如錯誤訊息）時只計次數。
+        """
+        prompt_tokens = getattr(result, "prompt_tokens", 0)
+        completion_tokens = getattr(result, "completion_tokens", 0)
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        if getattr(result, "prompt_tokens_estimated", False):
+            self.estimated_prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.llm_seconds += getattr(result, "total_duration", 0) / 1e9
+        self.cost += llm_cost(getattr(result, "model", None), prompt_tokens, completion_tokens)
+
+    def add_tool(self, result: Any) -> None:
+        self.tool_calls += 1
+        if isinstance(result, dict) and not result.get("used_cache"):
+            self.cost += result.get("cost") or 0
+
+    def merge(self, other: "Usage") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["total_tokens"] = self.total_tokens
+        data["llm_seconds"] = round(self.llm_seconds, 3)
+        data["cost"] = round(self.cost, 6)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Usage":
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+class UsageLedger:
+    """
+    一場辯論的用量帳本。背景的滾動摘要也會寫入，因此以 lock 保護。
+    """
+
+    def __init__(self):
+        self.total = Usage()
+        self.by_participant: Dict[str, Usage] = {}
+        self.by_round: Dict[str, Usage] = {}
+        self.turns: Dict[Tuple[int, str], Usage] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, participant: str, round_num: Optional[int], usage: Usage) -> None:
+        with self._lock:
+            buckets = [self.total, self.by_participant.setdefault(participant, Usage())]
+            if round_num is not None:
+                buckets.append(self.by_round.setdefault(str(round_num), Usage()))
+                buckets.append(self.turns.setdefault((round_num, participant), Usage()))
+            for bucket in buckets:
+                bucket.merge(usage)
+
+    def record_llm(self, result: Any, participant: str, round_num: Optional[int] = None) -> None:
+        """
+        記錄一次 LLM 呼叫。round_num 為 None（賽前分析、滾動摘要）時不計入回合統計。
+        """
+        usage = Usage()
+        usage.add_llm(result)
+        self._record(participant, round_num, usage)
+
+    def record_tool(self, result: Any, participant: str, round_num: Optional[int] = None) -> None:
+        usage = Usage()
+        usage.add_tool(result)
+        self._record(participant, round_num, usage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            turns: List[Dict[str, Any]] = [
+                {"round": round_num, "participant": participant, **usage.to_dict()}
+                for (round_num, participant), usage in self.turns.items()
+            ]
+            return {
+                "total": self.total.to_dict(),
+                "by_participant": {name: usage.to_dict() for name, usage in self.by_participant.items()},
+                "by_round": {round_num: usage.to_dict() for round_num, usage in self.by_round.items()},
+                "turns": turns,
+            }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "UsageLedger":
+        ledger = cls()
+        data = data or {}
+        ledger.total = Usage.from_dict(data.get("total", {}))
+        ledger.by_participant = {name: Usage.from_dict(u) for name, u in data.get("by_participant", {}).items()}
+        ledger.by_round = {round_num: Usage.from_dict(u) for round_num, u in data.get("by_round", {}).items()}
+        ledger.turns = {(t["round"], t["participant"]): Usage.from_dict(t) for t in data.get("turns", [])}
+        return ledger